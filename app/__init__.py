@@ -0,0 +1,13 @@
+import time
+from dotenv import load_dotenv
+
+# Taken before anything else is imported, for the startup report
+IMPORT_STARTED = time.perf_counter()
+
+# Load .env once, before any module reads its settings
+load_dotenv()
+
+# Per-module import times for the startup report (see app.utils.startup)
+from app.utils.startup import time_imports  # noqa: E402
+
+time_imports()
@@ -1,41 +1,58 @@
-import os
-from datetime import datetime, timedelta
-from jose import jwt
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# JWT configuration
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(
-    os.getenv("JWT_EXPIRE_MINUTES", 30)
-)
-
-if not SECRET_KEY:
-    raise RuntimeError("JWT_SECRET_KEY is not set in environment variables")
-
-
-def create_access_token(data: dict) -> str:
-    """
-    Create a JWT access token with expiration.
-    The 'sub' field is used to store user identity (email).
-    """
-    to_encode = data.copy()
-
-    expire = datetime.utcnow() + timedelta(
-        minutes=ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-
-    to_encode.update({
-        "exp": expire,
-        "iat": datetime.utcnow()
-    })
-
-    token = jwt.encode(
-        to_encode,
-        SECRET_KEY,
-        algorithm=ALGORITHM
-    )
-
-    return token
\ No newline at end of file
+import os
+from datetime import datetime, timedelta
+from jose import jwt
+
+# JWT configuration
+SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(
+    os.getenv("JWT_EXPIRE_MINUTES", 30)
+)
+# Lifetime of the signed links handed out for a single download
+DOWNLOAD_TOKEN_EXPIRE_SECONDS = int(
+    os.getenv("DOWNLOAD_TOKEN_EXPIRE_SECONDS", 300)
+)
+
+if not SECRET_KEY:
+    raise RuntimeError("JWT_SECRET_KEY is not set in environment variables")
+
+
+def create_access_token(data: dict) -> str:
+    """
+    Create a JWT access token with expiration.
+    The 'sub' field is used to store user identity (email).
+    """
+    to_encode = data.copy()
+
+    expire = datetime.utcnow() + timedelta(
+        minutes=ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+
+    to_encode.update({
+        "exp": expire,
+        "iat": datetime.utcnow()
+    })
+
+    token = jwt.encode(
+        to_encode,
+        SECRET_KEY,
+        algorithm=ALGORITHM
+    )
+
+    return token
+
+def create_download_token(email: str, job_id: int) -> str:
+    """
+    Short-lived token that only opens /pipeline/jobs/{job_id}/download,
+    so a download link can be handed to a browser without the session token.
+    """
+    return jwt.encode(
+        {
+            "sub": email,
+            "job": job_id,
+            "scope": "download",
+            "exp": datetime.utcnow() + timedelta(seconds=DOWNLOAD_TOKEN_EXPIRE_SECONDS),
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM
+    )
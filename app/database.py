@@ -1,37 +1,144 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-# Load environment variables
-load_dotenv()
-
-# Read DB credentials from .env
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
-
-# Build database URL
-DATABASE_URL = (
-    f"postgresql://{DB_USER}:{DB_PASSWORD}"
-    f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
-
-# Create engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,          # set True only for debugging
-    pool_pre_ping=True   # prevents stale connection errors
-)
-
-# Create session
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine
-)
-
-# Base class for models
-Base = declarative_base()
+import os
+import logging
+import threading
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Read DB credentials from .env
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME")
+
+# Build database URL (DATABASE_URL overrides, e.g. sqlite:///./local.db for tests)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"postgresql://{DB_USER}:{DB_PASSWORD}"
+    f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# Connection pool (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+_pool_stats = {"checkouts": 0, "checkins": 0, "timeouts": 0}
+_pool_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _pool_stats_lock:
+        _pool_stats[name] += 1
+
+
+def instrument_pool(engine):
+    """
+    Count the connections engine's pool hands out and takes back.
+    """
+    event.listen(engine, "checkout", lambda *args: _count("checkouts"))
+    event.listen(engine, "checkin", lambda *args: _count("checkins"))
+
+
+def record_pool_timeout():
+    """
+    Count a request that gave up waiting DB_POOL_TIMEOUT for a connection.
+    """
+    _count("timeouts")
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url: str) -> dict:
+    """
+    create_engine keyword arguments for a database URL.
+    """
+    url = make_url(url)
+    options = {
+        "echo": False,           # set True only for debugging
+        "pool_pre_ping": True    # prevents stale connection errors
+    }
+
+    if url.get_backend_name() == "sqlite":
+        # Sessions are used from worker threads (job callbacks, log writer)
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return options
+
+    options.update({
+        "poolclass": QueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE
+    })
+    return options
+
+
+# Create engine
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_pool(engine)
+
+# Create session
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine
+)
+
+# Base class for models
+Base = declarative_base()
+
+
+def get_db():
+    """
+    FastAPI dependency: one session per request, always closed.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def create_tables() -> bool:
+    """
+    Create missing tables for every imported model, and indexes added to
+    existing tables later (create_all only creates them with a new
+    table). Returns False when the database is unreachable, so the API
+    still starts (and reports it at /health/db) instead of failing to boot.
+    """
+    try:
+        Base.metadata.create_all(bind=engine)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        return True
+    except exc.OperationalError:
+        logger.exception("Could not create tables, database unreachable")
+        return False
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+
+    if isinstance(pool, QueuePool):
+        checked_out = pool.checkedout()
+        stats.update({
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            # At 0, further requests wait (up to DB_POOL_TIMEOUT)
+            "available": max(pool.size() + DB_MAX_OVERFLOW - checked_out, 0)
+        })
+    return stats
+
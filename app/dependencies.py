@@ -1,46 +1,159 @@
-import os
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# JWT settings
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-
-if not SECRET_KEY:
-    raise RuntimeError("JWT_SECRET_KEY is not set in .env file")
-
-# HTTP Bearer scheme (for manual Bearer token)
-security = HTTPBearer()
-
-
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-):
-    """
-    Extracts and verifies JWT token from Authorization header.
-    Expects: Authorization: Bearer <token>
-    """
-    token = credentials.credentials
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token payload",
-            )
-
-        return email
-
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token verification failed",
-        )
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import jwt, JWTError
+
+# JWT settings
+SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+# Users allowed to see server-wide data (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Verified tokens kept in memory, and for how long at most (never past exp)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
+
+if not SECRET_KEY:
+    raise RuntimeError("JWT_SECRET_KEY is not set in .env file")
+
+# HTTP Bearer scheme (for manual Bearer token)
+security = HTTPBearer()
+# Same scheme where a signed link may stand in for the header
+optional_security = HTTPBearer(auto_error=False)
+
+
+class TokenCache:
+    """
+    LRU cache of tokens whose signature has already been checked:
+    token -> (email, expires_at). An entry expires after ttl seconds or
+    at the token's own exp claim, whichever comes first.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, email: str, exp: float = None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        with self._lock:
+            self._entries[token] = (email, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Extracts and verifies JWT token from Authorization header.
+    Expects: Authorization: Bearer <token>
+    Tokens verified recently are served from token_cache.
+    """
+    token = credentials.credentials
+
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("sub")
+
+        if email is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token payload",
+            )
+
+        token_cache.put(token, email, payload.get("exp"))
+        return email
+
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token verification failed",
+        )
+
+
+def get_admin_user(user_email: str = Depends(get_current_user)):
+    """
+    get_current_user, restricted to the ADMIN_EMAILS users (403 otherwise).
+    """
+    if user_email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return user_email
+
+
+def get_download_user(
+    job_id: int,
+    token: Optional[str] = Query(None, description="Signed download link token"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """
+    get_current_user for the download route, which also accepts the
+    ?token= of a link from create_download_token for this job.
+    """
+    if token is None:
+        if credentials is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+            )
+        return get_current_user(credentials)
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Download link is invalid or has expired",
+        )
+
+    if payload.get("scope") != "download" or payload.get("job") != job_id or not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Download link is not valid for this job",
+        )
+    return payload["sub"]
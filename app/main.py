@@ -1,32 +1,113 @@
-from fastapi import FastAPI
-
-from app.database import engine, Base
-from app import models  # IMPORTANT: registers all models
-from app.routers import user_routes, pipeline_routes
-
-# -------------------------
-# APP INITIALIZATION
-# -------------------------
-app = FastAPI(
-    title="AI Data Cleaning Assistant",
-    version="1.0.0",
-    description="An AI-powered pipeline for CSV analysis, cleaning, and quality scoring"
-)
-
-# -------------------------
-# CREATE DATABASE TABLES
-# -------------------------
-Base.metadata.create_all(bind=engine)
-
-# -------------------------
-# INCLUDE ROUTERS
-# -------------------------
-app.include_router(user_routes.router)
-app.include_router(pipeline_routes.router)
-
-# -------------------------
-# ROOT ENDPOINT
-# -------------------------
-@app.get("/")
-def root():
-    return {"message": "Server running successfully"}
+import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import exc
+from starlette.concurrency import run_in_threadpool
+
+from app.database import create_tables, pool_stats, record_pool_timeout
+from app.dependencies import token_cache
+from app import models  # IMPORTANT: registers all models
+from app.routers import user_routes, pipeline_routes, history_routes
+from app.services import jobs
+from app.utils import security
+from app.utils.activity_logger import activity_writer_stats, stop_activity_writer
+from app.utils.metrics import render_metrics
+from app.utils.startup import record_imports, record_ready, start_warmup, startup_report, timed_phase
+
+record_imports()
+
+
+# -------------------------
+# STARTUP / SHUTDOWN
+# -------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # CREATE DATABASE TABLES (an unreachable database does not stop the worker)
+    with timed_phase("create_tables"):
+        await run_in_threadpool(create_tables)
+
+    # pandas and the pipeline load in the background while requests are served
+    start_warmup()
+    record_ready()
+
+    yield
+
+    # Wait for queued cleaning jobs so their results reach the database
+    jobs.shutdown_executor()
+    # The profiling pool can only exist if the pipeline was imported
+    profiling = sys.modules.get("app.services.profiling")
+    if profiling is not None:
+        profiling.shutdown_executor()
+    security.shutdown_executor()
+    # Last: finished jobs above may still queue activity log entries
+    stop_activity_writer()
+
+
+# -------------------------
+# APP INITIALIZATION
+# -------------------------
+app = FastAPI(
+    title="AI Data Cleaning Assistant",
+    version="1.0.0",
+    description="An AI-powered pipeline for CSV analysis, cleaning, and quality scoring",
+    lifespan=lifespan
+)
+
+@app.exception_handler(exc.TimeoutError)
+def pool_timeout(request: Request, error: exc.TimeoutError):
+    # No free database connection within DB_POOL_TIMEOUT
+    record_pool_timeout()
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, retry later"},
+        headers={"Retry-After": "5"}
+    )
+
+
+# -------------------------
+# INCLUDE ROUTERS
+# -------------------------
+app.include_router(user_routes.router)
+app.include_router(pipeline_routes.router)
+app.include_router(history_routes.router)
+
+# -------------------------
+# ROOT ENDPOINT
+# -------------------------
+@app.get("/")
+def root():
+    return {"message": "Server running successfully"}
+
+
+@app.get("/health/db")
+def database_health():
+    # Connection pool utilization: checked out, overflow, available, timeouts
+    return pool_stats()
+
+
+@app.get("/health/auth")
+def auth_health():
+    # bcrypt pool queue times and verified-token cache hit rate
+    return {
+        "password_hasher": security.hasher_stats(),
+        "token_cache": token_cache.stats()
+    }
+
+
+@app.get("/health/activity-log")
+def activity_log_health():
+    # Entries queued, written, retried and lost by the activity log writer
+    return activity_writer_stats()
+
+
+@app.get("/health/startup")
+def startup_health():
+    # Import, initialization and warm-up times of this worker
+    return startup_report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: pipeline stage histograms, bytes and rows processed
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
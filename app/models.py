@@ -1,45 +1,73 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from datetime import datetime
-from app.database import Base
-
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-
-class FileRecord(Base):
-    __tablename__ = "files"
-
-    id = Column(Integer, primary_key=True, index=True)
-    original_filename = Column(String, nullable=False)
-    stored_path = Column(String, nullable=False)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-
-    user_id = Column(Integer, ForeignKey("users.id"))
-
-
-class CleaningHistory(Base):
-    __tablename__ = "cleaning_history"
-
-    id = Column(Integer, primary_key=True, index=True)
-    steps_applied = Column(String)
-    cleaned_file_path = Column(String)
-    cleaned_at = Column(DateTime, default=datetime.utcnow)
-
-    file_id = Column(Integer, ForeignKey("files.id"))
-
-
-# ✅ ACTIVITY LOG TABLE
-class ActivityLog(Base):
-    __tablename__ = "activity_logs"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, index=True, nullable=False)
-    action = Column(String, nullable=False)
-    description = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.database import Base
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True, nullable=False)
+    hashed_password = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FileRecord(Base):
+    __tablename__ = "files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    original_filename = Column(String, nullable=False)
+    stored_path = Column(String, nullable=False)
+    sha256 = Column(String(64), index=True)
+    size_bytes = Column(BigInteger)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    dataset = Column(String, index=True)      # logical dataset of an incremental upload
+
+    user_id = Column(Integer, ForeignKey("users.id"))
+    parent_id = Column(Integer, ForeignKey("files.id"))   # previous version of the dataset
+
+
+class CleaningHistory(Base):
+    __tablename__ = "cleaning_history"
+    __table_args__ = (
+        # Keyset pages of one user's runs, newest first (optionally by status)
+        Index("ix_cleaning_history_user_created", "user_email", "created_at", "id"),
+        Index("ix_cleaning_history_user_status_created", "user_email", "status", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, index=True)
+    status = Column(String, nullable=False, default="PENDING")
+    steps_applied = Column(String)
+    cleaned_file_path = Column(String)
+    output_format = Column(String, default="csv")   # csv, csv.gz, csv.zst, parquet, feather
+    cleaned_sha256 = Column(String(64))   # hashed while writing, used as ETag
+    rows_before = Column(Integer)
+    rows_after = Column(Integer)
+    duplicates_removed = Column(Integer)
+    missing_values_fixed = Column(Integer)
+    data_quality_score = Column(Integer)
+    result = Column(Text)          # JSON: analysis + cleaning summary
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    cleaned_at = Column(DateTime, default=datetime.utcnow)
+    state_path = Column(String)    # incremental cleaning state of this version
+
+    file_id = Column(Integer, ForeignKey("files.id"))
+    parent_id = Column(Integer, ForeignKey("cleaning_history.id"))   # run this version extends
+
+
+# ✅ ACTIVITY LOG TABLE
+class ActivityLog(Base):
+    __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Keyset pages of one user's log, newest first (optionally by action)
+        Index("ix_activity_logs_user_created", "user_email", "created_at", "id"),
+        Index("ix_activity_logs_user_action_created", "user_email", "action", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, index=True, nullable=False)
+    action = Column(String, nullable=False)
+    description = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.dependencies import get_current_user
+from app.database import get_db
+from app.models import ActivityLog, CleaningHistory
+from app.utils.pagination import keyset_page
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+
+
+def _utc(value: datetime) -> datetime:
+    # Stored times are naive UTC (datetime.utcnow)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _time_range(query, model, since: datetime, until: datetime):
+    since, until = _utc(since), _utc(until)
+    if since is not None:
+        query = query.filter(model.created_at >= since)
+    if until is not None:
+        query = query.filter(model.created_at < until)
+    return query
+
+
+def _page(query, model, cursor: str, limit: int):
+    try:
+        return keyset_page(query, model, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# -------------------------
+# CLEANING RUNS
+# -------------------------
+@router.get("/jobs", response_model=schemas.CleaningHistoryPage)
+def list_cleaning_history(
+    status: Optional[str] = Query(None, description="PENDING, COMPLETED or FAILED"),
+    since: Optional[datetime] = Query(None, description="Created at or after (UTC)"),
+    until: Optional[datetime] = Query(None, description="Created before (UTC)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    The user's cleaning runs, newest first, in keyset-paginated pages.
+    """
+    query = db.query(CleaningHistory).filter(CleaningHistory.user_email == user_email)
+    if status is not None:
+        query = query.filter(CleaningHistory.status == status)
+    query = _time_range(query, CleaningHistory, since, until)
+
+    rows, next_cursor = _page(query, CleaningHistory, cursor, limit)
+
+    items = []
+    for history in rows:
+        item = schemas.CleaningHistoryResponse.model_validate(history)
+        if history.status == "PENDING":
+            item.cleaned_at = None
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# -------------------------
+# ACTIVITY LOG
+# -------------------------
+@router.get("/activity", response_model=schemas.ActivityLogPage)
+def list_activity(
+    action: Optional[str] = Query(None, description="e.g. LOGIN, UPLOAD, ANALYZE, CLEAN, BATCH"),
+    since: Optional[datetime] = Query(None, description="Created at or after (UTC)"),
+    until: Optional[datetime] = Query(None, description="Created before (UTC)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    The user's activity log, newest first, in keyset-paginated pages.
+    """
+    query = db.query(ActivityLog).filter(ActivityLog.user_email == user_email)
+    if action is not None:
+        query = query.filter(ActivityLog.action == action)
+    query = _time_range(query, ActivityLog, since, until)
+
+    rows, next_cursor = _page(query, ActivityLog, cursor, limit)
+    return {"items": rows, "next_cursor": next_cursor}
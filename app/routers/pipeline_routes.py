@@ -1,88 +1,1121 @@
-import os
-import shutil
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
-
-from app.dependencies import get_current_user
-from app.database import SessionLocal
-from app.services.data_cleaning import analyze_csv, clean_csv
-from app.utils.activity_logger import log_activity
-
-router = APIRouter(prefix="/pipeline", tags=["Pipeline"])
-
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.post("/clean-csv")
-def upload_and_clean_csv(
-    file: UploadFile = File(...),
-    user_email: str = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    # -------------------------
-    # SAVE FILE
-    # -------------------------
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    if os.path.getsize(file_path) == 0:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty")
-
-    # LOG: UPLOAD
-    log_activity(
-        db,
-        user_email,
-        "UPLOAD",
-        f"Uploaded file: {file.filename}"
-    )
-
-    # -------------------------
-    # ANALYZE
-    # -------------------------
-    analysis = analyze_csv(file_path)
-
-    log_activity(
-        db,
-        user_email,
-        "ANALYZE",
-        f"Rows: {analysis['total_rows']}, Columns: {analysis['total_columns']}"
-    )
-
-    # -------------------------
-    # CLEAN
-    # -------------------------
-    cleaning_result = clean_csv(file_path)
-
-    log_activity(
-        db,
-        user_email,
-        "CLEAN",
-        (
-            f"Rows before: {cleaning_result['rows_before']}, "
-            f"Rows after: {cleaning_result['rows_after']}, "
-            f"Duplicates removed: {cleaning_result['duplicates_removed']}, "
-            f"Missing values fixed: {cleaning_result['missing_values_fixed']}, "
-            f"Quality score: {cleaning_result['data_quality_score']}"
-        )
-    )
-
-    # -------------------------
-    # RESPONSE (FIXED KEY)
-    # -------------------------
-    return {
-        "analysis": analysis,
-        "cleaning_summary": cleaning_result,
-        "cleaning_steps": cleaning_result["steps"],   # ✅ FIXED HERE
-        "cleaned_file_path": cleaning_result["cleaned_file_path"]
-    }
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, Header, HTTPException, Path, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import schemas
+from app.auth import DOWNLOAD_TOKEN_EXPIRE_SECONDS, create_download_token
+from app.dependencies import get_admin_user, get_current_user, get_download_user
+from app.database import SessionLocal, get_db
+from app.models import CleaningHistory, FileRecord, User
+from app.services.jobs import (
+    JobQueueFull,
+    apply_pipeline_result,
+    log_pipeline_result,
+    pipeline_activity,
+    run_pipelines,
+    submit_cleaning_job,
+)
+from app.services.result_cache import (
+    cache_key,
+    cache_stats,
+    get_cached_result,
+    store_result,
+)
+from app.utils.activity_logger import activity_entry, log_activities, log_activity
+from app.utils.archives import ARCHIVE_ERRORS, iter_csv_files
+from app.utils.downloads import (
+    COMPRESSIBLE_FORMATS,
+    MEDIA_TYPES,
+    accepts_gzip,
+    content_disposition,
+    etag_matches,
+    iter_file,
+    iter_gzip,
+    parse_range,
+)
+from app.utils.metrics import collect_stages, record_run, stage
+from app.utils.progress import job_progress
+from app.utils.resumable import (
+    UploadTooLarge,
+    chunk_span,
+    create_upload,
+    delete_upload,
+    finish_upload,
+    load_upload,
+    mark_received,
+    received_chunks,
+    upload_status,
+    write_at,
+)
+from app.utils.storage import COPY_BUFFER_SIZE, dataset_dir, file_sha256, store_upload
+
+router = APIRouter(prefix="/pipeline", tags=["Pipeline"])
+
+# Uploads larger than this are cleaned in streaming (chunked) mode
+STREAMING_THRESHOLD_MB = int(os.getenv("STREAMING_THRESHOLD_MB", 512))
+CLEAN_CHUNK_SIZE = int(os.getenv("CLEAN_CHUNK_SIZE", 100_000))
+# Seconds between progress checks of a job event stream
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", 0.25))
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+# CSV files (uploads plus archive members) one batch request may hold
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 1000))
+
+
+def _add_file_record(
+    filename: str,
+    sha256: str,
+    stored_path: str,
+    size_bytes: int,
+    user_email: str,
+    db: Session,
+    dataset: str = None,
+    parent_id: int = None
+) -> FileRecord:
+    with stage("file_record"):
+        record = FileRecord(
+            original_filename=filename,
+            stored_path=stored_path,
+            sha256=sha256,
+            size_bytes=size_bytes,
+            user_id=db.query(User.id).filter(User.email == user_email).scalar(),
+            dataset=dataset,
+            parent_id=parent_id
+        )
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+
+    # LOG: UPLOAD
+    with stage("activity_log"):
+        log_activity(
+            user_email,
+            "UPLOAD",
+            f"Uploaded file: {filename}"
+        )
+
+    return record
+
+
+def _save_upload(
+    file: UploadFile,
+    user_email: str,
+    db: Session,
+    dataset: str = None,
+    parent_id: int = None
+) -> FileRecord:
+    with stage("upload_copy"):
+        sha256, stored_path, size_bytes = store_upload(file.file)
+
+    if size_bytes == 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+    return _add_file_record(file.filename, sha256, stored_path, size_bytes, user_email, db, dataset, parent_id)
+
+
+def pipeline_options(
+    chunk_size: Optional[int] = Query(
+        None,
+        gt=0,
+        description="Rows per chunk; enables streaming mode for large files"
+    ),
+    optimize_dtypes: bool = Query(
+        True,
+        description="Compact dtypes after loading (downcast numbers, category/Arrow strings)"
+    ),
+    dedup_columns: Optional[str] = Query(
+        None,
+        description="Comma-separated columns forming the duplicate key (default: whole row)"
+    ),
+    near_duplicates: bool = Query(
+        False,
+        description="Also drop near-duplicate rows by MinHash similarity of text columns"
+    ),
+    near_duplicate_threshold: float = Query(0.9, gt=0, le=1),
+    column_stats: bool = Query(
+        False,
+        description="Add per-column statistics (quantiles, distinct counts, top values) to the analysis"
+    ),
+    impute: Optional[str] = Query(
+        None,
+        description='JSON object of per-column fills, e.g. {"price": "median", '
+                    '"city": {"strategy": "constant", "value": "N/A"}, '
+                    '"score": {"strategy": "mean", "group_by": "team"}}'
+    ),
+    output_format: Literal["csv", "csv.gz", "csv.zst", "parquet", "feather"] = Query(
+        "csv",
+        description="Format of the cleaned file"
+    ),
+    output_compression: Optional[str] = Query(
+        None,
+        description="parquet: snappy (default), zstd, gzip, lz4, brotli, none; "
+                    "feather: lz4 (default), zstd, uncompressed"
+    ),
+    row_group_size: Optional[int] = Query(None, gt=0, description="Rows per parquet row group"),
+    plan: Optional[str] = Query(
+        None,
+        description='JSON list of cleaning steps run instead of dedup + fill, e.g. '
+                    '[{"op": "trim", "columns": ["city"]}, '
+                    '{"op": "filter", "column": "price", "operator": ">", "value": 0}, '
+                    '{"op": "dedup"}, {"op": "impute", "strategies": {"price": "median"}}]'
+    ),
+    explain: bool = Query(False, description="Add the optimized cleaning plan to the result"),
+    engine: Optional[Literal["pandas", "arrow"]] = Query(
+        None,
+        description="pandas, or arrow (multi-threaded pyarrow); default: CLEANING_ENGINE. "
+                    "Options arrow lacks (streaming, near-duplicates, column stats, "
+                    "group-wise fills, plans, explain) run on pandas"
+    ),
+) -> dict:
+    """
+    Query options shared by the pipeline endpoints, as run_pipeline kwargs.
+    """
+    dedup_subset = None
+    if dedup_columns:
+        dedup_subset = [col.strip() for col in dedup_columns.split(",") if col.strip()]
+
+    impute_strategies = None
+    if impute:
+        try:
+            impute_strategies = json.loads(impute)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="impute must be valid JSON")
+        if not isinstance(impute_strategies, dict):
+            raise HTTPException(status_code=400, detail="impute must be a JSON object")
+
+    from app.services.cleaning_plan import parse_plan
+    from app.services.output_formats import output_spec
+
+    cleaning_plan = None
+    if plan:
+        try:
+            cleaning_plan = json.loads(plan)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="plan must be valid JSON")
+        if dedup_subset or near_duplicates or impute_strategies:
+            raise HTTPException(
+                status_code=400,
+                detail="A cleaning plan replaces dedup_columns, near_duplicates and impute; put them in the plan"
+            )
+
+    try:
+        output_spec(output_format, output_compression, row_group_size)
+        if cleaning_plan is not None:
+            cleaning_plan = parse_plan(cleaning_plan)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "chunk_size": chunk_size,
+        "optimize": optimize_dtypes,
+        "dedup_subset": dedup_subset,
+        "near_duplicates": near_duplicates,
+        "near_duplicate_threshold": near_duplicate_threshold,
+        "impute_strategies": impute_strategies,
+        "column_stats": column_stats,
+        "output_format": output_format,
+        "output_compression": output_compression,
+        "row_group_size": row_group_size,
+        "plan": cleaning_plan,
+        "explain": explain,
+        "engine": engine
+    }
+
+
+def _resolve_options(record: FileRecord, options: dict) -> dict:
+    if options["chunk_size"] is None and record.size_bytes > STREAMING_THRESHOLD_MB * 1024 * 1024:
+        return dict(options, chunk_size=CLEAN_CHUNK_SIZE)
+    return options
+
+
+def _result_cache_key(record: FileRecord, options: dict) -> str:
+    from app.services.data_cleaning import CLEANING_ENGINE, PIPELINE_VERSION
+
+    # The default engine is configuration; key on the one that runs
+    return cache_key(record.sha256, dict(options, engine=options["engine"] or CLEANING_ENGINE), PIPELINE_VERSION)
+
+
+def _pipeline_response(analysis: dict, cleaning_result: dict, cached: bool = False, job_id: int = None):
+    return {
+        "job_id": job_id,
+        "analysis": analysis,
+        "cleaning_summary": cleaning_result,
+        "cleaning_steps": cleaning_result["steps"],
+        "cleaned_file_path": cleaning_result["cleaned_file_path"],
+        "cached": cached
+    }
+
+
+def _get_job(job_id: int, user_email: str, db: Session) -> CleaningHistory:
+    history = db.get(CleaningHistory, job_id)
+    if history is None or history.user_email != user_email:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return history
+
+
+@router.post("/clean-csv")
+def upload_and_clean_csv(
+    file: UploadFile = File(...),
+    options: dict = Depends(pipeline_options),
+    timings: bool = Query(False, description="Add per-stage timings to the response"),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    with collect_stages() as timer:
+        # -------------------------
+        # SAVE FILE
+        # -------------------------
+        record = _save_upload(file, user_email, db)
+        options = _resolve_options(record, options)
+
+        # -------------------------
+        # ANALYZE + CLEAN (single parse, or cached)
+        # -------------------------
+        key = _result_cache_key(record, options)
+        with stage("cache_lookup"):
+            cached = get_cached_result(key)
+
+        if cached:
+            analysis, cleaning_result = cached
+        else:
+            from app.services.data_cleaning import run_pipeline
+
+            try:
+                # Its own output file: other runs on this upload may be writing theirs
+                analysis, cleaning_result = run_pipeline(record.stored_path, **options, run_id=uuid.uuid4().hex)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            with stage("cache_store"):
+                analysis, cleaning_result = store_result(key, analysis, cleaning_result)
+
+        with stage("activity_log"):
+            log_pipeline_result(user_email, analysis, cleaning_result)
+
+        # -------------------------
+        # HISTORY
+        # -------------------------
+        with stage("history_commit"):
+            history = CleaningHistory(user_email=user_email, file_id=record.id)
+            apply_pipeline_result(history, analysis, cleaning_result)
+            db.add(history)
+            db.commit()
+
+    response = _pipeline_response(analysis, cleaning_result, cached=cached is not None, job_id=history.id)
+    run_timings = record_run(timer, "clean-csv", record.size_bytes, analysis["total_rows"])
+    if timings:
+        response["timings"] = run_timings
+    return response
+
+
+# -------------------------
+# PROFILE ONLY
+# -------------------------
+@router.post("/profile")
+def upload_and_profile_csv(
+    file: UploadFile = File(...),
+    mode: Literal["exact", "sketch"] = Query(
+        "exact",
+        description="exact: full analysis; sketch: one streaming pass of estimates with error bounds"
+    ),
+    options: dict = Depends(pipeline_options),
+    timings: bool = Query(False, description="Add per-stage timings to the response"),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Analyze a CSV without cleaning it.
+    """
+    from app.services.data_cleaning import analyze_csv, sketch_csv
+
+    with collect_stages() as timer:
+        record = _save_upload(file, user_email, db)
+
+        if mode == "sketch":
+            analysis = sketch_csv(record.stored_path, options["chunk_size"] or CLEAN_CHUNK_SIZE)
+        else:
+            options = _resolve_options(record, options)
+            try:
+                analysis = analyze_csv(
+                    record.stored_path,
+                    chunk_size=options["chunk_size"],
+                    optimize=options["optimize"],
+                    dedup_subset=options["dedup_subset"],
+                    column_stats=options["column_stats"],
+                    engine=options["engine"]
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # LOG: ANALYZE
+        with stage("activity_log"):
+            log_activity(
+                user_email,
+                "ANALYZE",
+                f"Rows: {analysis['total_rows']}, Columns: {analysis['total_columns']} ({mode})"
+            )
+
+    response = {"mode": mode, "analysis": analysis}
+    run_timings = record_run(timer, f"profile-{mode}", record.size_bytes, analysis["total_rows"])
+    if timings:
+        response["timings"] = run_timings
+    return response
+
+
+# -------------------------
+# BACKGROUND JOBS
+# -------------------------
+@router.post("/jobs", response_model=schemas.JobSubmitResponse, status_code=202)
+def submit_clean_job(
+    file: UploadFile = File(...),
+    options: dict = Depends(pipeline_options),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue the analyze/clean pipeline and return a job id immediately.
+    Poll /pipeline/jobs/{job_id} for status.
+    """
+    record = _save_upload(file, user_email, db)
+    return _queue_job(record, options, user_email, db)
+
+
+def _queue_job(record: FileRecord, options: dict, user_email: str, db: Session) -> dict:
+    options = _resolve_options(record, options)
+    key = _result_cache_key(record, options)
+
+    history = CleaningHistory(
+        user_email=user_email,
+        status="PENDING",
+        file_id=record.id
+    )
+
+    # Cache hit: the job is complete before it is queued
+    cached = get_cached_result(key)
+    if cached:
+        apply_pipeline_result(history, *cached)
+        db.add(history)
+        db.commit()
+        db.refresh(history)
+        log_pipeline_result(user_email, *cached)
+        return {"job_id": history.id, "status": history.status}
+
+    db.add(history)
+    db.commit()
+    db.refresh(history)
+
+    try:
+        submit_cleaning_job(history.id, record.stored_path, options, key)
+    except JobQueueFull:
+        db.delete(history)
+        db.commit()
+        raise HTTPException(
+            status_code=503,
+            detail="Too many cleaning jobs in progress, retry later",
+            headers={"Retry-After": "30"}
+        )
+    except Exception as e:
+        # Never leave a job PENDING that no worker will pick up
+        history.status = "FAILED"
+        history.error = f"Could not queue the job: {e}"
+        history.cleaned_at = datetime.utcnow()
+        db.commit()
+        raise
+
+    return {"job_id": history.id, "status": history.status}
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobStatusResponse)
+def get_job_status(
+    job_id: int,
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    history = _get_job(job_id, user_email, db)
+
+    return {
+        "job_id": history.id,
+        "status": history.status,
+        "created_at": history.created_at,
+        "cleaned_at": history.cleaned_at if history.status != "PENDING" else None,
+        "error": history.error
+    }
+
+
+def _job_state(job_id: int):
+    # Own short session: an event stream must not hold a connection
+    db = SessionLocal()
+    try:
+        history = db.get(CleaningHistory, job_id)
+        if history is None:
+            return None
+        return {"user_email": history.user_email, "status": history.status, "error": history.error}
+    finally:
+        db.close()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: int,
+    request: Request,
+    user_email: str = Depends(get_current_user),
+):
+    """
+    Server-Sent Events for a job: `progress` events while it runs (stage,
+    read pass, rows read, estimated rows, rows per second, ETA), then one
+    `done` event with its final status and error.
+    """
+    state = await run_in_threadpool(_job_state, job_id)
+    if state is None or state["user_email"] != user_email:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        version = None
+        quiet = 0.0
+        while not await request.is_disconnected():
+            progress = job_progress(job_id)
+            if progress is None:
+                # Finished, or running in another API process (status only)
+                state = await run_in_threadpool(_job_state, job_id)
+                if state["status"] != "PENDING":
+                    yield _sse("done", {"status": state["status"], "error": state["error"]})
+                    return
+                delay = max(JOB_EVENTS_POLL_SECONDS, 1.0)
+            else:
+                current = progress.pop("version")
+                if current != version:
+                    version = current
+                    yield _sse("progress", progress)
+                    quiet = 0.0
+                delay = JOB_EVENTS_POLL_SECONDS
+
+            await asyncio.sleep(delay)
+            quiet += delay
+            if quiet >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                quiet = 0.0
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(
+    job_id: int,
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    history = _get_job(job_id, user_email, db)
+
+    if history.status == "PENDING":
+        raise HTTPException(status_code=409, detail="Job is still running")
+
+    if history.status == "FAILED":
+        raise HTTPException(status_code=422, detail=f"Job failed: {history.error}")
+
+    result = json.loads(history.result)
+    return _pipeline_response(result["analysis"], result["cleaning_summary"], job_id=history.id)
+
+
+# -------------------------
+# RESUMABLE UPLOADS (TUS-STYLE)
+# -------------------------
+TUS_HEADERS = {"Tus-Resumable": "1.0.0", "Cache-Control": "no-store"}
+
+
+def _get_upload(upload_id: str, user_email: str) -> dict:
+    info = load_upload(upload_id)
+    if info is None or info["user_email"] != user_email:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return info
+
+
+def _offset_headers(info: dict, offset: int) -> dict:
+    return dict(TUS_HEADERS, **{"Upload-Offset": str(offset), "Upload-Length": str(info["length"])})
+
+
+@router.post("/uploads", response_model=schemas.UploadStatusResponse, status_code=201)
+def create_resumable_upload(
+    upload: schemas.UploadCreate,
+    user_email: str = Depends(get_current_user),
+):
+    """
+    Start a resumable upload. Send the file as chunks of chunk_size bytes
+    with PATCH (Upload-Offset header = chunk start, any order, in
+    parallel), check progress with HEAD or GET, then POST .../complete.
+    """
+    try:
+        info = create_upload(user_email, upload.filename, upload.length, upload.chunk_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(
+        upload_status(info),
+        status_code=201,
+        headers=dict(_offset_headers(info, 0), Location=f"{router.prefix}/uploads/{info['upload_id']}")
+    )
+
+
+@router.head("/uploads/{upload_id}")
+def get_upload_offset(upload_id: str, user_email: str = Depends(get_current_user)):
+    info = _get_upload(upload_id, user_email)
+    return Response(status_code=200, headers=_offset_headers(info, upload_status(info)["offset"]))
+
+
+@router.get("/uploads/{upload_id}", response_model=schemas.UploadStatusResponse)
+def get_upload_status(upload_id: str, user_email: str = Depends(get_current_user)):
+    """
+    Offset plus the chunks still missing, for resuming parallel uploads.
+    """
+    return upload_status(_get_upload(upload_id, user_email))
+
+
+@router.patch("/uploads/{upload_id}", status_code=204)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    user_email: str = Depends(get_current_user),
+):
+    """
+    Write one chunk at Upload-Offset. The body is streamed to the file in
+    COPY_BUFFER_SIZE blocks. A chunk is only recorded once complete; an
+    interrupted one is simply sent again.
+    """
+    info = await run_in_threadpool(_get_upload, upload_id, user_email)
+    try:
+        index, expected = chunk_span(info, upload_offset)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    declared = request.headers.get("content-length")
+    if declared is not None and not declared.isdigit():
+        raise HTTPException(status_code=400, detail="Content-Length must be a number of bytes")
+    if declared is not None and int(declared) != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+
+    try:
+        return await _receive_chunk(info, request, index, upload_offset, expected)
+    except FileNotFoundError:
+        # Cancelled (DELETE) while the chunk was coming in
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+async def _receive_chunk(info: dict, request: Request, index: int, upload_offset: int, expected: int):
+    received = await run_in_threadpool(received_chunks, info)
+    if received[index]:
+        # Already stored (and possibly hashed): never rewrite it
+        return Response(status_code=204, headers=_offset_headers(info, upload_status(info)["offset"]))
+
+    position = upload_offset
+    buffer = bytearray()
+    async for piece in request.stream():
+        if position - upload_offset + len(buffer) + len(piece) > expected:
+            raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+        buffer += piece
+        if len(buffer) >= COPY_BUFFER_SIZE:
+            await run_in_threadpool(write_at, info, position, bytes(buffer))
+            position += len(buffer)
+            buffer.clear()
+    if buffer:
+        await run_in_threadpool(write_at, info, position, bytes(buffer))
+        position += len(buffer)
+
+    if position - upload_offset != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} is incomplete, send it again")
+
+    offset = await run_in_threadpool(mark_received, info, index)
+    return Response(status_code=204, headers=_offset_headers(info, offset))
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+def cancel_upload(upload_id: str, user_email: str = Depends(get_current_user)):
+    delete_upload(_get_upload(upload_id, user_email))
+    return Response(status_code=204, headers=TUS_HEADERS)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=schemas.JobSubmitResponse, status_code=202)
+def complete_upload(
+    upload_id: str,
+    sha256: Optional[str] = Query(None, min_length=64, max_length=64, description="Expected SHA-256 of the file"),
+    options: dict = Depends(pipeline_options),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Finish an upload whose chunks have all arrived and queue its cleaning
+    job (as POST /pipeline/jobs does). The file's SHA-256 was computed
+    while the chunks came in.
+    """
+    info = _get_upload(upload_id, user_email)
+    try:
+        with stage("upload_copy"):
+            digest, stored_path, size_bytes = finish_upload(info, sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FileNotFoundError:
+        # Completed (or cancelled) by a concurrent request
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    record = _add_file_record(info["filename"], digest, stored_path, size_bytes, user_email, db)
+    return _queue_job(record, options, user_email, db)
+
+
+# -------------------------
+# BATCH (MANY FILES / ARCHIVES)
+# -------------------------
+def _store_batch(files: List[UploadFile]) -> list:
+    """
+    Stream every CSV of the request (archive members one at a time) to
+    storage. Returns {"filename", "sha256", "stored_path", "size_bytes"}
+    per CSV, in upload order.
+    """
+    stored = []
+    for upload in files:
+        try:
+            for name, fileobj in iter_csv_files(upload.filename, upload.file):
+                if len(stored) >= BATCH_MAX_FILES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"A batch holds at most {BATCH_MAX_FILES} CSV files"
+                    )
+                sha256, stored_path, size_bytes = store_upload(fileobj)
+                stored.append({
+                    "filename": name,
+                    "sha256": sha256,
+                    "stored_path": stored_path,
+                    "size_bytes": size_bytes
+                })
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{upload.filename}: {e}")
+        except ARCHIVE_ERRORS as e:
+            raise HTTPException(status_code=400, detail=f"Could not read {upload.filename}: {e}")
+    return stored
+
+
+def _batch_summary(files: list) -> dict:
+    completed = [f for f in files if f["status"] == "COMPLETED"]
+    rows_after = sum(f["rows_after"] for f in completed)
+
+    summary = {
+        "files": len(files),
+        "completed": len(completed),
+        "failed": len(files) - len(completed),
+        "cached": sum(1 for f in completed if f["cached"]),
+        "size_bytes": sum(f["size_bytes"] for f in files),
+        "rows_before": sum(f["rows_before"] for f in completed),
+        "rows_after": rows_after,
+        "duplicates_removed": sum(f["duplicates_removed"] for f in completed),
+        "missing_values_fixed": sum(f["missing_values_fixed"] for f in completed),
+        "data_quality_score": None
+    }
+    if rows_after:
+        # Weighted by the rows each file contributes
+        summary["data_quality_score"] = round(
+            sum(f["data_quality_score"] * f["rows_after"] for f in completed) / rows_after, 2
+        )
+    return summary
+
+
+@router.post("/batch")
+def upload_and_clean_batch(
+    files: List[UploadFile] = File(..., description="CSV files and/or zip or tar archives of CSV files"),
+    options: dict = Depends(pipeline_options),
+    timings: bool = Query(False, description="Add per-stage timings to the response"),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Analyze and clean many CSVs in one request. Archive members are
+    streamed to storage one at a time, never extracted as a whole. Files
+    run on the job process pool, at most BATCH_CONCURRENCY at once; one
+    failing file does not fail the batch. Returns a summary per file
+    (with its job id) and totals.
+    """
+    with collect_stages() as timer:
+        # -------------------------
+        # SAVE FILES
+        # -------------------------
+        with stage("upload_copy"):
+            stored = _store_batch(files)
+        if not stored:
+            raise HTTPException(status_code=400, detail="No CSV files in the upload")
+
+        with stage("file_record"):
+            user_id = db.query(User.id).filter(User.email == user_email).scalar()
+            records = [
+                FileRecord(
+                    original_filename=item["filename"],
+                    stored_path=item["stored_path"],
+                    sha256=item["sha256"],
+                    size_bytes=item["size_bytes"],
+                    user_id=user_id
+                ) if item["size_bytes"] else None
+                for item in stored
+            ]
+            db.add_all([record for record in records if record])
+            db.flush()
+
+            # (result, run options, cache key) per stored file
+            results = []
+            for item, record in zip(stored, records):
+                result = {
+                    "filename": item["filename"],
+                    "file_id": record.id if record else None,
+                    "job_id": None,
+                    "size_bytes": item["size_bytes"],
+                    "status": "FAILED",
+                    "cached": False,
+                    "error": None if record else "Uploaded file is empty"
+                }
+                run_options = _resolve_options(record, options) if record else None
+                key = _result_cache_key(record, run_options) if record else None
+                results.append((result, run_options, key))
+            db.commit()
+
+        # -------------------------
+        # ANALYZE + CLEAN (cached, or on the pool)
+        # -------------------------
+        outcomes = {}
+        tasks = {}
+        with stage("cache_lookup"):
+            for (result, run_options, key), item in zip(results, stored):
+                if key is None or key in outcomes or key in tasks:
+                    continue
+                cached = get_cached_result(key)
+                if cached:
+                    outcomes[key] = (cached, None, True)
+                else:
+                    # Identical files with identical options run once
+                    tasks[key] = (item["stored_path"], run_options)
+
+        try:
+            outputs = run_pipelines(list(tasks.values()))
+        except JobQueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many cleaning jobs in progress, retry later",
+                headers={"Retry-After": "30"}
+            )
+
+        for key, (output, stages, error) in zip(tasks, outputs):
+            if error is None:
+                timer.merge(stages)
+                with stage("cache_store"):
+                    output = store_result(key, *output)
+            outcomes[key] = (output, error, False)
+
+        # -------------------------
+        # HISTORY (one commit) + ACTIVITY (one bulk write)
+        # -------------------------
+        histories = []
+        activity = []
+        for result, _, key in results:
+            if key is None:
+                continue
+            activity.append(activity_entry(user_email, "UPLOAD", f"Uploaded file: {result['filename']}"))
+
+            output, error, cached = outcomes[key]
+            history = CleaningHistory(user_email=user_email, file_id=result["file_id"])
+            if error is not None:
+                history.status = "FAILED"
+                history.error = str(error) or error.__class__.__name__
+                history.cleaned_at = datetime.utcnow()
+                result["error"] = history.error
+            else:
+                analysis, cleaning_result = output
+                apply_pipeline_result(history, analysis, cleaning_result)
+                activity.extend(pipeline_activity(user_email, analysis, cleaning_result))
+                result.update(
+                    status="COMPLETED",
+                    cached=cached,
+                    total_columns=analysis["total_columns"],
+                    rows_before=cleaning_result["rows_before"],
+                    rows_after=cleaning_result["rows_after"],
+                    duplicates_removed=cleaning_result["duplicates_removed"],
+                    missing_values_fixed=cleaning_result["missing_values_fixed"],
+                    data_quality_score=cleaning_result["data_quality_score"],
+                    output_format=cleaning_result.get("output_format", "csv"),
+                    cleaned_file_path=cleaning_result["cleaned_file_path"]
+                )
+            histories.append((result, history))
+
+        with stage("history_commit"):
+            db.add_all([history for _, history in histories])
+            db.flush()
+            for result, history in histories:
+                result["job_id"] = history.id
+            db.commit()
+
+        results = [result for result, _, _ in results]
+        summary = _batch_summary(results)
+        activity.append(activity_entry(
+            user_email,
+            "BATCH",
+            f"Files: {summary['files']}, Completed: {summary['completed']}, Failed: {summary['failed']}"
+        ))
+        with stage("activity_log"):
+            log_activities(activity)
+
+    response = {"summary": summary, "files": results}
+    run_timings = record_run(timer, "batch", summary["size_bytes"], summary["rows_before"])
+    if timings:
+        response["timings"] = run_timings
+    return response
+
+
+# -------------------------
+# DATASETS (INCREMENTAL VERSIONS)
+# -------------------------
+def _dataset_versions(user_id: int, dataset: str, db: Session):
+    return (
+        db.query(CleaningHistory, FileRecord)
+        .join(FileRecord, CleaningHistory.file_id == FileRecord.id)
+        .filter(FileRecord.user_id == user_id, FileRecord.dataset == dataset)
+    )
+
+
+@router.post("/datasets/{dataset}/versions")
+def upload_dataset_version(
+    dataset: str = Path(..., min_length=1, max_length=200),
+    file: UploadFile = File(...),
+    options: dict = Depends(pipeline_options),
+    timings: bool = Query(False, description="Add per-stage timings to the response"),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload the next version of an append-only dataset. Only the rows
+    appended since the latest version are cleaned and added to its
+    cleaned file; cleaning_summary.incremental tells whether the version
+    was appended or cleaned in full, and why.
+    """
+    unsupported = [name for name in ("near_duplicates", "column_stats", "plan", "explain") if options[name]]
+    if options["engine"] == "arrow":
+        unsupported.append("engine=arrow")
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Incremental cleaning does not support: {', '.join(unsupported)}"
+        )
+
+    with collect_stages() as timer:
+        user_id = db.query(User.id).filter(User.email == user_email).scalar()
+        parent = (
+            _dataset_versions(user_id, dataset, db)
+            .filter(CleaningHistory.status == "COMPLETED", CleaningHistory.state_path.isnot(None))
+            .order_by(CleaningHistory.id.desc())
+            .first()
+        )
+        parent = parent[0] if parent else None
+
+        record = _save_upload(file, user_email, db, dataset=dataset, parent_id=parent.file_id if parent else None)
+
+        from app.services.data_cleaning import clean_version
+
+        try:
+            analysis, cleaning_result, state_path = clean_version(
+                record.stored_path,
+                dataset_dir(user_id, dataset),
+                parent.state_path if parent else None,
+                chunk_size=options["chunk_size"] or CLEAN_CHUNK_SIZE,
+                dedup_subset=options["dedup_subset"],
+                impute_strategies=options["impute_strategies"],
+                output_format=options["output_format"],
+                output_compression=options["output_compression"],
+                source_sha256=record.sha256
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        with stage("activity_log"):
+            log_pipeline_result(user_email, analysis, cleaning_result)
+
+        with stage("history_commit"):
+            history = CleaningHistory(
+                user_email=user_email,
+                file_id=record.id,
+                parent_id=parent.id if parent else None,
+                state_path=state_path
+            )
+            apply_pipeline_result(history, analysis, cleaning_result)
+            db.add(history)
+            db.commit()
+
+    response = _pipeline_response(analysis, cleaning_result, job_id=history.id)
+    response["dataset"] = dataset
+    response["parent_job_id"] = history.parent_id
+    # Throughput of the work done: the appended rows
+    run_timings = record_run(
+        timer, "dataset-version", record.size_bytes, cleaning_result["incremental"]["rows_processed"]
+    )
+    if timings:
+        response["timings"] = run_timings
+    return response
+
+
+@router.get("/datasets/{dataset}/versions", response_model=list[schemas.DatasetVersionResponse])
+def list_dataset_versions(
+    dataset: str = Path(..., min_length=1, max_length=200),
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Lineage of a dataset: every uploaded version, the run it extended
+    and whether it was appended or cleaned in full.
+    """
+    user_id = db.query(User.id).filter(User.email == user_email).scalar()
+    versions = _dataset_versions(user_id, dataset, db).order_by(CleaningHistory.id).all()
+    if not versions:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    response = []
+    for number, (history, record) in enumerate(versions, start=1):
+        incremental = {}
+        if history.result:
+            incremental = json.loads(history.result)["cleaning_summary"].get("incremental", {})
+        response.append({
+            "version": number,
+            "job_id": history.id,
+            "parent_job_id": history.parent_id,
+            "file_id": record.id,
+            "original_filename": record.original_filename,
+            "size_bytes": record.size_bytes,
+            "status": history.status,
+            "rows_after": history.rows_after,
+            "mode": incremental.get("mode"),
+            "rows_processed": incremental.get("rows_processed"),
+            "cleaned_at": history.cleaned_at
+        })
+    return response
+
+
+# -------------------------
+# DOWNLOAD
+# -------------------------
+def _download_name(history: CleaningHistory, db: Session) -> str:
+    from app.services.output_formats import OUTPUT_FORMATS
+
+    original = db.query(FileRecord.original_filename).filter(FileRecord.id == history.file_id).scalar()
+    stem = os.path.splitext(os.path.basename(original or f"job_{history.id}"))[0]
+    return stem + "_cleaned" + OUTPUT_FORMATS[history.output_format or "csv"]["suffix"]
+
+
+@router.post("/jobs/{job_id}/download-link")
+def create_download_link(
+    job_id: int,
+    user_email: str = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Signed link to the cleaned file of a run, for clients (a browser) that
+    fetch it directly instead of sending the Authorization header.
+    """
+    _get_job(job_id, user_email, db)
+    token = create_download_token(user_email, job_id)
+    return {
+        "url": f"/pipeline/jobs/{job_id}/download?token={token}",
+        "expires_in": DOWNLOAD_TOKEN_EXPIRE_SECONDS
+    }
+
+
+@router.get("/jobs/{job_id}/download")
+def download_cleaned_file(
+    job_id: int,
+    request: Request,
+    user_email: str = Depends(get_download_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Stream the cleaned file of a finished run (clean-csv or job), to the
+    Authorization header or a ?token= from /download-link. Supports
+    a single byte Range for resumed downloads, If-None-Match / If-Range
+    against a content-hash ETag, and gzip for CSV output when the client
+    accepts it. The file is read in DOWNLOAD_CHUNK_SIZE pieces.
+    """
+    history = _get_job(job_id, user_email, db)
+
+    if history.status == "PENDING":
+        raise HTTPException(status_code=409, detail="Job is still running")
+
+    if history.status == "FAILED":
+        raise HTTPException(status_code=422, detail=f"Job failed: {history.error}")
+
+    path = history.cleaned_file_path
+    if not path:
+        raise HTTPException(status_code=404, detail="This run produced no cleaned file")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Cleaned file is no longer available")
+
+    # Rows written before hashes were recorded at write time: hash once
+    if history.cleaned_sha256 is None:
+        history.cleaned_sha256 = file_sha256(path)
+        db.commit()
+
+    size = os.path.getsize(path)
+    output_format = history.output_format or "csv"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(_download_name(history, db)),
+        "Vary": "Accept-Encoding",
+    }
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or etag_matches(if_range, f'"{history.cleaned_sha256}"', strong=True):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    # Ranges always refer to the stored bytes, so they are sent as-is
+    gzip = (
+        byte_range is None
+        and output_format in COMPRESSIBLE_FORMATS
+        and accepts_gzip(request.headers.get("accept-encoding"))
+    )
+    headers["ETag"] = f'"{history.cleaned_sha256}-gzip"' if gzip else f'"{history.cleaned_sha256}"'
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if byte_range is None or byte_range[0] == 0:
+        log_activity(user_email, "DOWNLOAD", f"Downloaded cleaned file of job {history.id}")
+
+    media_type = MEDIA_TYPES[output_format]
+
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(iter_gzip(path), media_type=media_type, headers=headers)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_file(path), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_file(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@router.get("/cache/stats")
+def get_cache_stats(user_email: str = Depends(get_admin_user)):
+    """
+    Result cache counters for this worker process and on-disk usage.
+    The cache is shared by all users, so only admins see it.
+    """
+    return cache_stats()
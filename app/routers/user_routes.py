@@ -1,73 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-
-from app.database import SessionLocal
-from app.models import User
-from app import schemas
-from app.utils.security import hash_password, verify_password
-from app.auth import create_access_token
-from app.utils.activity_logger import log_activity
-
-router = APIRouter(prefix="/users", tags=["Users"])
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.post("/register")
-def register_user(user: schemas.UserRegister, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    new_user = User(
-        email=user.email,
-        hashed_password=hash_password(user.password)
-    )
-
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    log_activity(
-        db,
-        user.email,
-        "REGISTER",
-        "New user registered"
-    )
-
-    return {"message": "User registered successfully"}
-
-
-@router.post("/login", response_model=schemas.TokenResponse)
-def login_user(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
-):
-    db_user = db.query(User).filter(
-        User.email == form_data.username
-    ).first()
-
-    if not db_user or not verify_password(
-        form_data.password, db_user.hashed_password
-    ):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    log_activity(
-        db,
-        db_user.email,
-        "LOGIN",
-        "User logged in"
-    )
-
-    token = create_access_token({"sub": db_user.email})
-
-    return {
-        "access_token": token,
-        "token_type": "bearer"
-    }
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db
+from app.models import User
+from app import schemas
+from app.utils.security import PasswordHasherBusy, hash_password_async, verify_password_async
+from app.auth import create_access_token
+from app.utils.activity_logger import log_activity_async
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many login attempts in progress, retry later",
+        headers={"Retry-After": "1"}
+    )
+
+
+@router.post("/register")
+async def register_user(user: schemas.UserRegister, db: Session = Depends(get_db)):
+    # Database calls go to the thread pool, bcrypt to its own bounded pool
+    if await run_in_threadpool(_find_user, db, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    new_user = User(
+        email=user.email,
+        hashed_password=hashed_password
+    )
+
+    def save():
+        db.add(new_user)
+        db.commit()
+
+    await run_in_threadpool(save)
+
+    await log_activity_async(
+        user.email,
+        "REGISTER",
+        "New user registered"
+    )
+
+    return {"message": "User registered successfully"}
+
+
+@router.post("/login", response_model=schemas.TokenResponse)
+async def login_user(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    db_user = await run_in_threadpool(_find_user, db, form_data.username)
+
+    try:
+        valid = db_user is not None and await verify_password_async(
+            form_data.password, db_user.hashed_password
+        )
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    await log_activity_async(
+        db_user.email,
+        "LOGIN",
+        "User logged in"
+    )
+
+    token = create_access_token({"sub": db_user.email})
+
+    return {
+        "access_token": token,
+        "token_type": "bearer"
+    }
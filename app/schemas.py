@@ -1,59 +1,142 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
-
-
-# -------------------------
-# USER SCHEMAS
-# -------------------------
-class UserRegister(BaseModel):
-    email: EmailStr
-    password: str
-
-
-# ⚠️ NOTE:
-# This is kept only for frontend validation / documentation.
-# Actual login uses OAuth2PasswordRequestForm (form-data).
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
-
-
-class TokenResponse(BaseModel):
-    access_token: str
-    token_type: str = "bearer"
-
-
-# -------------------------
-# FILE RESPONSE SCHEMA
-# -------------------------
-class FileResponse(BaseModel):
-    original_filename: str
-    stored_path: str
-    uploaded_at: datetime
-
-
-# -------------------------
-# CLEANING RESULT SCHEMA
-# -------------------------
-class CleaningResult(BaseModel):
-    rows_before: int
-    rows_after: int
-    duplicates_removed: int
-    missing_values_fixed: int
-    data_quality_score: int
-    cleaned_file_path: str
-
-
-# -------------------------
-# CLEANING HISTORY SCHEMA
-# -------------------------
-class CleaningHistoryResponse(BaseModel):
-    id: int
-    rows_before: int
-    rows_after: int
-    duplicates_removed: int
-    missing_values_fixed: int
-    data_quality_score: int
-    cleaned_file_path: str
-    cleaned_at: datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+# -------------------------
+# USER SCHEMAS
+# -------------------------
+class UserRegister(BaseModel):
+    email: EmailStr
+    password: str
+
+
+# ⚠️ NOTE:
+# This is kept only for frontend validation / documentation.
+# Actual login uses OAuth2PasswordRequestForm (form-data).
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+
+
+# -------------------------
+# FILE RESPONSE SCHEMA
+# -------------------------
+class FileResponse(BaseModel):
+    original_filename: str
+    stored_path: str
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    uploaded_at: datetime
+
+
+# -------------------------
+# CLEANING RESULT SCHEMA
+# -------------------------
+class CleaningResult(BaseModel):
+    rows_before: int
+    rows_after: int
+    duplicates_removed: int
+    missing_values_fixed: int
+    data_quality_score: int
+    cleaned_file_path: str
+
+
+# -------------------------
+# BACKGROUND JOB SCHEMAS
+# -------------------------
+class JobSubmitResponse(BaseModel):
+    job_id: int
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: int
+    status: str
+    created_at: datetime
+    cleaned_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+# -------------------------
+# CLEANING HISTORY SCHEMA
+# -------------------------
+class CleaningHistoryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: str
+    file_id: Optional[int] = None
+    rows_before: Optional[int] = None
+    rows_after: Optional[int] = None
+    duplicates_removed: Optional[int] = None
+    missing_values_fixed: Optional[int] = None
+    data_quality_score: Optional[int] = None
+    cleaned_file_path: Optional[str] = None
+    output_format: Optional[str] = "csv"
+    error: Optional[str] = None
+    created_at: datetime
+    cleaned_at: Optional[datetime] = None
+
+
+class CleaningHistoryPage(BaseModel):
+    items: List[CleaningHistoryResponse]
+    next_cursor: Optional[str] = None   # pass as ?cursor= for the next page
+
+
+# -------------------------
+# ACTIVITY LOG SCHEMA
+# -------------------------
+class ActivityLogResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    action: str
+    description: Optional[str] = None
+    created_at: datetime
+
+
+class ActivityLogPage(BaseModel):
+    items: List[ActivityLogResponse]
+    next_cursor: Optional[str] = None
+
+
+# -------------------------
+# DATASET VERSION SCHEMA
+# -------------------------
+class DatasetVersionResponse(BaseModel):
+    version: int
+    job_id: int
+    parent_job_id: Optional[int] = None
+    file_id: int
+    original_filename: str
+    size_bytes: Optional[int] = None
+    status: str
+    rows_after: Optional[int] = None
+    mode: Optional[str] = None          # append or full
+    rows_processed: Optional[int] = None
+    cleaned_at: Optional[datetime] = None
+
+
+# -------------------------
+# RESUMABLE UPLOAD SCHEMAS
+# -------------------------
+class UploadCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    length: int = Field(..., gt=0, description="Size of the whole file in bytes")
+    chunk_size: Optional[int] = Field(None, gt=0, description="Bytes per chunk (default: UPLOAD_CHUNK_MB)")
+
+
+class UploadStatusResponse(BaseModel):
+    upload_id: str
+    filename: str
+    length: int
+    chunk_size: int
+    chunks: int
+    offset: int                 # bytes received without a gap from the start
+    missing_chunks: List[int]
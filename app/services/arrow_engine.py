@@ -0,0 +1,399 @@
+import os
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from app.services.dtype_optimizer import CATEGORY_MAX_RATIO
+from app.services.imputation import column_mean, describe, resolve_strategies
+from app.services.output_formats import stable_arrow_type
+from app.utils.storage import HashingWriter
+
+# Threads for Arrow's CSV reader and kernels (0: one per CPU)
+ARROW_THREADS = int(os.getenv("ARROW_THREADS", 0))
+if ARROW_THREADS > 0:
+    pa.set_cpu_count(ARROW_THREADS)
+
+# pandas.read_csv's default missing-value markers, so both engines see
+# the same nulls
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+]
+# pandas only reads these as booleans (Arrow would also take 1/0)
+TRUE_VALUES = ["True", "TRUE", "true"]
+FALSE_VALUES = ["False", "FALSE", "false"]
+
+_CONVERSION_ERROR = re.compile(r"CSV column #(\d+)")
+
+
+# -------------------------
+# READ
+# -------------------------
+def _convert_options(column_types: dict) -> pacsv.ConvertOptions:
+    return pacsv.ConvertOptions(
+        null_values=PANDAS_NA_VALUES,
+        true_values=TRUE_VALUES,
+        false_values=FALSE_VALUES,
+        strings_can_be_null=True,
+        column_types=column_types
+    )
+
+
+class UnsupportedCSV(Exception):
+    """
+    The file reads differently in pandas (duplicate column names are
+    renamed there); it is cleaned by the pandas engine instead.
+    """
+
+
+def read_table(file_path: str):
+    """
+    Multi-threaded CSV parse with pandas' inference rules: no date
+    parsing, and a column whose later blocks do not fit the type
+    inferred from the first block is read as text (pandas: object).
+    Returns None for an empty file.
+    """
+    try:
+        # Types are inferred from the first block, as in the full read
+        with pacsv.open_csv(file_path, convert_options=_convert_options({})) as reader:
+            schema = reader.schema
+    except pa.ArrowInvalid as e:
+        if "Empty CSV file" in str(e):
+            return None
+        raise ValueError(f"Could not parse CSV: {e}")
+
+    if len(set(schema.names)) < len(schema.names):
+        raise UnsupportedCSV()
+
+    # Keep dates as written; pandas leaves them as text too
+    column_types = {field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)}
+    while True:
+        try:
+            table = pacsv.read_csv(file_path, convert_options=_convert_options(column_types))
+            break
+        except pa.ArrowInvalid as e:
+            match = _CONVERSION_ERROR.search(str(e))
+            if match is None:
+                raise ValueError(f"Could not parse CSV: {e}")
+            column_types[schema.names[int(match.group(1))]] = pa.string()
+
+    # pandas names blank headers 'Unnamed: <position>'
+    names = [name or f"Unnamed: {i}" for i, name in enumerate(table.column_names)]
+    return table.rename_columns(names)
+
+
+# -------------------------
+# DTYPES (as the pandas engine reports them)
+# -------------------------
+def column_kinds(table: pa.Table) -> dict:
+    """
+    bool, int, float or text: how pandas would load each column (an
+    integer or boolean column with nulls is float or object there).
+    """
+    kinds = {}
+    for name, column in zip(table.column_names, table.columns):
+        kind = column.type
+        if pa.types.is_boolean(kind):
+            kinds[name] = "text" if column.null_count else "bool"
+        elif pa.types.is_integer(kind):
+            kinds[name] = "float" if column.null_count else "int"
+        elif pa.types.is_floating(kind):
+            kinds[name] = "float"
+        elif pa.types.is_null(kind):
+            # Empty columns are float in pandas, unless there are no rows
+            kinds[name] = "float" if len(column) else "text"
+        else:
+            kinds[name] = "text"
+    return kinds
+
+
+def _optimized_dtype(column: pa.ChunkedArray, kind: str) -> str:
+    """
+    The dtype optimize_dtypes gives the pandas column.
+    """
+    if kind == "bool":
+        return "bool"
+
+    if kind == "int":
+        if not len(column):
+            return "int64"
+        bounds = pc.min_max(column)
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        for name in ("int8", "int16", "int32"):
+            info = np.iinfo(name)
+            if info.min <= low and high <= info.max:
+                return name
+        return "int64"
+
+    if kind == "float":
+        if column.null_count or pa.types.is_null(column.type):
+            return "float64"
+        values = pc.cast(column, pa.float64())
+        narrowed = pc.cast(pc.cast(values, pa.float32(), safe=False), pa.float64())
+        return "float32" if pc.all(pc.equal(values, narrowed)).as_py() is not False else "float64"
+
+    distinct = 0 if pa.types.is_null(column.type) else pc.count_distinct(column, mode="only_valid").as_py()
+    if distinct <= CATEGORY_MAX_RATIO * len(column):
+        return "category"
+    return "string" if pa.types.is_string(column.type) else "object"
+
+
+def pandas_dtypes(table: pa.Table, kinds: dict, optimize: bool) -> dict:
+    plain = {"bool": "bool", "int": "int64", "float": "float64", "text": "object"}
+    if not optimize:
+        return {name: plain[kinds[name]] for name in table.column_names}
+    return {name: _optimized_dtype(table[name], kinds[name]) for name in table.column_names}
+
+
+# -------------------------
+# DUPLICATES
+# -------------------------
+def _as_float(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Float values as pandas holds an integer column with nulls: rounded
+    to the nearest double above 2**53 rather than rejected.
+    """
+    return pc.cast(column, pa.float64(), safe=False)
+
+
+def _dedup_key(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    The values pandas compares in df.duplicated(): integers with nulls
+    as floats, and -0.0 equal to 0.0 (Arrow groups them apart).
+    """
+    if pa.types.is_integer(column.type) and column.null_count:
+        column = _as_float(column)
+    if pa.types.is_floating(column.type):
+        column = pc.if_else(pc.equal(column, 0), pa.scalar(0.0, column.type), column)
+    return column
+
+
+def first_rows(table: pa.Table, subset: list = None) -> np.ndarray:
+    """
+    Positions of the rows df.duplicated(subset) would keep (the first of
+    each set of equal rows), from a multi-threaded hash aggregation.
+    """
+    if not table.num_rows:
+        return np.arange(0)
+
+    names = subset or table.column_names
+    # All-null columns are equal on every row
+    keys = [name for name in names if not pa.types.is_null(table[name].type)]
+    if not keys:
+        return np.arange(1)
+
+    key_names = [f"k{i}" for i in range(len(keys))]
+    grouped = pa.table(
+        [_dedup_key(table[name]) for name in keys] + [pa.array(np.arange(table.num_rows))],
+        names=key_names + ["row"]
+    ).group_by(key_names, use_threads=True).aggregate([("row", "min")])
+
+    return np.sort(grouped["row_min"].to_numpy())
+
+
+# -------------------------
+# ANALYSIS
+# -------------------------
+def analysis(table: pa.Table, kinds: dict, kept_rows: int, optimize: bool) -> dict:
+    result = {
+        "total_rows": table.num_rows,
+        "total_columns": table.num_columns,
+        "missing_values": {name: table[name].null_count for name in table.column_names},
+        "duplicate_rows": table.num_rows - kept_rows,
+        "columns": pandas_dtypes(table, kinds, optimize=False)
+    }
+    if optimize:
+        # Arrow columns are already compact; nothing is converted
+        result["memory"] = {
+            "before_bytes": table.nbytes,
+            "after_bytes": table.nbytes,
+            "saved_bytes": 0,
+            "dtypes": pandas_dtypes(table, kinds, optimize=True)
+        }
+    return result
+
+
+# -------------------------
+# MISSING VALUES
+# -------------------------
+def _as_text(column: pa.ChunkedArray, kind: str) -> pa.ChunkedArray:
+    """
+    Text as the pandas engine writes the column once it holds strings.
+    """
+    if pa.types.is_string(column.type):
+        return column
+    if pa.types.is_boolean(column.type):
+        return pc.if_else(column, "True", "False")
+
+    values = column.to_pandas()
+    if kind == "float":
+        values = values.astype("float64")
+    return pa.chunked_array([pa.array(values.astype(str).where(values.notna(), None), pa.string())])
+
+
+def _mode(column: pa.ChunkedArray):
+    """
+    Most frequent value, the smallest on ties (as Series.mode()[0]).
+    """
+    counts = pc.value_counts(column.drop_null())
+    if not len(counts):
+        return None
+    order = pc.sort_indices(
+        pa.table({"value": counts.field("values"), "count": counts.field("counts")}),
+        sort_keys=[("count", "descending"), ("value", "ascending")]
+    )
+    return counts.field("values")[order[0].as_py()].as_py()
+
+
+def _mean(values: pa.ChunkedArray):
+    """
+    The pandas engine's mean to the last bit (see column_mean); Arrow
+    sums in another order.
+    """
+    if len(values) == values.null_count:
+        return None
+    return column_mean(values.drop_null().to_numpy())
+
+
+def _fill(column: pa.ChunkedArray, kind: str, spec: dict) -> pa.ChunkedArray:
+    strategy = spec["strategy"]
+
+    if kind == "text":
+        column = _as_text(column, kind)
+        if strategy == "mode":
+            value = _mode(column)
+        else:
+            value = spec["value"]
+        return column if value is None else pc.fill_null(column, str(value))
+
+    # Only float columns (ints with nulls included) have nulls to fill
+    values = _as_float(column)
+    if strategy == "constant":
+        value = spec["value"]
+        if not isinstance(value, (int, float)):
+            # pandas turns the column into mixed text
+            return column if value is None else pc.fill_null(_as_text(column, kind), str(value))
+    elif strategy == "mean":
+        value = _mean(values)
+    elif strategy == "median":
+        value = pc.quantile(values, q=0.5).to_pylist()[0] if len(values.drop_null()) else None
+    else:
+        value = _mode(values)
+
+    if value is None:
+        return values
+    return pc.fill_null(values, pa.scalar(float(value), pa.float64()))
+
+
+def impute(table: pa.Table, kinds: dict, strategies: dict = None):
+    """
+    Fill missing values like imputation.impute(): same strategies,
+    defaults, validation and steps. Returns (table, steps).
+    """
+    text_columns = {name for name, kind in kinds.items() if kind == "text"}
+    plan = resolve_strategies(table.column_names, text_columns, strategies)
+
+    targets = [name for name in table.column_names if table[name].null_count > 0]
+    columns = []
+    for name in table.column_names:
+        column = table[name]
+        if name in targets:
+            column = _fill(column, kinds[name], plan[name])
+        columns.append(column)
+
+    steps = [describe(name, plan[name]) for name in targets]
+    return pa.table(columns, names=table.column_names), steps
+
+
+# -------------------------
+# WRITE
+# -------------------------
+# Rows formatted per pass when writing CSV
+CSV_BATCH_ROWS = 65_536
+
+
+def _csv_text(column: pa.Array, as_float: bool) -> pa.Array:
+    """
+    Values as DataFrame.to_csv formats them: floats by numpy (1.0,
+    1e+16), booleans as True/False, nulls left null.
+    """
+    if as_float:
+        values = np.asarray(column.to_numpy(zero_copy_only=False), dtype="float64")
+        return pa.array(values.astype(str), pa.string(), mask=column.is_null().to_numpy(zero_copy_only=False))
+    if pa.types.is_boolean(column.type):
+        return pc.if_else(column, "True", "False")
+    if pa.types.is_null(column.type):
+        return pa.nulls(len(column), pa.string())
+    return pc.cast(column, pa.string())
+
+
+def _csv_lines(fields: list) -> pa.Buffer:
+    """
+    One CSV line per row, quoted as csv.QUOTE_MINIMAL does (only fields
+    holding a comma, quote or newline; a lone empty field is quoted).
+    """
+    quoted = []
+    for field in fields:
+        field = pc.fill_null(field, "")
+        needs_quotes = pc.match_substring_regex(field, '[,"\n]')
+        field = pc.if_else(
+            needs_quotes,
+            pc.binary_join_element_wise('"', pc.replace_substring(field, '"', '""'), '"', ""),
+            field
+        )
+        quoted.append(field)
+    if len(quoted) == 1:
+        lines = pc.if_else(pc.equal(quoted[0], ""), '""', quoted[0])
+    else:
+        lines = pc.binary_join_element_wise(*quoted, ",")
+    lines = pc.binary_join_element_wise(lines, "", "\n")
+    text = pc.binary_join(pa.ListArray.from_arrays([0, len(lines)], lines), "")
+    return text[0].as_buffer()
+
+
+def _write_csv(table: pa.Table, out):
+    """
+    Same bytes as DataFrame.to_csv(index=False) gives for the frame the
+    pandas engine holds: Arrow's CSV writer quotes every string and
+    writes 1.0 as 1, so the text is built here, a batch at a time.
+    """
+    # Integer columns with nulls are float columns in pandas
+    floats = [
+        pa.types.is_floating(column.type) or pa.types.is_integer(column.type) and column.null_count > 0
+        for column in table.columns
+    ]
+    out.write(_csv_lines([pa.array([name], pa.string()) for name in table.column_names]))
+    for batch in table.to_batches(max_chunksize=CSV_BATCH_ROWS):
+        out.write(_csv_lines([_csv_text(column, as_float) for column, as_float in zip(batch.columns, floats)]))
+
+
+def write_table(table: pa.Table, path: str, spec: dict):
+    """
+    Write in the requested output format (see output_formats). Returns
+    the SHA-256 of the written file.
+    """
+    if not spec["format"].startswith("csv"):
+        # Same schema as the pandas engine writes (see output_formats)
+        table = table.cast(pa.schema([
+            (name, stable_arrow_type(column.type)) for name, column in zip(table.column_names, table.columns)
+        ]))
+
+    with HashingWriter(path) as out:
+        if spec["format"] == "csv":
+            _write_csv(table, out)
+        elif spec["format"].startswith("csv."):
+            codec = "gzip" if spec["format"] == "csv.gz" else "zstd"
+            with pa.CompressedOutputStream(out, codec) as stream:
+                _write_csv(table, stream)
+        elif spec["format"] == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, out, compression=spec["compression"], row_group_size=spec["row_group_size"])
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, out, compression=spec["compression"])
+    return out.hexdigest()
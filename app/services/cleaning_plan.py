@@ -0,0 +1,549 @@
+import operator
+import numpy as np
+import pandas as pd
+
+from app.services.dedup import duplicate_mask, near_duplicate_mask
+from app.services.dtype_optimizer import is_text_dtype
+from app.services.imputation import column_spec, describe, fill_column
+from app.utils.metrics import stage
+
+OPS = ("dedup", "impute", "trim", "cast", "filter", "rename")
+CAST_TYPES = ("int", "float", "string", "bool", "datetime", "category")
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+FILTER_OPERATORS = tuple(COMPARISONS) + ("in", "not_in", "is_null", "not_null")
+
+_BOOL_TEXT = {
+    "true": True, "t": True, "yes": True, "y": True, "1": True, "1.0": True,
+    "false": False, "f": False, "no": False, "n": False, "0": False, "0.0": False,
+}
+
+
+# -------------------------
+# PARSING
+# -------------------------
+def _column_list(i: int, value, name: str = "columns"):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(col, str) for col in value):
+        raise ValueError(f"Plan step {i + 1}: '{name}' must be a list of column names")
+    return value
+
+
+def _column_map(i: int, value, allowed: tuple = None) -> dict:
+    if not isinstance(value, dict) or not value:
+        raise ValueError(f"Plan step {i + 1}: 'columns' must be an object mapping columns to values")
+    for col, target in value.items():
+        if not isinstance(target, str) or (allowed and target not in allowed):
+            expected = f"one of {', '.join(allowed)}" if allowed else "a column name"
+            raise ValueError(f"Plan step {i + 1}: '{col}' maps to {target!r}, expected {expected}")
+    return dict(value)
+
+
+def _parse_step(i: int, step) -> dict:
+    if not isinstance(step, dict) or step.get("op") not in OPS:
+        raise ValueError(f"Plan step {i + 1}: 'op' must be one of {', '.join(OPS)}")
+    op = step["op"]
+
+    if op == "dedup":
+        threshold = step.get("threshold", 0.9)
+        if not isinstance(threshold, (int, float)) or not 0 < threshold <= 1:
+            raise ValueError(f"Plan step {i + 1}: 'threshold' must be in (0, 1]")
+        return {
+            "op": op,
+            "columns": _column_list(i, step.get("columns")),
+            "near": bool(step.get("near", False)),
+            "threshold": float(threshold)
+        }
+
+    if op == "impute":
+        strategies = step.get("strategies") or {}
+        if not isinstance(strategies, dict):
+            raise ValueError(f"Plan step {i + 1}: 'strategies' must be an object")
+        columns = _column_list(i, step.get("columns"))
+        extra = [col for col in strategies if columns and col not in columns]
+        if extra:
+            raise ValueError(f"Plan step {i + 1}: strategies for columns not in 'columns': {', '.join(extra)}")
+        return {"op": op, "columns": columns, "strategies": strategies}
+
+    if op == "trim":
+        return {"op": op, "columns": _column_list(i, step.get("columns"))}
+
+    if op == "cast":
+        return {"op": op, "columns": _column_map(i, step.get("columns"), CAST_TYPES)}
+
+    if op == "rename":
+        return {"op": op, "columns": _column_map(i, step.get("columns"))}
+
+    # filter
+    column = step.get("column")
+    comparison = step.get("operator")
+    if not isinstance(column, str):
+        raise ValueError(f"Plan step {i + 1}: filter needs a 'column'")
+    if comparison not in FILTER_OPERATORS:
+        raise ValueError(f"Plan step {i + 1}: 'operator' must be one of {', '.join(FILTER_OPERATORS)}")
+    value = step.get("value")
+    if comparison in ("in", "not_in") and not isinstance(value, list):
+        raise ValueError(f"Plan step {i + 1}: '{comparison}' needs a list 'value'")
+    if comparison in COMPARISONS and value is None:
+        raise ValueError(f"Plan step {i + 1}: '{comparison}' needs a 'value'")
+    return {"op": op, "column": column, "operator": comparison, "value": value}
+
+
+def parse_plan(plan) -> list:
+    """
+    Validate a cleaning plan: a list of steps applied in order, e.g.
+
+        [{"op": "trim", "columns": ["city"]},
+         {"op": "cast", "columns": {"price": "float"}},
+         {"op": "filter", "column": "price", "operator": ">", "value": 0},
+         {"op": "dedup", "columns": ["id"]},
+         {"op": "impute", "strategies": {"price": "median"}},
+         {"op": "rename", "columns": {"price": "price_eur"}}]
+
+    Returns the steps with defaults filled in; raises ValueError.
+    """
+    if not isinstance(plan, list) or not plan:
+        raise ValueError("A cleaning plan must be a non-empty list of steps")
+    return [_parse_step(i, step) for i, step in enumerate(plan)]
+
+
+def default_plan(
+    dedup_subset: list = None,
+    near_duplicates: bool = False,
+    near_duplicate_threshold: float = 0.9,
+    impute_strategies: dict = None
+) -> list:
+    """
+    The built-in cleaning (drop duplicates, then fill nulls) as a plan.
+    """
+    return [
+        {"op": "dedup", "columns": dedup_subset, "near": near_duplicates, "threshold": near_duplicate_threshold},
+        {"op": "impute", "columns": None, "strategies": impute_strategies or {}},
+    ]
+
+
+# -------------------------
+# OPTIMIZER
+# -------------------------
+def _describe_filter(step: dict) -> str:
+    if step["operator"] in ("is_null", "not_null"):
+        return f"{step['column']} {step['operator']}"
+    return f"{step['column']} {step['operator']} {step['value']!r}"
+
+
+def _source(current: dict, i: int, name: str) -> str:
+    if name not in current:
+        raise ValueError(f"Plan step {i + 1}: unknown column '{name}'")
+    return current[name]
+
+
+def _row_wise_fill(columns: list, strategies: dict, text: set) -> bool:
+    """
+    True when every fill is a constant, i.e. does not depend on the
+    other rows (the default fill of a numeric column is its mean).
+    """
+    for col in columns:
+        spec = strategies.get(col)
+        if spec is None:
+            if col not in text:
+                return False
+        elif not isinstance(spec, dict) or spec.get("strategy") != "constant":
+            return False
+    return True
+
+
+def _resolve_names(steps: list, dtypes: dict):
+    """
+    Rewrite every step in terms of the source columns, so renames cost
+    nothing until one relabel at the end, and expand 'all columns'
+    defaults. Returns (steps, final names of renamed columns).
+    """
+    current = {col: col for col in dtypes}   # name at this step -> source column
+    text = {col for col, dtype in dtypes.items() if is_text_dtype(dtype)}
+    resolved = []
+
+    for i, step in enumerate(steps):
+        op = step["op"]
+
+        def source(name):
+            return _source(current, i, name)
+
+        if op == "rename":
+            for name in step["columns"]:
+                source(name)
+            renamed = {}
+            for name, source_col in current.items():
+                new_name = step["columns"].get(name, name)
+                if new_name in renamed:
+                    raise ValueError(f"Plan step {i + 1}: rename would duplicate column '{new_name}'")
+                renamed[new_name] = source_col
+            current = renamed
+            continue
+
+        if op == "filter":
+            resolved.append(dict(step, column=source(step["column"])))
+
+        elif op == "dedup":
+            columns = [source(col) for col in step["columns"]] if step["columns"] else None
+            resolved.append(dict(step, columns=columns))
+
+        elif op == "trim":
+            columns = (
+                [source(col) for col in step["columns"]] if step["columns"]
+                else [col for col in current.values() if col in text]
+            )
+            resolved.append(dict(step, columns=columns))
+
+        elif op == "cast":
+            casts = {source(col): to for col, to in step["columns"].items()}
+            for col, to in casts.items():
+                if to in ("string", "category"):
+                    text.add(col)
+                else:
+                    text.discard(col)
+            resolved.append(dict(step, columns=casts))
+
+        else:
+            columns = [source(col) for col in step["columns"]] if step["columns"] else list(current.values())
+            strategies = {}
+            for col, spec in step["strategies"].items():
+                if isinstance(spec, dict) and spec.get("group_by"):
+                    spec = dict(spec, group_by=source(spec["group_by"]))
+                strategies[source(col)] = spec
+
+            row_wise = _row_wise_fill(columns, strategies, text)
+            resolved.append(dict(step, columns=columns, strategies=strategies, row_wise=row_wise))
+
+    renames = {source_col: name for name, source_col in current.items() if name != source_col}
+    return resolved, renames
+
+
+def _commutes(filter_step: dict, step: dict) -> bool:
+    """
+    True when running filter_step before step gives the same result.
+    """
+    column = filter_step["column"]
+    op = step["op"]
+
+    if op in ("trim", "cast"):
+        # row-wise: only the filtered column's own transform matters
+        return column not in step["columns"]
+    if op == "impute":
+        # statistics (mean, median, mode) depend on the rows present
+        return step["row_wise"] and column not in step["columns"]
+    if op == "dedup":
+        # rows sharing a key also share the filtered value
+        return not step["near"] and (step["columns"] is None or column in step["columns"])
+    return False
+
+
+def _push_filters(steps: list, rewrites: list) -> list:
+    ordered = []
+    for step in steps:
+        if step["op"] != "filter":
+            ordered.append(step)
+            continue
+
+        position = len(ordered)
+        while position > 0 and _commutes(step, ordered[position - 1]):
+            position -= 1
+        if position < len(ordered):
+            passed = ", ".join(s["op"] for s in ordered[position:])
+            rewrites.append(f"pushed filter '{_describe_filter(step)}' before {passed}")
+        ordered.insert(position, step)
+    return ordered
+
+
+def _column_links(step: dict) -> dict:
+    if step["op"] == "trim":
+        return {col: {"op": "trim"} for col in step["columns"]}
+    if step["op"] == "cast":
+        return {col: {"op": "cast", "to": to} for col, to in step["columns"].items()}
+    return {col: {"op": "impute", "spec": step["strategies"].get(col)} for col in step["columns"]}
+
+
+def _group_keys(links: dict) -> set:
+    return {
+        link["spec"]["group_by"] for link in links.values()
+        if link["op"] == "impute" and isinstance(link["spec"], dict) and link["spec"].get("group_by")
+    }
+
+
+def _fuse(steps: list, rewrites: list, fuse: bool = True) -> list:
+    """
+    Group steps into passes over the frame: consecutive filters and
+    dedups become one row selection (a single take), consecutive trims,
+    casts and fills become one column pass with a chain per column.
+    """
+    passes = []
+    for step in steps:
+        last = passes[-1] if passes and fuse else None
+
+        if step["op"] in ("filter", "dedup"):
+            if last and last["pass"] == "rows":
+                last["ops"].append(step)
+                rewrites.append(f"fused {step['op']} into the previous row selection")
+            else:
+                passes.append({"pass": "rows", "ops": [step]})
+            continue
+
+        links = _column_links(step)
+        # group-wise fills read their key as it was when the pass started
+        if last and last["pass"] == "columns" and not _group_keys(links) & set(last["columns"]):
+            for col, link in links.items():
+                chain = last["columns"].setdefault(col, [])
+                if chain and chain[-1] == link and link["op"] in ("trim", "cast"):
+                    continue
+                chain.append(link)
+            rewrites.append(f"fused {step['op']} into the previous column pass")
+        else:
+            passes.append({"pass": "columns", "columns": {col: [link] for col, link in links.items()}})
+
+    return passes
+
+
+def optimize_plan(steps: list, dtypes: dict, optimize: bool = True) -> dict:
+    """
+    Physical plan for parsed steps over a frame with these dtypes.
+    Renames become one relabel at the end; filters move ahead of the
+    steps they commute with (never changing the result), and adjacent
+    row steps and column steps are fused into single passes. With
+    optimize=False every step is its own pass, in the given order.
+    """
+    rewrites = []
+    resolved, renames = _resolve_names(steps, dtypes)
+    if renames and any(step["op"] == "rename" for step in steps):
+        rewrites.append("renames applied once at the end; steps refer to source columns")
+
+    if optimize:
+        resolved = _push_filters(resolved, rewrites)
+    passes = _fuse(resolved, rewrites, fuse=optimize)
+
+    if renames:
+        passes.append({"pass": "rename", "columns": renames})
+
+    return {"steps": steps, "passes": passes, "rewrites": rewrites if optimize else []}
+
+
+def explain_plan(optimized: dict) -> dict:
+    """
+    JSON view of an optimized plan, as returned by explain=true.
+    """
+    def show(data_pass):
+        if data_pass["pass"] != "columns":
+            return data_pass
+        # columns with the same chain are listed together
+        chains = {}
+        for col, chain in data_pass["columns"].items():
+            ops = [
+                {"op": "impute", "strategy": link["spec"] or "default"} if link["op"] == "impute" else link
+                for link in chain
+            ]
+            chains.setdefault(repr(ops), {"columns": [], "ops": ops})["columns"].append(col)
+        return {"pass": "columns", "chains": list(chains.values())}
+
+    frame_passes = sum(1 for data_pass in optimized["passes"] if data_pass["pass"] != "rename")
+    return {
+        "steps": optimized["steps"],
+        "optimized": [show(data_pass) for data_pass in optimized["passes"]],
+        "rewrites": optimized["rewrites"],
+        "frame_passes": {
+            "before": sum(1 for step in optimized["steps"] if step["op"] != "rename"),
+            "after": frame_passes
+        }
+    }
+
+
+# -------------------------
+# EXECUTION
+# -------------------------
+def _filter_mask(series: pd.Series, step: dict) -> np.ndarray:
+    """
+    Rows matching the filter. Nulls only match is_null.
+    """
+    comparison = step["operator"]
+    if comparison == "is_null":
+        return series.isna().to_numpy()
+
+    present = series.notna().to_numpy()
+    if comparison == "not_null":
+        return present
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(series.cat.categories.dtype)
+
+    try:
+        if comparison in ("in", "not_in"):
+            matched = series.isin(step["value"])
+            if comparison == "not_in":
+                matched = ~matched
+        else:
+            matched = COMPARISONS[comparison](series, step["value"])
+    except TypeError:
+        raise ValueError(f"Cannot apply filter '{_describe_filter(step)}' to a {series.dtype} column")
+
+    return matched.fillna(False).to_numpy(dtype=bool) & present
+
+
+def _select_rows(df: pd.DataFrame, ops: list, steps: list, stats: dict) -> pd.DataFrame:
+    keep = np.arange(len(df))
+
+    for op in ops:
+        if op["op"] == "filter":
+            mask = _filter_mask(df[op["column"]].take(keep), op)
+            removed = len(keep) - int(mask.sum())
+            keep = keep[mask]
+            stats["rows_filtered"] += removed
+            if removed:
+                steps.append(f"Removed {removed} rows not matching {_describe_filter(op)}")
+            continue
+
+        subset = df[op["columns"]] if op["columns"] else df
+        rows = subset.take(keep) if len(keep) < len(df) else subset
+        remove = duplicate_mask(rows).to_numpy()
+        duplicate_rows = int(remove.sum())
+        near_rows = 0
+        if op["near"]:
+            near = near_duplicate_mask(rows, threshold=op["threshold"]).to_numpy() & ~remove
+            near_rows = int(near.sum())
+            remove = remove | near
+        keep = keep[~remove]
+
+        stats["duplicates_removed"] += duplicate_rows + near_rows
+        if duplicate_rows:
+            steps.append(f"Removed {duplicate_rows} duplicate rows")
+        if near_rows:
+            steps.append(f"Removed {near_rows} near-duplicate rows")
+
+    return df.take(keep) if len(keep) < len(df) else df
+
+
+def _strip(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _has_strings(series: pd.Series) -> bool:
+    """
+    True when the column holds strings to trim; object and category
+    columns may hold only booleans or numbers, or mix them with text.
+    """
+    values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    return kind == "string" or kind.startswith("mixed") and any(isinstance(value, str) for value in values)
+
+
+def _trim(series: pd.Series) -> pd.Series:
+    """
+    Strip the values that are strings, leaving any others as they are.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        stripped = series.cat.categories.map(_strip)
+        if stripped.is_unique:
+            return series.cat.rename_categories(stripped)
+        return series.astype(object).map(_strip).astype("category")
+
+    if pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return series.str.strip()
+    return series.map(_strip)
+
+
+def _cast(series: pd.Series, to: str) -> pd.Series:
+    if to == "category":
+        return series.astype("category")
+
+    values = series.astype(object) if isinstance(series.dtype, pd.CategoricalDtype) else series
+
+    if to == "string":
+        return values.astype(object).where(values.isna(), values.astype(str))
+    if to == "datetime":
+        return pd.to_datetime(values, errors="coerce")
+    if to == "bool":
+        text = values.astype(str).str.strip().str.lower().where(values.notna())
+        return text.map(_BOOL_TEXT).astype("boolean")
+
+    numbers = pd.to_numeric(values, errors="coerce")
+    if to == "float":
+        return numbers.astype("float64")
+    # int: values with a fraction cannot be represented and become null
+    return numbers.where(numbers % 1 == 0).astype("Int64")
+
+
+def _map_columns(df: pd.DataFrame, chains: dict, steps: list, stats: dict) -> pd.DataFrame:
+    changed = {}
+    trimmed = []
+
+    for col, chain in chains.items():
+        series = df[col]
+        for link in chain:
+            if link["op"] == "trim":
+                if is_text_dtype(series.dtype) and _has_strings(series):
+                    series = _trim(series)
+                    if col not in trimmed:
+                        trimmed.append(col)
+
+            elif link["op"] == "cast":
+                nulls = int(series.isna().sum())
+                series = _cast(series, link["to"])
+                lost = int(series.isna().sum()) - nulls
+                steps.append(
+                    f"Cast '{col}' to {link['to']}"
+                    + (f" ({lost} values could not be converted)" if lost else "")
+                )
+
+            else:
+                nulls = int(series.isna().sum())
+                if not nulls:
+                    continue
+                raw = link["spec"]
+                if raw is None and pd.api.types.is_bool_dtype(series.dtype):
+                    raw = "mode"
+                spec = column_spec(col, is_text_dtype(series.dtype), raw)
+                keys = df[spec["group_by"]] if spec["group_by"] else None
+                try:
+                    series = fill_column(series, spec, keys)
+                except TypeError:
+                    raise ValueError(f"Cannot fill '{col}' ({series.dtype}) with {spec['strategy']}")
+                stats["missing_values_fixed"] += nulls - int(series.isna().sum())
+                steps.append(describe(col, spec))
+
+        changed[col] = series
+
+    if trimmed:
+        steps.append("Trimmed whitespace in " + ", ".join(f"'{col}'" for col in trimmed))
+    if not changed:
+        return df
+    result = df.copy(deep=False)
+    for col, series in changed.items():
+        result[col] = series
+    return result
+
+
+def execute_plan(df: pd.DataFrame, optimized: dict):
+    """
+    Run the passes of optimize_plan() over df.
+    Returns (df, steps, stats) where stats counts duplicates_removed,
+    rows_filtered and missing_values_fixed.
+    """
+    steps = []
+    stats = {"duplicates_removed": 0, "rows_filtered": 0, "missing_values_fixed": 0}
+
+    for data_pass in optimized["passes"]:
+        with stage(f"plan_{data_pass['pass']}"):
+            if data_pass["pass"] == "rows":
+                df = _select_rows(df, data_pass["ops"], steps, stats)
+            elif data_pass["pass"] == "columns":
+                df = _map_columns(df, data_pass["columns"], steps, stats)
+            else:
+                df = df.rename(columns=data_pass["columns"])
+                steps.append("Renamed " + ", ".join(f"'{old}' to '{new}'" for old, new in data_pass["columns"].items()))
+
+    return df, steps, stats
@@ -1,89 +1,1187 @@
-import pandas as pd
-from pandas.errors import EmptyDataError
-
-
-def analyze_csv(file_path: str):
-    try:
-        df = pd.read_csv(file_path)
-    except EmptyDataError:
-        return {
-            "total_rows": 0,
-            "total_columns": 0,
-            "missing_values": {},
-            "duplicate_rows": 0,
-            "columns": {}
-        }
-
-    return {
-        "total_rows": len(df),
-        "total_columns": len(df.columns),
-        "missing_values": df.isnull().sum().to_dict(),
-        "duplicate_rows": int(df.duplicated().sum()),
-        "columns": df.dtypes.astype(str).to_dict()
-    }
-
-
-def clean_csv(file_path: str):
-    try:
-        df = pd.read_csv(file_path)
-    except EmptyDataError:
-        return {
-            "cleaned_file_path": None,
-            "steps": [],
-            "rows_before": 0,
-            "rows_after": 0,
-            "duplicates_removed": 0,
-            "missing_values_fixed": 0,
-            "data_quality_score": 0
-        }
-
-    rows_before = len(df)
-    duplicate_rows = int(df.duplicated().sum())
-    missing_values_fixed = int(df.isnull().sum().sum())
-
-    steps = []
-
-    # -------------------------
-    # REMOVE DUPLICATES
-    # -------------------------
-    if duplicate_rows > 0:
-        df = df.drop_duplicates()
-        steps.append(f"Removed {duplicate_rows} duplicate rows")
-
-    # -------------------------
-    # HANDLE MISSING VALUES
-    # -------------------------
-    for col in df.columns:
-        if df[col].isnull().any():
-            if df[col].dtype == "object":
-                df[col] = df[col].fillna("Unknown")
-                steps.append(f"Filled missing values in '{col}' with 'Unknown'")
-            else:
-                df[col] = df[col].fillna(df[col].mean())
-                steps.append(f"Filled missing values in '{col}' with mean")
-
-    rows_after = len(df)
-
-    # -------------------------
-    # SAVE CLEANED FILE
-    # -------------------------
-    cleaned_file_path = file_path.replace(".csv", "_cleaned.csv")
-    df.to_csv(cleaned_file_path, index=False)
-
-    # -------------------------
-    # DATA QUALITY SCORE
-    # -------------------------
-    quality_score = max(
-        40,
-        100 - duplicate_rows - int(missing_values_fixed / max(rows_before, 1))
-    )
-
-    return {
-        "cleaned_file_path": cleaned_file_path,
-        "steps": steps,
-        "rows_before": rows_before,
-        "rows_after": rows_after,
-        "duplicates_removed": duplicate_rows,
-        "missing_values_fixed": missing_values_fixed,
-        "data_quality_score": min(quality_score, 100)
-    }
+import os
+import json
+import math
+import uuid
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.errors import DtypeWarning, EmptyDataError
+
+from app.services.cleaning_plan import default_plan, execute_plan, explain_plan, optimize_plan, parse_plan
+from app.services.dedup import (
+    FingerprintIndex,
+    column_hashes,
+    combine_hashes,
+    duplicate_mask,
+    near_duplicate_mask,
+    row_fingerprints,
+)
+from app.services.dtype_optimizer import frame_memory, optimize_dtypes
+from app.services.imputation import RunningMean, impute, streaming_fills
+from app.services.output_formats import (
+    APPENDABLE_FORMATS,
+    OUTPUT_FORMATS,
+    ChunkWriter,
+    cleaned_path,
+    output_spec,
+    write_frame,
+)
+from app.services.profiling import PROFILE_TOP_K, QUANTILES, json_value, profile_columns
+from app.services.sketches import (
+    SKETCH_CMS_DELTA,
+    SKETCH_CMS_EPSILON,
+    SKETCH_HEAVY_HITTER_SHARE,
+    CountMinSketch,
+    HyperLogLog,
+    Reservoir,
+    TDigest,
+    quantile_rank_error,
+)
+from app.utils.metrics import stage, timed_iter
+from app.utils.storage import copy_hashed, file_sha256
+
+# Bump whenever a change alters analysis or cleaning output;
+# it is part of the result cache key.
+PIPELINE_VERSION = "5"
+
+# Engine for runs that do not pick one: pandas, or arrow (pyarrow's
+# multi-threaded CSV reader and compute kernels, see arrow_engine)
+CLEANING_ENGINE = os.getenv("CLEANING_ENGINE", "pandas")
+ENGINES = ("pandas", "arrow")
+
+# Fingerprint run files an incremental dataset keeps before merging them
+INCREMENTAL_MAX_RUNS = int(os.getenv("INCREMENTAL_MAX_RUNS", 8))
+
+
+def _empty_analysis():
+    return {
+        "total_rows": 0,
+        "total_columns": 0,
+        "missing_values": {},
+        "duplicate_rows": 0,
+        "columns": {}
+    }
+
+
+def _empty_cleaning_result(output_format: str = "csv", engine: str = "pandas"):
+    return {
+        "cleaned_file_path": None,
+        "cleaned_sha256": None,
+        "output_format": output_format,
+        "engine": engine,
+        "steps": [],
+        "rows_before": 0,
+        "rows_after": 0,
+        "duplicates_removed": 0,
+        "missing_values_fixed": 0,
+        "data_quality_score": 0
+    }
+
+
+def _cleaning_summary(
+    cleaned_file: tuple,
+    steps: list,
+    rows_before: int,
+    rows_after: int,
+    duplicate_rows: int,
+    missing_values_fixed: int,
+    output_format: str = "csv",
+    engine: str = "pandas"
+):
+    """
+    cleaned_file is (path, sha256) of the written output; the hash is taken
+    while writing so downloads never re-read the file for their ETag.
+    """
+    cleaned_file_path, cleaned_sha256 = cleaned_file
+
+    # -------------------------
+    # DATA QUALITY SCORE
+    # -------------------------
+    quality_score = max(
+        40,
+        100 - duplicate_rows - int(missing_values_fixed / max(rows_before, 1))
+    )
+
+    return {
+        "cleaned_file_path": cleaned_file_path,
+        "cleaned_sha256": cleaned_sha256,
+        "output_format": output_format,
+        "engine": engine,
+        "steps": steps,
+        "rows_before": rows_before,
+        "rows_after": rows_after,
+        "duplicates_removed": duplicate_rows,
+        "missing_values_fixed": missing_values_fixed,
+        "data_quality_score": min(quality_score, 100)
+    }
+
+
+def _partial_path(path: str) -> str:
+    """
+    Private temp name next to path. Outputs are written there and renamed
+    into place, so concurrent runs on the same stored upload never see a
+    half-written file.
+    """
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def _is_mixed(series: pd.Series) -> bool:
+    """
+    Object column holding numbers or bools next to strings, as the
+    parser leaves a column whose blocks were typed differently.
+    """
+    return series.dtype == "object" and pd.api.types.infer_dtype(series, skipna=True).startswith("mixed")
+
+
+def _read_csv(file_path: str):
+    """
+    Parse the CSV once. Returns None for an empty file.
+    Mixed columns (see _is_mixed) are read again as text, so '1' and 1
+    are one value, as in streaming mode and on the arrow engine.
+    """
+    try:
+        with warnings.catch_warnings():
+            # The mixed columns it warns about are read again below
+            warnings.simplefilter("ignore", DtypeWarning)
+            df = pd.read_csv(file_path)
+    except EmptyDataError:
+        return None
+
+    mixed = [col for col in df.columns if _is_mixed(df[col])]
+    if mixed:
+        df = pd.read_csv(file_path, dtype={col: object for col in mixed})
+    return df
+
+
+def _load_frame(file_path: str, optimize: bool):
+    """
+    Parse the CSV and, if asked, compact its dtypes.
+    Returns (df, dtypes, memory): dtypes as read (before the
+    optimization), and memory the bytes before/after it, the bytes saved
+    and the compacted dtypes. (None, None, None) for an empty file.
+    """
+    with stage("read_csv"):
+        df = _read_csv(file_path)
+    if df is None:
+        return None, None, None
+    dtypes = df.dtypes.astype(str).to_dict()
+    if not optimize:
+        return df, dtypes, None
+
+    with stage("optimize_dtypes"):
+        before = frame_memory(df)
+        df = optimize_dtypes(df)
+        after = frame_memory(df)
+        memory = {
+            "before_bytes": before,
+            "after_bytes": after,
+            "saved_bytes": before - after,
+            "dtypes": df.dtypes.astype(str).to_dict()
+        }
+
+    return df, dtypes, memory
+
+
+def _profile_frame(
+    df: pd.DataFrame,
+    duplicate_mask: pd.Series,
+    null_counts: pd.Series,
+    dtypes: dict,
+    memory: dict = None,
+    column_stats: bool = False
+):
+    with stage("analyze"):
+        analysis = {
+            "total_rows": len(df),
+            "total_columns": len(df.columns),
+            "missing_values": null_counts.to_dict(),
+            "duplicate_rows": int(duplicate_mask.sum()),
+            "columns": dtypes
+        }
+    if memory:
+        analysis["memory"] = memory
+    if column_stats:
+        with stage("column_stats"):
+            analysis["column_stats"] = profile_columns(df)
+    return analysis
+
+
+def _check_columns(df_columns, dedup_subset: list):
+    missing = [col for col in dedup_subset or [] if col not in df_columns]
+    if missing:
+        raise ValueError(f"Unknown dedup columns: {', '.join(missing)}")
+
+
+def _dedup_masks(
+    df: pd.DataFrame,
+    dedup_subset: list,
+    near_duplicates: bool,
+    near_duplicate_threshold: float
+):
+    """
+    Returns (exact duplicate mask, near-duplicate mask or None). The
+    near-duplicate mask only flags rows that are not exact duplicates.
+    """
+    _check_columns(df.columns, dedup_subset)
+    with stage("duplicates"):
+        exact = duplicate_mask(df, dedup_subset)
+
+    near = None
+    if near_duplicates:
+        with stage("near_duplicates"):
+            near = near_duplicate_mask(df, threshold=near_duplicate_threshold) & ~exact
+
+    return exact, near
+
+
+def _clean_frame(
+    df: pd.DataFrame,
+    file_path: str,
+    exact_mask: pd.Series,
+    null_counts: pd.Series,
+    near_mask: pd.Series = None,
+    strategies: dict = None,
+    output: dict = None
+):
+    output = output or output_spec()
+    rows_before = len(df)
+    duplicate_rows = int(exact_mask.sum())
+    near_duplicate_rows = int(near_mask.sum()) if near_mask is not None else 0
+    missing_values_fixed = int(null_counts.sum())
+
+    steps = []
+
+    # -------------------------
+    # REMOVE DUPLICATES
+    # -------------------------
+    if duplicate_rows + near_duplicate_rows > 0:
+        remove = exact_mask.to_numpy()
+        if near_mask is not None:
+            remove = remove | near_mask.to_numpy()
+
+        # Same rows drop_duplicates() would keep, without re-hashing the frame
+        with stage("drop_duplicates"):
+            df = df.take(np.flatnonzero(~remove))
+
+    if duplicate_rows > 0:
+        steps.append(f"Removed {duplicate_rows} duplicate rows")
+    if near_duplicate_rows > 0:
+        steps.append(f"Removed {near_duplicate_rows} near-duplicate rows")
+
+    # -------------------------
+    # HANDLE MISSING VALUES
+    # -------------------------
+    with stage("impute"):
+        df, fill_steps = impute(df, strategies)
+    steps.extend(fill_steps)
+
+    rows_after = len(df)
+
+    return _cleaning_summary(
+        _write_cleaned(df, file_path, output),
+        steps,
+        rows_before,
+        rows_after,
+        duplicate_rows + near_duplicate_rows,
+        missing_values_fixed,
+        output["format"]
+    )
+
+
+def _write_cleaned(df, file_path: str, output: dict, writer=write_frame) -> tuple:
+    cleaned_file_path = cleaned_path(file_path, output)
+    partial_path = _partial_path(cleaned_file_path)
+    with stage("write_output"):
+        sha256 = writer(df, partial_path, output)
+        os.replace(partial_path, cleaned_file_path)
+    return cleaned_file_path, sha256
+
+
+def _clean_with_plan(df: pd.DataFrame, file_path: str, plan: list, output: dict, explain: bool = False):
+    """
+    Clean with a user plan (see cleaning_plan) instead of the built-in
+    dedup + fill steps.
+    """
+    optimized = optimize_plan(plan, df.dtypes.to_dict())
+    rows_before = len(df)
+    df, steps, stats = execute_plan(df, optimized)
+
+    result = _cleaning_summary(
+        _write_cleaned(df, file_path, output),
+        steps,
+        rows_before,
+        len(df),
+        stats["duplicates_removed"],
+        stats["missing_values_fixed"],
+        output["format"]
+    )
+    result["rows_filtered"] = stats["rows_filtered"]
+    if explain:
+        result["plan"] = explain_plan(optimized)
+    return result
+
+
+# -------------------------
+# STREAMING (CHUNKED) MODE
+# -------------------------
+def _resolve_dtype(chunk_dtypes: set):
+    """
+    Dtype a full read would infer from the dtypes seen per chunk.
+    """
+    if not chunk_dtypes:
+        return np.dtype(object)
+
+    kinds = {dtype.kind for dtype in chunk_dtypes}
+    if "O" in kinds or ("b" in kinds and len(kinds) > 1):
+        return np.dtype(object)
+
+    return np.result_type(*chunk_dtypes)
+
+
+def _scan_frames(chunks, columns: list, fingerprints: FingerprintIndex, dedup_subset: list = None):
+    """
+    Statistics of the streaming scan over an iterable of chunks. Rows
+    whose fingerprint is already in fingerprints are duplicates; new
+    ones are added to it.
+    """
+    total_rows = 0
+    rows_kept = 0
+    null_counts = pd.Series(0, index=columns, dtype="int64")
+    kept_null_counts = pd.Series(0, index=columns, dtype="int64")
+    sums = pd.Series(0.0, index=columns)
+    counts = pd.Series(0, index=columns, dtype="int64")
+    means = {}
+    chunk_dtypes = {col: set() for col in columns}
+    value_kinds = {col: set() for col in columns}
+    keep_masks = []
+
+    for chunk in timed_iter("read_csv", chunks):
+        total_rows += len(chunk)
+
+        with stage("duplicates"):
+            keep = fingerprints.add_new(row_fingerprints(chunk, dedup_subset))
+
+        with stage("analyze"):
+            chunk_nulls = chunk.isnull().sum()
+            for col, dtype in chunk.dtypes.items():
+                chunk_dtypes[col].add(dtype)
+                if chunk_nulls[col] < len(chunk):
+                    value_kinds[col].add("mixed" if _is_mixed(chunk[col]) else dtype.kind)
+
+            null_counts += chunk_nulls
+
+            rows_kept += int(keep.sum())
+            kept = chunk[keep]
+            kept_null_counts += kept.isnull().sum()
+
+            numeric = kept.select_dtypes("number")
+            sums = sums.add(numeric.sum(), fill_value=0)
+            counts = counts.add(numeric.count(), fill_value=0)
+            for col in numeric.columns:
+                means.setdefault(col, RunningMean()).add(numeric[col])
+
+        # 1 bit per row, replayed by the write pass
+        keep_masks.append((np.packbits(keep), len(keep)))
+
+    return {
+        "columns": columns,
+        "total_rows": total_rows,
+        "rows_kept": rows_kept,
+        "null_counts": null_counts,
+        "kept_null_counts": kept_null_counts,
+        "sums": sums,
+        "counts": counts,
+        "means": pd.Series({col: means[col].mean() if col in means else np.nan for col in columns}, dtype="float64"),
+        "chunk_dtypes": chunk_dtypes,
+        "value_kinds": value_kinds,
+        "dtypes": {col: _resolve_dtype(chunk_dtypes[col]) for col in columns},
+        "keep_masks": keep_masks,
+    }
+
+
+def _mixed_columns(scan: dict) -> list:
+    """
+    Columns that hold text in some chunks and numbers or bools in others
+    (or within one chunk). Those values were hashed by value (1), not by
+    text ('1') as _read_csv reads the column, and are read again as text.
+    """
+    return [
+        col for col in scan["columns"]
+        if scan["dtypes"][col] == "object" and scan["value_kinds"][col] - {"O"}
+    ]
+
+
+def _scan_file(read_chunks, columns: list, dedup_subset: list = None):
+    """
+    _scan_frames over read_chunks(dtype) with a fresh fingerprint index.
+    Mixed columns (see _mixed_columns) are read as text and the file is
+    scanned again, so duplicates match those of the in-memory path.
+    Returns (scan, fingerprints added).
+    """
+    dtype = None
+    while True:
+        with FingerprintIndex() as fingerprints:
+            scan = _scan_frames(read_chunks(dtype), columns, fingerprints, dedup_subset)
+            added = fingerprints.added()
+
+        mixed = _mixed_columns(scan)
+        if not mixed:
+            return scan, added
+        dtype = dict(dtype or {}, **{col: object for col in mixed})
+
+
+def _scan_chunks(file_path: str, chunk_size: int, dedup_subset: list = None):
+    """
+    First streaming pass: row and null counts, cross-chunk duplicate
+    detection and the column sums needed for the mean fill.
+    Returns None for an empty file.
+    """
+    try:
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+    except EmptyDataError:
+        return None
+
+    _check_columns(columns, dedup_subset)
+
+    scan, _ = _scan_file(
+        lambda dtype: pd.read_csv(file_path, chunksize=chunk_size, dtype=dtype),
+        columns,
+        dedup_subset
+    )
+    return scan
+
+
+def _scan_analysis(scan: dict):
+    return {
+        "total_rows": scan["total_rows"],
+        "total_columns": len(scan["columns"]),
+        "missing_values": scan["null_counts"].to_dict(),
+        "duplicate_rows": scan["total_rows"] - scan["rows_kept"],
+        "columns": {col: str(dtype) for col, dtype in scan["dtypes"].items()}
+    }
+
+
+def _clean_chunks(file_path: str, scan: dict, chunk_size: int, strategies: dict = None, output: dict = None):
+    """
+    Second streaming pass: drop duplicates, fill nulls with the
+    statistics from the first pass and append to the cleaned file.
+    """
+    output = output or output_spec()
+    duplicate_rows = scan["total_rows"] - scan["rows_kept"]
+    missing_values_fixed = int(scan["null_counts"].sum())
+
+    steps = []
+    if duplicate_rows > 0:
+        steps.append(f"Removed {duplicate_rows} duplicate rows")
+
+    fill_values, fill_steps = streaming_fills(
+        scan["columns"], scan["dtypes"], scan["kept_null_counts"], scan["means"], strategies
+    )
+    steps.extend(fill_steps)
+
+    # Pin dtypes so every chunk is parsed (and written) like a full read
+    read_dtypes = {
+        col: dtype for col, dtype in scan["dtypes"].items()
+        if dtype == "object" or dtype.kind == "f"
+    }
+
+    cleaned_file_path = cleaned_path(file_path, output)
+    partial_path = _partial_path(cleaned_file_path)
+    chunks = pd.read_csv(file_path, chunksize=chunk_size, dtype=read_dtypes)
+
+    with ChunkWriter(partial_path, output, scan["columns"]) as out:
+        for chunk, (mask, length) in zip(timed_iter("read_csv", chunks), scan["keep_masks"]):
+            with stage("drop_duplicates"):
+                keep = np.unpackbits(mask, count=length).astype(bool)
+                chunk = chunk.take(np.flatnonzero(keep))
+            if fill_values:
+                with stage("impute"):
+                    chunk = chunk.fillna(fill_values)
+            with stage("write_output"):
+                out.write(chunk)
+
+    os.replace(partial_path, cleaned_file_path)
+
+    return _cleaning_summary(
+        (cleaned_file_path, out.sha256),
+        steps,
+        scan["total_rows"],
+        scan["rows_kept"],
+        duplicate_rows,
+        missing_values_fixed,
+        output["format"]
+    )
+
+
+# -------------------------
+# SKETCH (APPROXIMATE) PROFILE
+# -------------------------
+def _sketch_chunks(file_path: str, chunk_size: int, top_k: int = PROFILE_TOP_K):
+    """
+    One streaming pass with fixed-size sketches per column: HyperLogLog
+    for distinct counts (and distinct rows), t-digest for quantiles,
+    Count-Min for top values and a reservoir of sample rows. Memory is
+    bounded by chunk_size and the sketch sizes, not by the file.
+    Returns None for an empty file.
+    """
+    try:
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+    except EmptyDataError:
+        return None
+
+    total_rows = 0
+    null_counts = pd.Series(0, index=columns, dtype="int64")
+    chunk_dtypes = {col: set() for col in columns}
+    distinct = {col: HyperLogLog() for col in columns}
+    frequent = {col: CountMinSketch() for col in columns}
+    digests = {col: TDigest() for col in columns}
+    rows = HyperLogLog()
+    sample = Reservoir()
+
+    for chunk in timed_iter("read_csv", pd.read_csv(file_path, chunksize=chunk_size)):
+        total_rows += len(chunk)
+
+        with stage("sketch"):
+            sample.update(chunk)
+
+            # Each column is hashed once, for its own sketches and the row fingerprints
+            fingerprints = np.zeros(len(chunk), dtype="uint64")
+
+            for col in columns:
+                series = chunk[col]
+                chunk_dtypes[col].add(series.dtype)
+
+                nulls = series.isnull().to_numpy()
+                null_counts[col] += int(nulls.sum())
+                hashed = column_hashes(series, nulls)
+                fingerprints = combine_hashes(fingerprints, hashed)
+
+                valid = series[~nulls]
+                distinct[col].update(hashed[~nulls])
+                frequent[col].update(valid, hashed[~nulls])
+
+                if series.dtype.kind in "iuf":
+                    digests[col].update(valid.to_numpy(dtype="float64"))
+
+            rows.update(fingerprints)
+
+    dtypes = {col: _resolve_dtype(chunk_dtypes[col]) for col in columns}
+    column_stats = {}
+
+    for col in columns:
+        stats = {
+            "count": total_rows - int(null_counts[col]),
+            "distinct": min(distinct[col].estimate(), total_rows - int(null_counts[col])),
+            "top_values": [
+                {"value": json_value(value), "count": count}
+                for value, count in frequent[col].top(top_k)
+            ]
+        }
+        if dtypes[col].kind in "iuf":
+            digest = digests[col]
+            stats.update({
+                "min": json_value(digest.min) if digest.count else None,
+                "max": json_value(digest.max) if digest.count else None,
+                "quantiles": {str(q): digest.quantile(q) for q in QUANTILES} if digest.count else {}
+            })
+        column_stats[col] = stats
+
+    distinct_rows = min(rows.estimate(), total_rows)
+
+    return {
+        "total_rows": total_rows,
+        "total_columns": len(columns),
+        "missing_values": null_counts.to_dict(),
+        "duplicate_rows": total_rows - distinct_rows,
+        "columns": {col: str(dtype) for col, dtype in dtypes.items()},
+        "column_stats": column_stats,
+        "sample_rows": [
+            {col: json_value(value) for col, value in record.items()}
+            for record in sample.rows
+        ],
+        "error_bounds": {
+            "distinct": {"relative_std_error": round(rows.relative_error, 4)},
+            "duplicate_rows": {"absolute_std_error": int(math.ceil(rows.relative_error * distinct_rows))},
+            "quantiles": {
+                str(q): {"rank_error": round(quantile_rank_error(q), 4)} for q in QUANTILES
+            },
+            "top_values": {
+                "max_overcount_share": SKETCH_CMS_EPSILON,
+                "confidence": 1 - SKETCH_CMS_DELTA,
+                "complete_above_share": SKETCH_HEAVY_HITTER_SHARE
+            },
+            "sample_rows": f"uniform random sample of {sample.size} rows"
+        }
+    }
+
+
+# -------------------------
+# INCREMENTAL (APPEND-ONLY VERSIONS)
+# -------------------------
+def _read_rows(file_path: str, chunk_size: int, offset: int = None, columns: list = None, dtype: dict = None):
+    """
+    Non-empty chunks of the whole file, or of the header-less rows from
+    byte offset on (what a new version appended).
+    """
+    if offset is None:
+        yield from (chunk for chunk in pd.read_csv(file_path, chunksize=chunk_size, dtype=dtype) if len(chunk))
+        return
+
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        try:
+            chunks = pd.read_csv(f, header=None, names=columns, chunksize=chunk_size, dtype=dtype)
+            # An empty tail still parses as one empty (object) chunk
+            yield from (chunk for chunk in chunks if len(chunk))
+        except EmptyDataError:
+            return
+
+
+def _load_state(state_path: str):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, payload: dict):
+    partial_path = _partial_path(path)
+    with open(partial_path, "w") as f:
+        json.dump(payload, f)
+    os.replace(partial_path, path)
+
+
+def _append_offset(file_path: str, parent: dict, options: dict):
+    """
+    (offset, None) when file_path is parent's source with rows appended,
+    else (None, reason for a full clean).
+    """
+    if parent is None:
+        return None, "no previous version"
+    if parent["pipeline_version"] != PIPELINE_VERSION or parent["options"] != options:
+        return None, "cleaning options changed"
+    if not os.path.exists(parent["cleaned_file_path"]):
+        return None, "previous cleaned file is missing"
+
+    offset = parent["source_size"]
+    if os.path.getsize(file_path) < offset or file_sha256(file_path, offset) != parent["source_sha256"]:
+        return None, "file does not start with the previous version"
+
+    with open(file_path, "rb") as f:
+        f.seek(offset - 1)
+        boundary = f.read(2)
+    # An unterminated last row may have been continued
+    if boundary[:1] != b"\n" and boundary[1:] not in (b"", b"\n", b"\r"):
+        return None, "last row of the previous version was changed"
+
+    return offset, None
+
+
+def _changed_dtypes(scan: dict, dtypes: dict) -> list:
+    """
+    Columns whose type the appended rows widen (e.g. nulls in an int
+    column); the cleaned rows already written would no longer match.
+    """
+    return [
+        col for col, dtype in dtypes.items()
+        if _resolve_dtype(scan["chunk_dtypes"][col] | {dtype}) != dtype
+    ]
+
+
+def _save_runs(state_dir: str, runs: list, added) -> list:
+    """
+    Fingerprint run files of the new version: the parent's (immutable,
+    shared) plus one for the rows added now, merged into one once there
+    are more than INCREMENTAL_MAX_RUNS.
+    """
+    os.makedirs(os.path.join(state_dir, "runs"), exist_ok=True)
+
+    def save(fingerprints):
+        name = os.path.join("runs", f"{uuid.uuid4().hex}.npy")
+        np.save(os.path.join(state_dir, name), fingerprints)
+        return name
+
+    if len(added):
+        runs = runs + [save(added)]
+    if len(runs) > INCREMENTAL_MAX_RUNS:
+        runs = [save(np.sort(np.concatenate([np.load(os.path.join(state_dir, run)) for run in runs])))]
+    return runs
+
+
+def clean_version(
+    file_path: str,
+    state_dir: str,
+    parent_state: str = None,
+    chunk_size: int = 100_000,
+    dedup_subset: list = None,
+    impute_strategies: dict = None,
+    output_format: str = "csv",
+    output_compression: str = None,
+    source_sha256: str = None
+):
+    """
+    Clean one version of an append-only dataset whose state lives in
+    state_dir. When file_path is the version of parent_state with rows
+    appended, only those rows are read: they are deduped against the
+    fingerprints of every earlier row, filled with running means and
+    appended to a copy of the previous cleaned file, so the cost follows
+    the new data. Otherwise (first version, other options, rewritten
+    rows, widened column types) the whole file is cleaned and the state
+    starts over. Rows cleaned earlier keep the fills they got then.
+    Streams like chunk_size mode: mean and constant fills only.
+    source_sha256 saves hashing file_path when the caller knows it.
+    Returns (analysis, cleaning_result, state_path).
+    """
+    output = output_spec(output_format, output_compression)
+    if output["format"] not in APPENDABLE_FORMATS:
+        raise ValueError(f"Incremental cleaning writes {', '.join(APPENDABLE_FORMATS)} output only")
+
+    options = {
+        "dedup_subset": dedup_subset,
+        "impute_strategies": impute_strategies,
+        "output": output,
+    }
+    parent = _load_state(parent_state) if parent_state else None
+    offset, reason = _append_offset(file_path, parent, options)
+
+    scan = None
+    if offset is not None:
+        columns = parent["columns"]
+        dtypes = {col: np.dtype(dtype) for col, dtype in parent["dtypes"].items()}
+        runs = parent["runs"]
+        paths = [os.path.join(state_dir, run) for run in runs]
+        # Text columns stay text, so appended values hash like the earlier ones
+        text_dtypes = {col: object for col, dtype in dtypes.items() if dtype == "object"}
+        with FingerprintIndex.from_runs(paths) as fingerprints:
+            scan = _scan_frames(
+                _read_rows(file_path, chunk_size, offset, columns, text_dtypes), columns, fingerprints, dedup_subset
+            )
+            added = fingerprints.added()
+
+        changed = _changed_dtypes(scan, dtypes)
+        if changed:
+            offset, reason, scan = None, f"column types changed: {', '.join(changed)}", None
+
+    if scan is None:
+        try:
+            columns = list(pd.read_csv(file_path, nrows=0).columns)
+        except EmptyDataError:
+            raise ValueError("The file is empty")
+        _check_columns(columns, dedup_subset)
+
+        runs = []
+        scan, added = _scan_file(
+            lambda dtype: _read_rows(file_path, chunk_size, dtype=dtype), columns, dedup_subset
+        )
+        dtypes = scan["dtypes"]
+        parent = None
+
+    # -------------------------
+    # RUNNING AGGREGATES
+    # -------------------------
+    totals = {
+        name: scan[name] + (pd.Series(parent[name], dtype=scan[name].dtype) if parent else 0)
+        for name in ("null_counts", "kept_null_counts", "sums", "counts")
+    }
+    total_rows = scan["total_rows"] + (parent["total_rows"] if parent else 0)
+    rows_kept = scan["rows_kept"] + (parent["rows_kept"] if parent else 0)
+    # A first version takes the exact means of its scan
+    means = totals["sums"] / totals["counts"].where(totals["counts"] > 0) if parent else scan["means"]
+
+    # Every strategy is checked now, not when a later version first has nulls
+    streaming_fills(columns, dtypes, pd.Series(1, index=columns), means, impute_strategies)
+    fill_values, fill_steps = streaming_fills(
+        columns, dtypes, totals["kept_null_counts"], means, impute_strategies
+    )
+
+    # -------------------------
+    # WRITE (append to a copy of the previous cleaned file)
+    # -------------------------
+    os.makedirs(state_dir, exist_ok=True)
+    cleaned_file_path = os.path.join(state_dir, f"cleaned-{uuid.uuid4().hex}{OUTPUT_FORMATS[output['format']]['suffix']}")
+    partial_path = _partial_path(cleaned_file_path)
+    read_dtypes = {col: dtype for col, dtype in dtypes.items() if dtype == "object" or dtype.kind == "f"}
+
+    hasher = None
+    with stage("write_output"):
+        if parent:
+            # Hash the copied prefix so the appended file's hash needs no re-read
+            hasher = copy_hashed(parent["cleaned_file_path"], partial_path)
+    chunks = _read_rows(file_path, chunk_size, offset, columns, read_dtypes)
+
+    with ChunkWriter(partial_path, output, columns, append=parent is not None, hasher=hasher) as out:
+        for chunk, (mask, length) in zip(timed_iter("read_csv", chunks), scan["keep_masks"]):
+            with stage("drop_duplicates"):
+                keep = np.unpackbits(mask, count=length).astype(bool)
+                chunk = chunk.take(np.flatnonzero(keep))
+            if fill_values:
+                with stage("impute"):
+                    chunk = chunk.fillna(fill_values)
+            with stage("write_output"):
+                out.write(chunk)
+
+    os.replace(partial_path, cleaned_file_path)
+
+    # -------------------------
+    # STATE OF THIS VERSION
+    # -------------------------
+    with stage("incremental_state"):
+        state = {
+            "pipeline_version": PIPELINE_VERSION,
+            "options": options,
+            "source_sha256": source_sha256 or file_sha256(file_path),
+            "source_size": os.path.getsize(file_path),
+            "columns": columns,
+            "dtypes": {col: str(dtype) for col, dtype in dtypes.items()},
+            "total_rows": total_rows,
+            "rows_kept": rows_kept,
+            **{name: totals[name].to_dict() for name in totals},
+            "runs": _save_runs(state_dir, runs, added),
+            "cleaned_file_path": cleaned_file_path,
+        }
+        state_path = os.path.join(state_dir, f"state-{uuid.uuid4().hex}.json")
+        _write_json(state_path, state)
+
+    duplicate_rows = total_rows - rows_kept
+    steps = [f"Removed {duplicate_rows} duplicate rows"] if duplicate_rows > 0 else []
+    analysis = {
+        "total_rows": total_rows,
+        "total_columns": len(columns),
+        "missing_values": totals["null_counts"].to_dict(),
+        "duplicate_rows": duplicate_rows,
+        "columns": state["dtypes"]
+    }
+    cleaning_result = _cleaning_summary(
+        (cleaned_file_path, out.sha256),
+        steps + fill_steps,
+        total_rows,
+        rows_kept,
+        duplicate_rows,
+        int(totals["null_counts"].sum()),
+        output["format"]
+    )
+    cleaning_result["incremental"] = {
+        "mode": "append" if parent else "full",
+        "reason": reason,
+        "rows_processed": scan["total_rows"],
+        "bytes_processed": state["source_size"] - (offset or 0)
+    }
+    return analysis, cleaning_result, state_path
+
+
+# -------------------------
+# ARROW ENGINE
+# -------------------------
+def _grouped_fills(strategies: dict) -> bool:
+    return any(isinstance(spec, dict) and spec.get("group_by") for spec in (strategies or {}).values())
+
+
+def _resolve_engine(
+    engine: str,
+    chunk_size: int = None,
+    near_duplicates: bool = False,
+    column_stats: bool = False,
+    impute_strategies: dict = None,
+    plan: list = None,
+    explain: bool = False
+) -> str:
+    """
+    Engine a run uses: engine, else CLEANING_ENGINE. Options the arrow
+    engine has no equivalent for (streaming, near-duplicates, column
+    statistics, group-wise fills, plans, explain) run on pandas.
+    """
+    engine = engine or CLEANING_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'; use one of: {', '.join(ENGINES)}")
+
+    if engine == "arrow" and (
+        chunk_size or near_duplicates or column_stats or plan is not None or explain
+        or _grouped_fills(impute_strategies)
+    ):
+        return "pandas"
+    return engine
+
+
+def _arrow_run(
+    file_path: str,
+    optimize: bool,
+    dedup_subset: list,
+    strategies: dict = None,
+    output: dict = None,
+    analyze: bool = True
+):
+    """
+    The in-memory pipeline on pyarrow's multi-threaded CSV reader and
+    compute kernels, with the same results as the pandas engine.
+    Returns (analysis, cleaning_result); cleaning_result is None without
+    an output, analysis None when not asked for. Returns None when the
+    file needs the pandas engine (see arrow_engine.UnsupportedCSV).
+    """
+    try:
+        from app.services import arrow_engine
+    except ImportError:
+        raise ValueError("The arrow engine requires pyarrow")
+
+    with stage("read_csv"):
+        try:
+            table = arrow_engine.read_table(file_path)
+        except arrow_engine.UnsupportedCSV:
+            return None
+    if table is None:
+        cleaning_result = _empty_cleaning_result(output["format"], "arrow") if output else None
+        return _empty_analysis() if analyze else None, cleaning_result
+
+    _check_columns(table.column_names, dedup_subset)
+    kinds = arrow_engine.column_kinds(table)
+    with stage("duplicates"):
+        keep = arrow_engine.first_rows(table, dedup_subset)
+
+    analysis = None
+    if analyze:
+        with stage("analyze"):
+            analysis = arrow_engine.analysis(table, kinds, len(keep), optimize)
+    if output is None:
+        return analysis, None
+
+    rows_before = table.num_rows
+    duplicate_rows = rows_before - len(keep)
+    missing_values_fixed = sum(column.null_count for column in table.columns)
+
+    steps = []
+    if duplicate_rows > 0:
+        with stage("drop_duplicates"):
+            table = table.take(keep)
+        steps.append(f"Removed {duplicate_rows} duplicate rows")
+
+    with stage("impute"):
+        table, fill_steps = arrow_engine.impute(table, kinds, strategies)
+    steps.extend(fill_steps)
+
+    return analysis, _cleaning_summary(
+        _write_cleaned(table, file_path, output, arrow_engine.write_table),
+        steps,
+        rows_before,
+        table.num_rows,
+        duplicate_rows,
+        missing_values_fixed,
+        output["format"],
+        "arrow"
+    )
+
+
+# -------------------------
+# PUBLIC API
+# -------------------------
+def _streaming_scan(
+    file_path: str,
+    chunk_size: int,
+    dedup_subset: list,
+    near_duplicates: bool = False,
+    column_stats: bool = False
+):
+    if near_duplicates:
+        raise ValueError("Near-duplicate detection is not available in streaming mode")
+    if column_stats:
+        raise ValueError("Column statistics are not available in streaming mode")
+    return _scan_chunks(file_path, chunk_size, dedup_subset)
+
+
+def analyze_csv(
+    file_path: str,
+    chunk_size: int = None,
+    optimize: bool = True,
+    dedup_subset: list = None,
+    column_stats: bool = False,
+    engine: str = None
+):
+    """
+    column_stats adds per-column statistics (quantiles, distinct
+    counts, top values, string lengths), profiled in parallel column
+    shards (in-memory mode only).
+    engine is pandas or arrow (default: CLEANING_ENGINE).
+    """
+    if _resolve_engine(engine, chunk_size, column_stats=column_stats) == "arrow":
+        result = _arrow_run(file_path, optimize, dedup_subset)
+        if result is not None:
+            return result[0]
+
+    if chunk_size:
+        scan = _streaming_scan(file_path, chunk_size, dedup_subset, column_stats=column_stats)
+        return _scan_analysis(scan) if scan else _empty_analysis()
+
+    df, dtypes, memory = _load_frame(file_path, optimize)
+    if df is None:
+        return _empty_analysis()
+
+    _check_columns(df.columns, dedup_subset)
+    return _profile_frame(df, duplicate_mask(df, dedup_subset), df.isnull().sum(), dtypes, memory, column_stats)
+
+
+def sketch_csv(file_path: str, chunk_size: int = 100_000):
+    """
+    Approximate analysis from one streaming pass over fixed-size
+    sketches (see _sketch_chunks); a quick look at files too large for
+    the exact analysis. Row and null counts are exact, distinct counts,
+    duplicates, quantiles and top values are estimates whose bounds are
+    listed under 'error_bounds'.
+    """
+    analysis = _sketch_chunks(file_path, chunk_size)
+    return analysis if analysis else _empty_analysis()
+
+
+def _check_plan(plan: list, chunk_size: int, dedup_subset: list, near_duplicates: bool, impute_strategies: dict):
+    """
+    Parsed plan, or None. A plan replaces the dedup and impute options.
+    """
+    if plan is None:
+        return None
+    if chunk_size:
+        raise ValueError("Cleaning plans are not available in streaming mode")
+    if dedup_subset or near_duplicates or impute_strategies:
+        raise ValueError("A cleaning plan replaces the dedup and impute options; put them in the plan")
+    return parse_plan(plan)
+
+
+def _explain_builtin(dtypes: dict, dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies):
+    plan = default_plan(dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies)
+    return explain_plan(optimize_plan(parse_plan(plan), dtypes))
+
+
+def clean_csv(
+    file_path: str,
+    chunk_size: int = None,
+    optimize: bool = True,
+    dedup_subset: list = None,
+    near_duplicates: bool = False,
+    near_duplicate_threshold: float = 0.9,
+    impute_strategies: dict = None,
+    output_format: str = "csv",
+    output_compression: str = None,
+    row_group_size: int = None,
+    plan: list = None,
+    explain: bool = False,
+    engine: str = None,
+    run_id: str = None
+):
+    """
+    Clean a CSV and write '<name>_cleaned<suffix>' next to it.
+    With chunk_size set, the file is streamed in chunks of that many
+    rows, so peak memory no longer depends on the file size.
+    optimize compacts dtypes after loading (in-memory mode only).
+    dedup_subset restricts the duplicate key to those columns;
+    near_duplicates also drops rows whose text is a MinHash near
+    match of an earlier row (in-memory mode only).
+    impute_strategies overrides the per-column fill (see imputation);
+    streaming mode supports mean and constant only.
+    output_format is csv, csv.gz, csv.zst, parquet or feather;
+    output_compression picks the parquet/feather codec and
+    row_group_size the parquet row groups (see output_formats).
+    plan is a declarative list of steps (see cleaning_plan.parse_plan)
+    run instead of dedup + fill (in-memory mode only); explain adds
+    the optimized plan to the result.
+    engine is pandas or arrow (default: CLEANING_ENGINE); runs with
+    options the arrow engine lacks use pandas.
+    run_id names the output '<name>_cleaned-<run_id><suffix>' instead
+    (see output_formats.cleaned_path).
+    """
+    output = output_spec(output_format, output_compression, row_group_size, run_id)
+    plan = _check_plan(plan, chunk_size, dedup_subset, near_duplicates, impute_strategies)
+
+    engine = _resolve_engine(engine, chunk_size, near_duplicates, False, impute_strategies, plan, explain)
+    if engine == "arrow":
+        result = _arrow_run(file_path, optimize, dedup_subset, impute_strategies, output, analyze=False)
+        if result is not None:
+            return result[1]
+
+    if chunk_size:
+        scan = _streaming_scan(file_path, chunk_size, dedup_subset, near_duplicates)
+        if scan is None:
+            return _empty_cleaning_result(output["format"])
+        result = _clean_chunks(file_path, scan, chunk_size, impute_strategies, output)
+        if explain:
+            result["plan"] = _explain_builtin(
+                scan["dtypes"], dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies
+            )
+        return result
+
+    df, _, _ = _load_frame(file_path, optimize)
+    if df is None:
+        return _empty_cleaning_result(output["format"])
+
+    if plan:
+        return _clean_with_plan(df, file_path, plan, output, explain)
+
+    dtypes = df.dtypes.to_dict()
+    exact_mask, near_mask = _dedup_masks(df, dedup_subset, near_duplicates, near_duplicate_threshold)
+    result = _clean_frame(df, file_path, exact_mask, df.isnull().sum(), near_mask, impute_strategies, output)
+    if explain:
+        result["plan"] = _explain_builtin(
+            dtypes, dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies
+        )
+    return result
+
+
+def run_pipeline(
+    file_path: str,
+    chunk_size: int = None,
+    optimize: bool = True,
+    dedup_subset: list = None,
+    near_duplicates: bool = False,
+    near_duplicate_threshold: float = 0.9,
+    impute_strategies: dict = None,
+    column_stats: bool = False,
+    output_format: str = "csv",
+    output_compression: str = None,
+    row_group_size: int = None,
+    plan: list = None,
+    explain: bool = False,
+    engine: str = None,
+    run_id: str = None
+):
+    """
+    Analyze and clean a CSV from a single parse.
+    The duplicate mask and null counts are computed once and shared
+    by both stages. With chunk_size set, both stages are served by the
+    same streaming scan. Options are those of clean_csv, plus
+    column_stats. Returns (analysis, cleaning_result).
+    """
+    output = output_spec(output_format, output_compression, row_group_size, run_id)
+    plan = _check_plan(plan, chunk_size, dedup_subset, near_duplicates, impute_strategies)
+
+    engine = _resolve_engine(engine, chunk_size, near_duplicates, column_stats, impute_strategies, plan, explain)
+    if engine == "arrow":
+        result = _arrow_run(file_path, optimize, dedup_subset, impute_strategies, output)
+        if result is not None:
+            return result
+
+    if chunk_size:
+        scan = _streaming_scan(file_path, chunk_size, dedup_subset, near_duplicates, column_stats)
+        if scan is None:
+            return _empty_analysis(), _empty_cleaning_result(output["format"])
+        cleaning_result = _clean_chunks(file_path, scan, chunk_size, impute_strategies, output)
+        if explain:
+            cleaning_result["plan"] = _explain_builtin(
+                scan["dtypes"], dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies
+            )
+        return _scan_analysis(scan), cleaning_result
+
+    df, dtypes, memory = _load_frame(file_path, optimize)
+    if df is None:
+        return _empty_analysis(), _empty_cleaning_result(output["format"])
+
+    exact_mask, near_mask = _dedup_masks(df, dedup_subset, near_duplicates, near_duplicate_threshold)
+    null_counts = df.isnull().sum()
+
+    analysis = _profile_frame(df, exact_mask, null_counts, dtypes, memory, column_stats)
+    if plan:
+        return analysis, _clean_with_plan(df, file_path, plan, output, explain)
+
+    dtypes = df.dtypes.to_dict()
+    cleaning_result = _clean_frame(df, file_path, exact_mask, null_counts, near_mask, impute_strategies, output)
+    if explain:
+        cleaning_result["plan"] = _explain_builtin(
+            dtypes, dedup_subset, near_duplicates, near_duplicate_threshold, impute_strategies
+        )
+
+    return analysis, cleaning_result
@@ -0,0 +1,328 @@
+import os
+import re
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from app.services.dtype_optimizer import is_text_column
+
+# In-memory fingerprints (8 bytes each) before the index spills to disk
+DEDUP_MEMORY_ROWS = int(os.getenv("DEDUP_MEMORY_ROWS", 10_000_000))
+
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MIX = np.uint64(0x100000001B3)
+
+
+# -------------------------
+# ROW FINGERPRINTS
+# -------------------------
+def column_hashes(series: pd.Series, nulls: np.ndarray = None) -> np.ndarray:
+    """
+    uint64 hash of every value. Numeric columns are hashed as float64,
+    bool columns as objects and nulls as a fixed constant, so a value
+    hashes the same whichever dtype its chunk was inferred or compacted to.
+    nulls is the column's isnull() mask, if the caller already has it.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Hash each category once; same values as hashing the objects
+        categories = series.cat.categories.to_numpy(dtype=object)
+        hashed = pd.util.hash_array(categories)[series.cat.codes.to_numpy()]
+    elif pd.api.types.is_bool_dtype(series):
+        hashed = pd.util.hash_array(series.to_numpy(dtype=object))
+    elif pd.api.types.is_numeric_dtype(series):
+        # + 0.0 folds -0.0 into 0.0, which compare equal
+        hashed = pd.util.hash_array(series.to_numpy(dtype="float64", na_value=np.nan) + 0.0)
+    else:
+        hashed = pd.util.hash_array(series.to_numpy(dtype=object))
+
+    hashed[series.isnull().to_numpy() if nulls is None else nulls] = _NULL_HASH
+    return hashed
+
+
+def combine_hashes(fingerprints: np.ndarray, hashed: np.ndarray) -> np.ndarray:
+    """
+    Fold one more column's hashes into running row fingerprints.
+    """
+    return fingerprints * _HASH_MIX + hashed
+
+
+def row_fingerprints(df: pd.DataFrame, subset: list = None) -> np.ndarray:
+    """
+    Hash every row (or the subset columns of it) to a uint64, combining
+    the column_hashes of each column.
+    """
+    columns = subset if subset else df.columns
+    fingerprints = np.zeros(len(df), dtype="uint64")
+
+    for col in columns:
+        fingerprints = combine_hashes(fingerprints, column_hashes(df[col]))
+
+    return fingerprints
+
+
+def _rows_equal(df: pd.DataFrame, left: np.ndarray, right: np.ndarray, columns) -> bool:
+    """
+    True when rows left[i] and right[i] hold equal values (nulls equal).
+    """
+    for col in columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            same = codes[left] == codes[right]
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+            a, b = values[left], values[right]
+            same = (a == b) | (np.isnan(a) & np.isnan(b))
+        else:
+            # None == None holds for object arrays, NaN == NaN does not
+            values = series.to_numpy(dtype=object, na_value=None)
+            same = values[left] == values[right]
+
+        if not np.all(same):
+            return False
+    return True
+
+
+def duplicate_mask(df: pd.DataFrame, subset: list = None) -> pd.Series:
+    """
+    Same result as df.duplicated(subset) (keep='first'), computed on
+    uint64 fingerprints instead of per-column Python-object hash tables.
+    Every flagged row is checked against the row it duplicates; if a
+    fingerprint collides (e.g. 1 vs '1' in a mixed column) this falls
+    back to df.duplicated().
+    """
+    fingerprints = row_fingerprints(df, subset)
+    mask = pd.Series(fingerprints).duplicated().to_numpy()
+
+    dup_positions = np.flatnonzero(mask)
+    if len(dup_positions):
+        first_positions = np.flatnonzero(~mask)
+        lookup = pd.Index(fingerprints[first_positions])
+        originals = first_positions[lookup.get_indexer(fingerprints[dup_positions])]
+
+        if not _rows_equal(df, dup_positions, originals, subset or df.columns):
+            return df.duplicated(subset=subset)
+
+    return pd.Series(mask, index=df.index)
+
+
+# -------------------------
+# STREAMING INDEX
+# -------------------------
+class FingerprintIndex:
+    """
+    Set of 64-bit row fingerprints for dedup across chunks.
+    Fingerprints are kept as sorted numpy runs; runs of similar size are
+    merged, and once more than max_memory_rows are held in memory they are
+    written to spill_dir as a sorted .npy run and memory-mapped, so memory
+    stays bounded however many rows pass through.
+    """
+
+    def __init__(self, max_memory_rows: int = DEDUP_MEMORY_ROWS, spill_dir: str = None):
+        self.max_memory_rows = max_memory_rows
+        self._spill_dir = spill_dir
+        self._owns_spill_dir = False
+        self._runs = []
+        self._disk_runs = []
+        self._loaded_runs = 0
+
+    @classmethod
+    def from_runs(cls, paths: list, max_memory_rows: int = DEDUP_MEMORY_ROWS, spill_dir: str = None):
+        """
+        Index over sorted .npy runs saved earlier (see added()), memory-
+        mapped read-only. They are never modified; fingerprints added
+        later are kept apart from them.
+        """
+        index = cls(max_memory_rows, spill_dir)
+        index._disk_runs = [np.load(path, mmap_mode="r") for path in paths]
+        index._loaded_runs = len(index._disk_runs)
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs + self._disk_runs)
+
+    @property
+    def memory_rows(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(fingerprints), dtype=bool)
+        if not len(fingerprints):
+            return found
+
+        # Sorted probes keep memory-mapped lookups local
+        order = np.argsort(fingerprints, kind="stable")
+        probes = fingerprints[order]
+        hits = np.zeros(len(probes), dtype=bool)
+
+        for run in self._runs + self._disk_runs:
+            positions = np.minimum(np.searchsorted(run, probes), len(run) - 1)
+            hits |= run[positions] == probes
+
+        found[order] = hits
+        return found
+
+    def add_new(self, fingerprints: np.ndarray) -> np.ndarray:
+        """
+        Add a chunk of fingerprints and return a mask of the rows seen
+        for the first time (within the chunk and overall).
+        """
+        is_new = ~pd.Series(fingerprints).duplicated().to_numpy()
+        is_new &= ~self.contains(fingerprints)
+
+        if is_new.any():
+            self._runs.append(np.sort(fingerprints[is_new]))
+
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            newer = self._runs.pop()
+            older = self._runs.pop()
+            self._runs.append(np.sort(np.concatenate([older, newer])))
+
+        if self.memory_rows > self.max_memory_rows:
+            self._spill()
+
+        return is_new
+
+    def added(self) -> np.ndarray:
+        """
+        Sorted fingerprints added since the index was created or loaded.
+        """
+        runs = self._runs + self._disk_runs[self._loaded_runs:]
+        if not runs:
+            return np.empty(0, dtype="uint64")
+        return np.sort(np.concatenate(runs))
+
+    def _spill(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="dedup-")
+            self._owns_spill_dir = True
+        os.makedirs(self._spill_dir, exist_ok=True)
+
+        path = os.path.join(self._spill_dir, f"run-{len(self._disk_runs):05d}.npy")
+        np.save(path, np.sort(np.concatenate(self._runs)))
+
+        self._disk_runs.append(np.load(path, mmap_mode="r"))
+        self._runs = []
+
+    def close(self):
+        self._runs = []
+        self._disk_runs = []
+        if self._owns_spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+            self._owns_spill_dir = False
+
+
+# -------------------------
+# NEAR DUPLICATES (MINHASH / LSH)
+# -------------------------
+_HASH_PRIME = np.uint64(4294967311)   # smallest prime above 2**32
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _normalize_text(df: pd.DataFrame, columns: list) -> pd.Series:
+    parts = [
+        df[col].astype(object).where(df[col].notnull(), "").astype(str)
+        for col in columns
+    ]
+    joined = parts[0].str.cat(parts[1:], sep=" ") if len(parts) > 1 else parts[0]
+    return joined.str.lower().str.replace(_NON_WORD, " ", regex=True).str.strip()
+
+
+def _shingle_hashes(texts: pd.Series, shingle_size: int):
+    """
+    Character n-grams of every row, encoded as uint32 hashes.
+    Returns (row_ids, hashes) with row_ids sorted.
+    """
+    encoded = [t.encode("utf-8") for t in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    counts = np.maximum(lengths - shingle_size + 1, 0)
+    row_ids = np.repeat(np.arange(len(encoded)), counts)
+    offsets = np.repeat(starts, counts) + (
+        np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+
+    hashes = np.zeros(len(offsets), dtype=np.uint64)
+    for i in range(shingle_size):
+        hashes = (hashes * np.uint64(16777619)) ^ buffer[offsets + i]
+
+    return row_ids, hashes & np.uint64(0xFFFFFFFF)
+
+
+def minhash_signatures(texts: pd.Series, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+    """
+    MinHash signature (num_perm uint64 values) per row. Rows whose text
+    is shorter than shingle_size get an all-max signature.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 32, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)
+
+    row_ids, hashes = _shingle_hashes(texts, shingle_size)
+    signatures = np.full((len(texts), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    if len(hashes):
+        present, first = np.unique(row_ids, return_index=True)
+        for k in range(num_perm):
+            permuted = (a[k] * hashes + b[k]) % _HASH_PRIME
+            signatures[present, k] = np.minimum.reduceat(permuted, first)
+
+    return signatures
+
+
+def near_duplicate_mask(
+    df: pd.DataFrame,
+    columns: list = None,
+    threshold: float = 0.9,
+    num_perm: int = 64,
+    bands: int = 16,
+    shingle_size: int = 3
+) -> pd.Series:
+    """
+    Flag rows whose normalized text is a near duplicate of an earlier row.
+    Text columns are lower-cased, stripped of punctuation and joined; rows
+    are compared by MinHash estimates of the Jaccard similarity of their
+    character shingles, with LSH banding to find candidate pairs. Each row
+    is compared with the first row of every LSH bucket it falls in and is
+    flagged when the estimated similarity reaches threshold.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm must be a multiple of bands")
+
+    columns = columns or [col for col in df.columns if is_text_column(df[col])]
+    mask = np.zeros(len(df), dtype=bool)
+    if not columns or not len(df):
+        return pd.Series(mask, index=df.index)
+
+    texts = _normalize_text(df, columns)
+    signatures = minhash_signatures(texts, num_perm, shingle_size)
+    has_text = (texts.str.len() >= shingle_size).to_numpy()
+
+    rows_per_band = num_perm // bands
+    candidates = np.flatnonzero(has_text)
+
+    for band in range(bands):
+        block = signatures[candidates, band * rows_per_band:(band + 1) * rows_per_band]
+        keys = row_fingerprints(pd.DataFrame(block))
+
+        # First row (in file order) of every bucket
+        first = pd.Series(candidates).groupby(keys).transform("first").to_numpy()
+        pairs = first != candidates
+        if not pairs.any():
+            continue
+
+        rows, anchors = candidates[pairs], first[pairs]
+        similarity = (signatures[rows] == signatures[anchors]).mean(axis=1)
+        mask[rows[similarity >= threshold]] = True
+
+    return pd.Series(mask, index=df.index)
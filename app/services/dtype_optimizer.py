@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values become 'category'
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", 0.5))
+
+try:
+    import pyarrow  # noqa: F401
+    _STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    _STRING_DTYPE = None
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """
+    Bytes held by the frame, including the Python strings in object columns.
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def is_text_dtype(dtype) -> bool:
+    """
+    True for the dtypes read_csv loads text as (object), and the
+    category / string dtypes optimize_dtypes turns them into.
+    """
+    return dtype == "object" or isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def is_text_column(series: pd.Series) -> bool:
+    return is_text_dtype(series.dtype)
+
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    # Only when float32 holds every value exactly, so the written CSV and
+    # any later mean fill are unchanged
+    if series.hasnans:
+        return series
+
+    downcast = series.astype("float32")
+    if np.array_equal(downcast.to_numpy(dtype="float64"), series.to_numpy()):
+        return downcast
+    return series
+
+
+def _compact_text(series: pd.Series) -> pd.Series:
+    distinct = series.nunique(dropna=True)
+    if distinct <= CATEGORY_MAX_RATIO * len(series):
+        return series.astype("category")
+
+    # Mixed columns (numbers and strings) keep their Python objects
+    if _STRING_DTYPE is not None and pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return series.astype(_STRING_DTYPE)
+
+    return series
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a freshly loaded frame without changing its values:
+    - integers are downcast to the smallest type that fits
+    - floats become float32 only when that is lossless
+    - low-cardinality text becomes 'category'
+    - other text becomes Arrow-backed strings when pyarrow is installed
+    """
+    columns = {}
+
+    for col in df.columns:
+        series = df[col]
+
+        if pd.api.types.is_bool_dtype(series):
+            columns[col] = series
+        elif pd.api.types.is_integer_dtype(series):
+            columns[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            columns[col] = _downcast_float(series)
+        elif series.dtype == "object":
+            columns[col] = _compact_text(series)
+        else:
+            columns[col] = series
+
+    return pd.DataFrame(columns, index=df.index)
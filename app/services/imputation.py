@@ -0,0 +1,327 @@
+import math
+from itertools import groupby
+import numpy as np
+import pandas as pd
+
+from app.services.dtype_optimizer import is_text_dtype
+
+STRATEGIES = ("mean", "median", "mode", "constant")
+GROUPED_STRATEGIES = ("mean", "median")
+NUMERIC_STRATEGIES = ("mean", "median")
+DEFAULT_TEXT_FILL = "Unknown"
+# Values summed per block by the mean fill (see RunningMean)
+MEAN_BLOCK_SIZE = 65_536
+
+
+def _parse_spec(col: str, spec) -> dict:
+    if isinstance(spec, str):
+        spec = {"strategy": spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid imputation spec for '{col}'")
+
+    strategy = spec.get("strategy")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown imputation strategy for '{col}': {strategy}")
+
+    if strategy == "constant" and "value" not in spec:
+        raise ValueError(f"Constant imputation for '{col}' needs a 'value'")
+
+    group_by = spec.get("group_by")
+    if group_by and strategy not in GROUPED_STRATEGIES:
+        raise ValueError(f"Group-wise imputation supports {', '.join(GROUPED_STRATEGIES)} only")
+
+    return {"strategy": strategy, "value": spec.get("value"), "group_by": group_by}
+
+
+def column_spec(col: str, is_text: bool, spec=None) -> dict:
+    """
+    Resolved spec for one column: spec (a strategy name or dict) if
+    given, else the default for its type.
+    """
+    if spec is None:
+        if is_text:
+            return {"strategy": "constant", "value": DEFAULT_TEXT_FILL, "group_by": None}
+        return {"strategy": "mean", "value": None, "group_by": None}
+
+    spec = _parse_spec(col, spec)
+    if spec["strategy"] in NUMERIC_STRATEGIES and is_text:
+        raise ValueError(f"Strategy '{spec['strategy']}' needs a numeric column: '{col}'")
+    return spec
+
+
+def resolve_strategies(columns, text_columns: set, strategies: dict = None) -> dict:
+    """
+    Strategy spec for every column. Columns without an explicit entry
+    keep the default behaviour: text -> 'Unknown', numeric -> mean.
+
+    strategies maps a column to a strategy name or a dict:
+        {"price": "median",
+         "city": {"strategy": "constant", "value": "N/A"},
+         "score": {"strategy": "mean", "group_by": "team"}}
+    """
+    strategies = strategies or {}
+
+    unknown = [col for col in strategies if col not in columns]
+    if unknown:
+        raise ValueError(f"Unknown imputation columns: {', '.join(unknown)}")
+
+    resolved = {}
+    for col in columns:
+        spec = column_spec(col, col in text_columns, strategies.get(col))
+        if spec["group_by"] and spec["group_by"] not in columns:
+            raise ValueError(f"Unknown group_by column for '{col}': {spec['group_by']}")
+        resolved[col] = spec
+
+    return resolved
+
+
+def describe(col: str, spec: dict) -> str:
+    """
+    Human-readable step, as shown by the frontend.
+    """
+    if spec["strategy"] == "constant":
+        return f"Filled missing values in '{col}' with '{spec['value']}'"
+    if spec["group_by"]:
+        return f"Filled missing values in '{col}' with {spec['strategy']} per '{spec['group_by']}'"
+    return f"Filled missing values in '{col}' with {spec['strategy']}"
+
+
+# -------------------------
+# MEAN
+# -------------------------
+class RunningMean:
+    """
+    Mean of a column fed in pieces (chunks of a streamed file), equal to
+    the bit to column_mean() over all of its values at once: values are
+    summed in blocks of MEAN_BLOCK_SIZE counted from the first value,
+    and the block sums added with math.fsum, so where the pieces split
+    the column makes no difference.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._block_sums = []
+        self._pending = np.empty(0)
+
+    def add(self, values):
+        """
+        values: a Series or array; nulls (NaN) are skipped.
+        """
+        if isinstance(values, pd.Series):
+            values = values.to_numpy(dtype="float64", na_value=np.nan)
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+
+        if len(self._pending):
+            values = np.concatenate([self._pending, values])
+        full = len(values) - len(values) % MEAN_BLOCK_SIZE
+        self._block_sums.extend(
+            float(values[start:start + MEAN_BLOCK_SIZE].sum()) for start in range(0, full, MEAN_BLOCK_SIZE)
+        )
+        self._pending = values[full:].copy()
+        return self
+
+    def mean(self) -> float:
+        if not self.count:
+            return np.nan
+        sums = self._block_sums + [float(self._pending.sum())]
+        try:
+            total = math.fsum(sums)
+        except (OverflowError, ValueError):
+            # inf, -inf or an overflowing total: as numpy would add them
+            total = float(np.sum(sums))
+        return total / self.count
+
+
+def column_mean(values) -> float:
+    """
+    Mean of the non-null values of a Series or float array, the same
+    in memory, streamed in chunks and on the arrow engine.
+    """
+    return RunningMean().add(values).mean()
+
+
+def _mean(series: pd.Series):
+    # Datetimes (after a plan's cast) keep pandas' own mean
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return column_mean(series)
+    return series.mean()
+
+
+def _select(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # Selecting every column would copy the whole frame for nothing
+    return df if len(columns) == df.shape[1] else df[columns]
+
+
+def _fill_values(df: pd.DataFrame, plan: dict) -> dict:
+    """
+    One aggregate call per strategy over all of its columns.
+    """
+    by_strategy = {}
+    for col, spec in plan.items():
+        if not spec["group_by"]:
+            by_strategy.setdefault(spec["strategy"], []).append(col)
+
+    values = {}
+    for col in by_strategy.get("constant", []):
+        values[col] = plan[col]["value"]
+
+    for col in by_strategy.get("mean", []):
+        values[col] = _mean(df[col])
+
+    if by_strategy.get("median"):
+        values.update(_select(df, by_strategy["median"]).median().to_dict())
+
+    if by_strategy.get("mode"):
+        modes = _select(df, by_strategy["mode"]).mode(dropna=True)
+        for col in by_strategy["mode"]:
+            values[col] = modes[col].iloc[0] if len(modes) and pd.notnull(modes[col].iloc[0]) else np.nan
+
+    return values
+
+
+def _grouped_fills(df: pd.DataFrame, plan: dict) -> dict:
+    """
+    Per-row fill values for group-wise columns, falling back to the global
+    statistic for rows whose group has no value at all.
+    """
+    groups = {}
+    for col, spec in plan.items():
+        if spec["group_by"]:
+            groups.setdefault((spec["strategy"], spec["group_by"]), []).append(col)
+
+    fills = {}
+    for (strategy, key), cols in groups.items():
+        stats = df.groupby(key, dropna=False, observed=True, sort=False)[cols].transform(strategy)
+        stats = stats.fillna(getattr(df[cols], strategy)())
+        for col in cols:
+            fills[col] = stats[col]
+    return fills
+
+
+def _fill_series(series: pd.Series, value) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype) and pd.notnull(value) \
+            and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def fill_column(series: pd.Series, spec: dict, keys: pd.Series = None) -> pd.Series:
+    """
+    Fill one column per its resolved spec; keys holds the group_by
+    column for group-wise specs. Same values as impute() would use.
+    """
+    strategy = spec["strategy"]
+    if strategy == "constant":
+        return _fill_series(series, spec["value"])
+
+    if strategy == "mode":
+        modes = series.mode(dropna=True)
+        return _fill_series(series, modes.iloc[0] if len(modes) else np.nan)
+
+    if pd.api.types.is_integer_dtype(series.dtype) and series.dtype.kind != "b":
+        # nullable integers (e.g. after a cast) take fractional means
+        series = series.astype("Float64")
+
+    overall = _mean(series) if strategy == "mean" else series.median()
+    if spec["group_by"]:
+        stats = series.groupby(keys, dropna=False, observed=True, sort=False).transform(strategy)
+        return series.fillna(stats.fillna(overall))
+    return _fill_series(series, overall)
+
+
+def _fill_block(df: pd.DataFrame, columns: list, values: dict) -> pd.DataFrame:
+    """
+    Fill float64 columns as one 2-D array: a single isnan pass and a
+    single masked copy, wrapped back into a frame without another copy.
+    """
+    block = _select(df, columns).to_numpy(dtype="float64", copy=True)
+    fill_row = np.array([values[col] for col in columns], dtype="float64")
+    np.copyto(block, np.broadcast_to(fill_row, block.shape), where=np.isnan(block))
+    return pd.DataFrame(block, index=df.index, columns=columns)
+
+
+def impute(df: pd.DataFrame, strategies: dict = None):
+    """
+    Fill missing values in every column that has any.
+    Null counts come from a single isnull() pass, fill values from one
+    aggregate call per strategy, and float64 columns with a scalar fill
+    are patched as one block. Returns (df, steps).
+    """
+    dtypes = df.dtypes
+    text_columns = {col for col, dtype in dtypes.items() if is_text_dtype(dtype)}
+    plan = resolve_strategies(df.columns, text_columns, strategies)
+
+    null_counts = df.isnull().sum()
+    targets = [col for col in df.columns if null_counts[col] > 0]
+    if not targets:
+        return df, []
+
+    plan = {col: plan[col] for col in targets}
+    values = _fill_values(df, plan)
+    grouped = _grouped_fills(df, plan)
+
+    block_cols = [
+        col for col in targets
+        if col in values and dtypes[col] == "float64" and isinstance(values[col], (int, float))
+    ]
+    block = _fill_block(df, block_cols, values) if block_cols else None
+
+    if block is not None and len(block_cols) == df.shape[1]:
+        result = block
+    else:
+        # Runs of block columns are taken as slices (views) of the block,
+        # everything else column by column, keeping the original order
+        block_set = set(block_cols)
+        pieces = []
+        position = 0
+        for in_block, run in groupby(df.columns, key=lambda col: col in block_set):
+            run = list(run)
+            if in_block:
+                pieces.append(block.iloc[:, position:position + len(run)])
+                position += len(run)
+                continue
+
+            filled = {}
+            for col in run:
+                if col in grouped:
+                    filled[col] = df[col].fillna(grouped[col])
+                elif col in plan:
+                    filled[col] = _fill_series(df[col], values[col])
+                else:
+                    filled[col] = df[col]
+            pieces.append(pd.DataFrame(filled, index=df.index))
+
+        result = pieces[0] if len(pieces) == 1 else pd.concat(pieces, axis=1, copy=False)
+
+    steps = [describe(col, plan[col]) for col in targets]
+
+    return result, steps
+
+
+def streaming_fills(columns, dtypes: dict, null_counts, means, strategies: dict = None):
+    """
+    Fill values for the chunked writer, from the statistics of the scan
+    pass. Only mean and constant can be computed in one pass, so other
+    strategies raise ValueError. Returns (fill_values, steps).
+    """
+    text_columns = {col for col in columns if dtypes[col] == "object"}
+    plan = resolve_strategies(columns, text_columns, strategies)
+
+    fill_values = {}
+    steps = []
+    for col in columns:
+        if null_counts[col] == 0:
+            continue
+
+        spec = plan[col]
+        if spec["strategy"] not in ("mean", "constant") or spec["group_by"]:
+            raise ValueError(
+                f"Imputation strategy '{spec['strategy']}' for '{col}' is not available in streaming mode"
+            )
+
+        fill_values[col] = spec["value"] if spec["strategy"] == "constant" else means[col]
+        steps.append(describe(col, spec))
+
+    return fill_values, steps
@@ -0,0 +1,276 @@
+import os
+import json
+import logging
+import uuid
+import threading
+import multiprocessing
+from datetime import datetime
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+
+from app.database import SessionLocal
+from app.models import CleaningHistory
+from app.services.result_cache import store_result
+from app.utils.activity_logger import activity_entry, get_activity_writer
+from app.utils.metrics import StageTimer, call_with_stages, init_job_worker, record_run
+from app.utils.progress import (
+    call_with_progress,
+    forget_job,
+    start_listener,
+    stop_listener,
+    track_job,
+)
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for pandas work, and how many jobs may wait for one
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 1))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", 100))
+# Files of one batch request on the pool at a time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", JOB_WORKERS))
+
+_executor = None
+_executor_lock = threading.Lock()
+_progress_queue = None
+_slots = threading.BoundedSemaphore(JOB_QUEUE_LIMIT)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _discard_executor():
+    """
+    Drop a broken pool (a worker died, e.g. killed for memory). It never
+    accepts work again; its queued jobs have already failed with
+    BrokenProcessPool and are recorded as FAILED.
+    """
+    global _executor
+    logger.warning("Job worker pool is broken, starting a new one")
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor, _progress_queue
+    with _executor_lock:
+        if _executor is not None and _executor._broken:
+            _discard_executor()
+        if _executor is None:
+            # spawn: the API process is multi-threaded, forking it is unsafe
+            context = multiprocessing.get_context("spawn")
+            if _progress_queue is None:
+                # Workers report job progress here (see app.utils.progress)
+                _progress_queue = context.Queue()
+                start_listener(_progress_queue)
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=context,
+                initializer=init_job_worker,
+                initargs=(_progress_queue,)
+            )
+        return _executor
+
+
+def submit_to_pool(fn, *args, **kwargs):
+    """
+    get_executor().submit(...), on a new pool if the current one broke
+    since it was checked.
+    """
+    executor = get_executor()
+    try:
+        return executor.submit(fn, *args, **kwargs)
+    except BrokenExecutor:
+        with _executor_lock:
+            if _executor is executor:
+                _discard_executor()
+        return get_executor().submit(fn, *args, **kwargs)
+
+
+def shutdown_executor():
+    global _executor, _progress_queue
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+            stop_listener(_progress_queue)
+            _progress_queue = None
+
+
+def apply_pipeline_result(history: CleaningHistory, analysis: dict, cleaning_result: dict):
+    """
+    Copy a finished pipeline run onto its CleaningHistory row.
+    """
+    history.status = "COMPLETED"
+    history.steps_applied = json.dumps(cleaning_result["steps"])
+    history.cleaned_file_path = cleaning_result["cleaned_file_path"]
+    history.output_format = cleaning_result.get("output_format", "csv")
+    history.cleaned_sha256 = cleaning_result.get("cleaned_sha256")
+    history.rows_before = cleaning_result["rows_before"]
+    history.rows_after = cleaning_result["rows_after"]
+    history.duplicates_removed = cleaning_result["duplicates_removed"]
+    history.missing_values_fixed = cleaning_result["missing_values_fixed"]
+    history.data_quality_score = cleaning_result["data_quality_score"]
+    history.result = json.dumps({
+        "analysis": analysis,
+        "cleaning_summary": cleaning_result
+    })
+    history.cleaned_at = datetime.utcnow()
+
+
+def pipeline_activity(user_email: str, analysis: dict, cleaning_result: dict) -> list:
+    """
+    ANALYZE and CLEAN activity entries for a finished pipeline run.
+    """
+    return [
+        activity_entry(
+            user_email,
+            "ANALYZE",
+            f"Rows: {analysis['total_rows']}, Columns: {analysis['total_columns']}"
+        ),
+        activity_entry(
+            user_email,
+            "CLEAN",
+            (
+                f"Rows before: {cleaning_result['rows_before']}, "
+                f"Rows after: {cleaning_result['rows_after']}, "
+                f"Duplicates removed: {cleaning_result['duplicates_removed']}, "
+                f"Missing values fixed: {cleaning_result['missing_values_fixed']}, "
+                f"Quality score: {cleaning_result['data_quality_score']}"
+            )
+        ),
+    ]
+
+
+def log_pipeline_result(user_email: str, analysis: dict, cleaning_result: dict):
+    writer = get_activity_writer()
+    for entry in pipeline_activity(user_email, analysis, cleaning_result):
+        writer.put(entry)
+
+
+def _record_result(history_id: int, cache_key: str, timer: StageTimer, size_bytes: int, future):
+    """
+    Runs in the executor's callback thread once a job has finished.
+    The worker returns its stage timings with the result; they are
+    exported to the metrics of this (the API) process.
+    """
+    _slots.release()
+
+    db = SessionLocal()
+    try:
+        history = db.get(CleaningHistory, history_id)
+        if history is None:
+            return
+
+        error = future.exception()
+        if error is not None:
+            history.status = "FAILED"
+            history.error = str(error) or error.__class__.__name__
+            history.cleaned_at = datetime.utcnow()
+            db.commit()
+            return
+
+        (analysis, cleaning_result), stages = future.result()
+        timer.merge(stages)
+        record_run(timer, "jobs", size_bytes, analysis["total_rows"])
+
+        if cache_key:
+            analysis, cleaning_result = store_result(cache_key, analysis, cleaning_result)
+
+        apply_pipeline_result(history, analysis, cleaning_result)
+        db.commit()
+
+        log_pipeline_result(history.user_email, analysis, cleaning_result)
+    except Exception:
+        logger.exception("Failed to record result of cleaning job %s", history_id)
+    finally:
+        db.close()
+        # After the commit: event streams then read the final status
+        forget_job(history_id)
+
+
+def submit_cleaning_job(
+    history_id: int,
+    file_path: str,
+    options: dict,
+    cache_key: str = None
+):
+    """
+    Queue a pipeline run on the process pool. options are passed to
+    run_pipeline as keyword arguments; the run writes its own output
+    file (run_id). The result is written to the
+    CleaningHistory row (and the result cache) when it finishes.
+    Raises JobQueueFull when JOB_QUEUE_LIMIT jobs are already in flight.
+    """
+    # pandas is only needed once the first job is submitted
+    from app.services.data_cleaning import run_pipeline
+
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFull()
+
+    try:
+        timer = StageTimer()
+        track_job(history_id)
+        future = submit_to_pool(
+            call_with_progress, history_id, run_pipeline, file_path, **options, run_id=uuid.uuid4().hex
+        )
+    except Exception:
+        forget_job(history_id)
+        _slots.release()
+        raise
+
+    done = partial(_record_result, history_id, cache_key, timer, os.path.getsize(file_path))
+    future.add_done_callback(done)
+    return future
+
+
+def run_pipelines(tasks: list, max_in_flight: int = BATCH_CONCURRENCY) -> list:
+    """
+    Run run_pipeline(file_path, **options) for every (file_path, options)
+    in tasks, each with its own output file, on the process pool, with at most max_in_flight submitted at
+    a time so one batch cannot fill the pool's queue ahead of other jobs.
+    Each file in flight holds a JOB_QUEUE_LIMIT slot, as a job does; the
+    batch runs on the slots that are free (up to max_in_flight) and
+    raises JobQueueFull when there are none.
+    Blocks until all are done and returns, in task order,
+    ((analysis, cleaning_result), stages, error) with the result None
+    when error is set.
+    """
+    from app.services.data_cleaning import run_pipeline
+
+    results = [None] * len(tasks)
+    pending = {}
+    position = 0
+
+    slots = 0
+    while slots < min(max(1, max_in_flight), len(tasks)) and _slots.acquire(blocking=False):
+        slots += 1
+    if tasks and not slots:
+        raise JobQueueFull()
+
+    try:
+        while position < len(tasks) or pending:
+            while position < len(tasks) and len(pending) < slots:
+                file_path, options = tasks[position]
+                future = submit_to_pool(
+                    call_with_stages, run_pipeline, file_path, **options, run_id=uuid.uuid4().hex
+                )
+                pending[future] = position
+                position += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if error is not None:
+                    results[index] = (None, {}, error)
+                else:
+                    result, stages = future.result()
+                    results[index] = (result, stages, None)
+    finally:
+        for future in pending:
+            future.cancel()
+        for _ in range(slots):
+            _slots.release()
+
+    return results
@@ -0,0 +1,292 @@
+import io
+import os
+import gzip
+import pandas as pd
+
+from app.utils.storage import COPY_BUFFER_SIZE, HashingWriter
+
+# Compression level for gzip CSV output (1 fastest .. 9 smallest)
+CSV_GZIP_LEVEL = int(os.getenv("CSV_GZIP_LEVEL", 6))
+
+# suffix of the cleaned file, accepted codecs and the default codec
+OUTPUT_FORMATS = {
+    "csv": {"suffix": ".csv", "codecs": (), "default": None},
+    "csv.gz": {"suffix": ".csv.gz", "codecs": (), "default": None},
+    "csv.zst": {"suffix": ".csv.zst", "codecs": (), "default": None},
+    "parquet": {
+        "suffix": ".parquet",
+        "codecs": ("snappy", "zstd", "gzip", "lz4", "brotli", "none"),
+        "default": "snappy"
+    },
+    "feather": {
+        "suffix": ".feather",
+        "codecs": ("lz4", "zstd", "uncompressed"),
+        "default": "lz4"
+    },
+}
+
+# Formats written through pyarrow (an optional dependency)
+_ARROW_FORMATS = ("csv.zst", "parquet", "feather")
+
+
+def output_spec(
+    output_format: str = "csv",
+    compression: str = None,
+    row_group_size: int = None,
+    run_id: str = None
+) -> dict:
+    """
+    Validated output settings: {"format", "compression", "row_group_size",
+    "run_id"} (see cleaned_path for run_id).
+    Raises ValueError for unknown formats, codecs that do not apply to the
+    format, or a missing pyarrow.
+    """
+    output_format = output_format or "csv"
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+
+    info = OUTPUT_FORMATS[output_format]
+    if compression and compression not in info["codecs"]:
+        if not info["codecs"]:
+            raise ValueError(f"Output format '{output_format}' takes no compression codec")
+        raise ValueError(
+            f"Unknown compression '{compression}' for {output_format}, expected one of {', '.join(info['codecs'])}"
+        )
+    if row_group_size and output_format != "parquet":
+        raise ValueError("row_group_size only applies to parquet output")
+
+    if output_format in _ARROW_FORMATS:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError(f"Output format '{output_format}' requires pyarrow")
+
+    return {
+        "format": output_format,
+        "compression": compression or info["default"],
+        "row_group_size": row_group_size,
+        "run_id": run_id
+    }
+
+
+def cleaned_path(file_path: str, spec: dict = None) -> str:
+    """
+    '<name>_cleaned<suffix>' next to the input file, or
+    '<name>_cleaned-<run_id><suffix>' for a run with its own output:
+    runs on one stored upload with different options then never write
+    (or cache) each other's file.
+    """
+    spec = spec or {}
+    suffix = OUTPUT_FORMATS[spec.get("format", "csv")]["suffix"]
+    if spec.get("run_id"):
+        suffix = f"-{spec['run_id']}{suffix}"
+    return file_path.replace(".csv", "_cleaned" + suffix)
+
+
+# -------------------------
+# WRITERS
+# -------------------------
+def _open_csv(out: HashingWriter, spec: dict, append: bool = False):
+    """
+    Text handle for CSV output to out, compressing on the fly. append
+    adds to an existing file; compressed output gets a new gzip member
+    or zstd frame, which decoders read as one stream. Close out after
+    the handle (a gzip handle leaves it open).
+    """
+    if spec["format"] == "csv.gz":
+        # mtime=0: identical frames give identical bytes
+        raw = gzip.GzipFile(fileobj=out, mode="ab" if append else "wb", compresslevel=CSV_GZIP_LEVEL, mtime=0)
+    elif spec["format"] == "csv.zst":
+        import pyarrow as pa
+
+        raw = pa.CompressedOutputStream(out, "zstd")
+    else:
+        raw = io.BufferedWriter(out, COPY_BUFFER_SIZE)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.isna(), series.astype(str))
+
+
+# -------------------------
+# STABLE SCHEMA
+# -------------------------
+# Parquet and Feather columns get the types a plain read_csv gives: bool,
+# int64, float64 or string. The compact dtypes of the in-memory path
+# (int8, float32, category, Arrow strings) are widened back, so the
+# schema does not depend on the mode, engine or file size.
+def stable_arrow_type(arrow_type):
+    """
+    Output type of a column of arrow_type (arrow engine tables).
+    """
+    import pyarrow as pa
+
+    if pa.types.is_boolean(arrow_type):
+        return pa.bool_()
+    if pa.types.is_unsigned_integer(arrow_type):
+        return pa.uint64()
+    if pa.types.is_integer(arrow_type):
+        return pa.int64()
+    if pa.types.is_floating(arrow_type):
+        return pa.float64()
+    return pa.string()
+
+
+def _stable_type(dtype):
+    import pyarrow as pa
+
+    # Categories and object columns are text, whatever values they hold
+    if dtype == "object" or isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return pa.string()
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_unsigned_integer_dtype(dtype):
+        return pa.uint64()
+    if pd.api.types.is_integer_dtype(dtype):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    return pa.string()
+
+
+def stable_schema(df: pd.DataFrame):
+    import pyarrow as pa
+
+    return pa.schema([(str(name), _stable_type(dtype)) for name, dtype in df.dtypes.items()])
+
+
+def _plain_text(series: pd.Series) -> bool:
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    return series.dtype == "object" and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty")
+
+
+def _arrow_table(df: pd.DataFrame, schema=None):
+    """
+    Arrow table of df in the stable schema (or schema, e.g. the one the
+    first chunk of a file was written with).
+    """
+    import pyarrow as pa
+
+    schema = schema or stable_schema(df)
+
+    # Categories, mixed columns (e.g. booleans filled with 'Unknown') and
+    # other non-string text are stored as the text the CSV output holds
+    text = [
+        field.name for field in schema
+        if pa.types.is_string(field.type) and not _plain_text(df[field.name])
+    ]
+    if text:
+        df = df.assign(**{name: _as_text(df[name]) for name in text})
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_frame(df: pd.DataFrame, path: str, spec: dict = None) -> str:
+    """
+    Write a whole frame in the requested format. Returns the file's
+    SHA-256, computed while writing.
+    """
+    spec = spec or output_spec()
+
+    with HashingWriter(path) as out:
+        if spec["format"].startswith("csv"):
+            with _open_csv(out, spec) as handle:
+                df.to_csv(handle, index=False)
+        elif spec["format"] == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(
+                _arrow_table(df), out,
+                compression=spec["compression"],
+                row_group_size=spec["row_group_size"]
+            )
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(_arrow_table(df), out, compression=spec["compression"])
+    return out.hexdigest()
+
+
+# Formats a ChunkWriter can append to an existing file
+APPENDABLE_FORMATS = ("csv", "csv.gz", "csv.zst")
+
+
+class ChunkWriter:
+    """
+    Appends frames (streaming mode chunks) to one output file. Parquet
+    and Feather take their (stable) schema from the first chunk; the
+    streaming pass pins dtypes, so later chunks match it. append continues an
+    existing CSV file (APPENDABLE_FORMATS) without a second header;
+    hasher then holds the hash of its contents (see copy_hashed).
+    sha256 is the file's hash once the writer is closed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        spec: dict = None,
+        columns: list = None,
+        append: bool = False,
+        hasher=None
+    ):
+        self.spec = spec or output_spec()
+        if append and self.spec["format"] not in APPENDABLE_FORMATS:
+            raise ValueError(f"Cannot append to {self.spec['format']} output")
+        self.path = path
+        self.columns = columns
+        self.append = append
+        self.hasher = hasher
+        self.chunks = 0
+        self.sha256 = None
+        self._out = None
+        self._handle = None
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        self._out = HashingWriter(self.path, "ab" if self.append else "wb", self.hasher)
+        if self.spec["format"].startswith("csv"):
+            self._handle = _open_csv(self._out, self.spec, self.append)
+        return self
+
+    def _arrow_writer(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+
+        self._schema = stable_schema(chunk)
+
+        if self.spec["format"] == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self._out, self._schema, compression=self.spec["compression"])
+        else:
+            codec = self.spec["compression"]
+            options = pa.ipc.IpcWriteOptions(compression=None if codec == "uncompressed" else codec)
+            self._writer = pa.ipc.new_file(self._out, self._schema, options=options)
+
+    def write(self, chunk: pd.DataFrame):
+        if self._handle is not None:
+            chunk.to_csv(self._handle, header=(self.chunks == 0 and not self.append), index=False)
+        else:
+            if self._writer is None:
+                self._arrow_writer(chunk)
+
+            table = _arrow_table(chunk, self._schema)
+            if self.spec["format"] == "parquet":
+                self._writer.write_table(table, row_group_size=self.spec["row_group_size"])
+            else:
+                self._writer.write_table(table)
+        self.chunks += 1
+
+    def __exit__(self, *exc_info):
+        if self._handle is not None:
+            self._handle.close()
+        elif self._writer is not None:
+            self._writer.close()
+        self._out.close()
+
+        if self._handle is None and self._writer is None and exc_info[0] is None:
+            # No chunks: still leave a valid (empty) file
+            self.sha256 = write_frame(pd.DataFrame(columns=self.columns or []), self.path, self.spec)
+        else:
+            self.sha256 = self._out.hexdigest()
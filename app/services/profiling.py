@@ -0,0 +1,183 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from app.services.dtype_optimizer import is_text_dtype
+
+# Processes that compute column statistics; 1 profiles in-process
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", os.cpu_count() or 1))
+# Frames with fewer cells (rows x columns) are not worth shipping to workers
+PROFILE_PARALLEL_MIN_CELLS = int(os.getenv("PROFILE_PARALLEL_MIN_CELLS", 2_000_000))
+PROFILE_TOP_K = int(os.getenv("PROFILE_TOP_K", 5))
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Relative cost of a column per row, used to balance shards
+_TEXT_COST = 4
+_NUMERIC_COST = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PROFILE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+# -------------------------
+# PER-COLUMN STATISTICS
+# -------------------------
+def json_value(value):
+    """
+    Plain Python value for the JSON response (NaN becomes None).
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _top_values(series: pd.Series, top_k: int) -> list:
+    counts = series.value_counts(dropna=True, sort=True).head(top_k)
+    return [
+        {"value": json_value(value), "count": int(count)}
+        for value, count in counts.items()
+    ]
+
+
+def _string_lengths(series: pd.Series) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Measure each category once and index the lengths by code
+        codes = series.cat.codes.to_numpy()
+        lengths = series.cat.categories.astype(str).str.len().to_numpy()
+        return lengths[codes[codes >= 0]]
+    return series.dropna().astype(str).str.len().to_numpy()
+
+
+def _numeric_stats(series: pd.Series) -> dict:
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"min": None, "max": None, "mean": None, "std": None, "quantiles": {}}
+
+    return {
+        "min": json_value(series.min()),
+        "max": json_value(series.max()),
+        "mean": json_value(values.mean()),
+        "std": json_value(values.std(ddof=1)) if len(values) > 1 else None,
+        "quantiles": {
+            str(q): json_value(v)
+            for q, v in zip(QUANTILES, np.quantile(values, QUANTILES))
+        }
+    }
+
+
+def _text_stats(series: pd.Series) -> dict:
+    lengths = _string_lengths(series)
+    if not len(lengths):
+        return {"min_length": None, "max_length": None, "mean_length": None}
+
+    return {
+        "min_length": int(lengths.min()),
+        "max_length": int(lengths.max()),
+        "mean_length": float(lengths.mean())
+    }
+
+
+def _column_stats(series: pd.Series, top_k: int) -> dict:
+    stats = {
+        "count": int(series.count()),
+        "distinct": int(series.nunique(dropna=True)),
+        "top_values": _top_values(series, top_k)
+    }
+
+    if is_text_dtype(series.dtype):
+        stats.update(_text_stats(series))
+    elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        stats.update(_numeric_stats(series))
+
+    return stats
+
+
+def profile_shard(df: pd.DataFrame, top_k: int = PROFILE_TOP_K) -> dict:
+    """
+    Statistics for every column of df. Runs in a worker process.
+    """
+    return {col: _column_stats(df[col], top_k) for col in df.columns}
+
+
+# -------------------------
+# SHARDING
+# -------------------------
+def _column_cost(dtype) -> int:
+    if is_text_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+        return _TEXT_COST
+    return _NUMERIC_COST
+
+
+def shard_columns(df: pd.DataFrame, shards: int) -> list:
+    """
+    Split the columns into at most `shards` lists of similar total cost
+    (longest-processing-time-first greedy assignment).
+    """
+    costs = sorted(
+        ((_column_cost(dtype), position) for position, dtype in enumerate(df.dtypes)),
+        reverse=True
+    )
+    loads = [0] * shards
+    members = [[] for _ in range(shards)]
+
+    for cost, position in costs:
+        target = loads.index(min(loads))
+        loads[target] += cost
+        members[target].append(position)
+
+    return [sorted(positions) for positions in members if positions]
+
+
+def profile_columns(df: pd.DataFrame, top_k: int = PROFILE_TOP_K) -> dict:
+    """
+    Quantiles, distinct counts, min/max, top-k values and string-length
+    statistics per column. Wide or long frames are split into column
+    shards that are profiled in parallel by PROFILE_WORKERS processes
+    (in-process when already running in a job worker); the result is
+    keyed by column in the frame's order.
+    """
+    if PROFILE_WORKERS <= 1 or df.shape[1] < 2 or df.size < PROFILE_PARALLEL_MIN_CELLS:
+        return profile_shard(df, top_k)
+
+    # Inside a job worker the job pool already occupies the cores, and a
+    # nested pool would keep the worker from exiting on shutdown
+    if multiprocessing.parent_process() is not None:
+        return profile_shard(df, top_k)
+
+    shards = shard_columns(df, min(PROFILE_WORKERS, df.shape[1]))
+    executor = get_executor()
+    futures = [executor.submit(profile_shard, df.iloc[:, positions], top_k) for positions in shards]
+
+    stats = {}
+    for future in futures:
+        stats.update(future.result())
+
+    return {col: stats[col] for col in df.columns}
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+
+from app.utils.storage import UPLOAD_DIR
+
+CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(UPLOAD_DIR, "cache"))
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_MB", 10240)) * 1024 * 1024
+CACHE_MAX_AGE_SECONDS = int(os.getenv("RESULT_CACHE_MAX_AGE_HOURS", 168)) * 3600
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_key(content_sha256: str, config: dict, version: str) -> str:
+    """
+    Key for one pipeline result: same bytes + same options + same code.
+    """
+    payload = json.dumps(
+        {"sha256": content_sha256, "config": config, "version": version},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + ".json")
+
+
+def _artifact_path(key: str, source_path: str) -> str:
+    # Keep double extensions such as .csv.gz intact
+    suffix = os.path.splitext(source_path)[1]
+    for double in (".csv.gz", ".csv.zst"):
+        if source_path.endswith(double):
+            suffix = double
+    return os.path.join(CACHE_DIR, key + suffix)
+
+
+def _remove_entry(meta_path: str):
+    try:
+        with open(meta_path) as f:
+            artifact = json.load(f)["cleaning_summary"]["cleaned_file_path"]
+    except (OSError, ValueError, KeyError):
+        artifact = None
+
+    for path in (meta_path, artifact):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def get_cached_result(key: str):
+    """
+    Returns (analysis, cleaning_result) or None. No pandas work on a hit.
+    """
+    meta_path = _entry_path(key)
+
+    try:
+        with open(meta_path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+
+    artifact = entry["cleaning_summary"]["cleaned_file_path"]
+    expired = time.time() - entry["stored_at"] > CACHE_MAX_AGE_SECONDS
+
+    if expired or (artifact and not os.path.exists(artifact)):
+        _remove_entry(meta_path)
+        _count("misses")
+        return None
+
+    # atime tracks last use for LRU; mtime stays the store time
+    os.utime(meta_path, (time.time(), entry["stored_at"]))
+    _count("hits")
+    return entry["analysis"], entry["cleaning_summary"]
+
+
+def store_result(key: str, analysis: dict, cleaning_result: dict):
+    """
+    Cache a pipeline result together with its cleaned file, which is
+    linked (or copied) into the cache and then removed, so the run's own
+    output file (see output_formats.cleaned_path) does not pile up.
+    Returns the result with cleaned_file_path pointing into the cache.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    source = cleaning_result["cleaned_file_path"]
+    cached_result = dict(cleaning_result)
+
+    if source:
+        artifact = _artifact_path(key, source)
+        partial = f"{artifact}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(source, partial)
+        except OSError:
+            shutil.copyfile(source, partial)
+        os.replace(partial, artifact)
+        os.remove(source)
+        cached_result["cleaned_file_path"] = artifact
+
+    meta_path = _entry_path(key)
+    partial = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+    with open(partial, "w") as f:
+        json.dump({
+            "stored_at": time.time(),
+            "analysis": analysis,
+            "cleaning_summary": cached_result
+        }, f)
+    os.replace(partial, meta_path)
+
+    _count("stores")
+    evict()
+
+    return analysis, cached_result
+
+
+def _entries():
+    """
+    (meta_path, stored_at, last_used, size_bytes) per cached result, where
+    the size covers the metadata file and the cleaned artifact.
+    """
+    sizes = {}
+    times = {}
+
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".tmp"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+
+        key = entry.name.split(".", 1)[0]
+        sizes[key] = sizes.get(key, 0) + stat.st_size
+        if entry.name.endswith(".json"):
+            times[key] = (stat.st_mtime, stat.st_atime)
+
+    return [
+        (_entry_path(key), stored_at, last_used, sizes[key])
+        for key, (stored_at, last_used) in times.items()
+    ]
+
+
+def evict():
+    """
+    Drop entries older than CACHE_MAX_AGE_SECONDS, then least recently
+    used entries until the cache fits in CACHE_MAX_BYTES.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    now = time.time()
+    entries = sorted(_entries(), key=lambda e: e[2])
+    total = sum(e[3] for e in entries)
+    evicted = 0
+
+    for meta_path, stored_at, _, size in entries:
+        if now - stored_at <= CACHE_MAX_AGE_SECONDS and total <= CACHE_MAX_BYTES:
+            continue
+        _remove_entry(meta_path)
+        total -= size
+        evicted += 1
+
+    if evicted:
+        _count("evictions", evicted)
+
+
+def cache_stats():
+    entries = _entries() if os.path.isdir(CACHE_DIR) else []
+
+    with _stats_lock:
+        stats = dict(_stats)
+
+    lookups = stats["hits"] + stats["misses"]
+    stats.update({
+        "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": len(entries),
+        "size_bytes": sum(e[3] for e in entries),
+        "max_bytes": CACHE_MAX_BYTES,
+        "max_age_seconds": CACHE_MAX_AGE_SECONDS
+    })
+    return stats
@@ -0,0 +1,267 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+
+# HyperLogLog registers = 2 ** precision (relative error 1.04 / sqrt(registers))
+SKETCH_HLL_PRECISION = int(os.getenv("SKETCH_HLL_PRECISION", 14))
+# t-digest centroids; higher is more accurate and larger
+SKETCH_TDIGEST_COMPRESSION = int(os.getenv("SKETCH_TDIGEST_COMPRESSION", 200))
+# Count-Min: counts overshoot by at most epsilon * rows with probability 1 - delta
+SKETCH_CMS_EPSILON = float(os.getenv("SKETCH_CMS_EPSILON", 0.002))
+SKETCH_CMS_DELTA = float(os.getenv("SKETCH_CMS_DELTA", 0.01))
+# Values holding at least this share of the rows are always reported as candidates
+SKETCH_HEAVY_HITTER_SHARE = float(os.getenv("SKETCH_HEAVY_HITTER_SHARE", 0.001))
+SKETCH_SAMPLE_ROWS = int(os.getenv("SKETCH_SAMPLE_ROWS", 20))
+
+
+def mix64(hashes: np.ndarray) -> np.ndarray:
+    """
+    splitmix64 finalizer: spreads entropy over all 64 bits, so sketches
+    can take register and bucket indexes from the top bits.
+    """
+    h = hashes.astype(np.uint64, copy=True)
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return h
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # Exact for uint64: each 32-bit half fits a float64 mantissa
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+
+    length = np.zeros(len(values), dtype=np.int64)
+    has_high = high > 0
+    has_low = ~has_high & (low > 0)
+    length[has_high] = np.floor(np.log2(high[has_high])).astype(np.int64) + 33
+    length[has_low] = np.floor(np.log2(low[has_low])).astype(np.int64) + 1
+    return length
+
+
+def quantile_rank_error(q: float, compression: int = SKETCH_TDIGEST_COMPRESSION) -> float:
+    """
+    Largest share of rows one t-digest centroid can span at quantile q.
+    """
+    return math.pi * math.sqrt(q * (1 - q)) / compression
+
+
+# -------------------------
+# CARDINALITY
+# -------------------------
+class HyperLogLog:
+    """
+    Distinct-count estimate from 2 ** precision one-byte registers.
+    """
+
+    def __init__(self, precision: int = SKETCH_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+
+        hashes = mix64(hashes)
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype(np.intp)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        rank = (tail_bits - _bit_length(tail) + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+# -------------------------
+# QUANTILES
+# -------------------------
+class TDigest:
+    """
+    Merging t-digest: values are kept as weighted centroids, small near
+    the tails and larger around the median, so tail quantiles stay sharp.
+    Each update sorts the new values together with the centroids and
+    merges neighbours that fall into the same unit of the scale function.
+    """
+
+    def __init__(self, compression: int = SKETCH_TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def rank_error(self, q: float) -> float:
+        return quantile_rank_error(q, self.compression)
+
+    def _scale(self, q: np.ndarray) -> np.ndarray:
+        return self.compression / math.pi * np.arcsin(2 * q - 1)
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        cumulative = np.cumsum(weights)
+        q_left = (cumulative - weights) / cumulative[-1]
+        cluster = np.floor(self._scale(q_left) - self._scale(0.0)).astype(np.int64)
+
+        starts = np.flatnonzero(np.concatenate([[True], cluster[1:] != cluster[:-1]]))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float:
+        if not len(self.weights):
+            return None
+
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0], centers, [self.weights.sum()]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * self.weights.sum(), positions, values))
+
+
+# -------------------------
+# FREQUENT VALUES
+# -------------------------
+class CountMinSketch:
+    """
+    Count-Min sketch over value hashes, plus the candidate values that
+    could be heavy hitters. A value holding at least heavy_share of all
+    rows holds at least that share of some chunk, so taking every value
+    at or above heavy_share of a chunk as a candidate never misses one.
+    """
+
+    def __init__(
+        self,
+        epsilon: float = SKETCH_CMS_EPSILON,
+        delta: float = SKETCH_CMS_DELTA,
+        heavy_share: float = SKETCH_HEAVY_HITTER_SHARE,
+        seed: int = 1
+    ):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.heavy_share = heavy_share
+        self.total = 0
+
+        depth = max(1, math.ceil(math.log(1 / delta)))
+        self._width_bits = max(1, math.ceil(math.log2(math.e / epsilon)))
+        self.table = np.zeros((depth, 1 << self._width_bits), dtype=np.int64)
+
+        # multiply-shift hashing: odd multipliers, bucket from the top bits
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.candidates = {}
+
+    @property
+    def max_overcount(self) -> int:
+        return int(math.ceil(self.epsilon * self.total))
+
+    def _buckets(self, hashes: np.ndarray) -> np.ndarray:
+        shift = np.uint64(64 - self._width_bits)
+        return np.stack([(hashes * a) >> shift for a in self._multipliers]).astype(np.intp)
+
+    def update(self, values: pd.Series, hashes: np.ndarray):
+        """
+        values and their hashes, nulls already dropped.
+        """
+        if not len(hashes):
+            return
+
+        codes, unique = pd.factorize(hashes)
+        counts = np.bincount(codes)
+        for row, bucket in enumerate(self._buckets(mix64(unique))):
+            self.table[row] += np.bincount(bucket, weights=counts, minlength=self.table.shape[1]).astype(np.int64)
+        self.total += len(hashes)
+
+        heavy = np.flatnonzero(counts >= self.heavy_share * len(hashes))
+        if len(heavy):
+            # Codes follow first appearance; reversed writes leave the first position
+            first = np.empty(len(unique), dtype=np.int64)
+            first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+            for code in heavy:
+                self.candidates.setdefault(int(unique[code]), values.iloc[first[code]])
+
+        self._prune()
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        buckets = self._buckets(mix64(hashes))
+        return np.min(self.table[np.arange(len(self.table))[:, None], buckets], axis=0)
+
+    def _prune(self):
+        if not self.candidates:
+            return
+        hashes = np.fromiter(self.candidates, dtype=np.uint64, count=len(self.candidates))
+        keep = self.estimate(hashes) >= self.heavy_share * self.total
+        self.candidates = {int(h): self.candidates[int(h)] for h in hashes[keep]}
+
+    def top(self, k: int) -> list:
+        """
+        (value, estimated_count) for the k most frequent candidates.
+        """
+        if not self.candidates:
+            return []
+        hashes = np.fromiter(self.candidates, dtype=np.uint64, count=len(self.candidates))
+        estimates = self.estimate(hashes)
+        order = np.argsort(-estimates, kind="stable")[:k]
+        return [(self.candidates[int(hashes[i])], int(estimates[i])) for i in order]
+
+
+# -------------------------
+# SAMPLING
+# -------------------------
+class Reservoir:
+    """
+    Uniform random sample of `size` rows (Algorithm R, one chunk at a time).
+    """
+
+    def __init__(self, size: int = SKETCH_SAMPLE_ROWS, seed: int = None):
+        self.size = size
+        self.seen = 0
+        self.rows = []
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: pd.DataFrame):
+        positions = np.arange(self.seen, self.seen + len(chunk))
+        slots = positions.copy()
+        late = positions >= self.size
+        slots[late] = self._rng.integers(0, positions[late] + 1)
+
+        picked = np.flatnonzero(slots < self.size)
+        records = chunk.iloc[picked].to_dict("records")
+
+        # Same outcome as replacing one row at a time: later rows win a slot
+        for slot, record in zip(slots[picked], records):
+            if slot < len(self.rows):
+                self.rows[slot] = record
+            else:
+                self.rows.append(record)
+
+        self.seen += len(chunk)
@@ -1,17 +1,274 @@
-from sqlalchemy.orm import Session
-from app.models import ActivityLog
-
-
-def log_activity(
-    db: Session,
-    user_email: str,
-    action: str,
-    description: str = None
-):
-    log = ActivityLog(
-        user_email=user_email,
-        action=action,
-        description=description
-    )
-    db.add(log)
-    db.commit()
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models import ActivityLog
+from app.utils.metrics import ACTIVITY_LOG_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+# Entries are bulk-inserted once this many are queued, or after this long
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 200))
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", 1.0))
+# Callers block once this many entries are waiting for the writer
+ACTIVITY_LOG_MAX_QUEUE = int(os.getenv("ACTIVITY_LOG_MAX_QUEUE", 10_000))
+# Pause before the one retry of a failed bulk insert
+ACTIVITY_LOG_RETRY_SECONDS = float(os.getenv("ACTIVITY_LOG_RETRY_SECONDS", 1.0))
+
+
+class ActivityLogWriter:
+    """
+    Buffers activity log entries in memory and writes them from a
+    background thread in bulk INSERTs, so requests never wait on a log
+    commit. A full buffer blocks the caller until the writer catches up.
+    A failed insert is retried once; entries lost after that are logged
+    one by one and counted (stats()["failed"], activity_log_entries_total).
+    session_factory is anything returning a SQLAlchemy Session (tests
+    can pass a sessionmaker bound to SQLite).
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = ACTIVITY_LOG_BATCH_SIZE,
+        flush_seconds: float = ACTIVITY_LOG_FLUSH_SECONDS,
+        max_queue: int = ACTIVITY_LOG_MAX_QUEUE,
+        retry_seconds: float = ACTIVITY_LOG_RETRY_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "blocked": 0, "retried": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def try_put(self, entry: dict) -> bool:
+        """
+        Queue entry unless the buffer is full; never blocks.
+        """
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            return False
+        self._count("queued")
+        return True
+
+    def put(self, entry: dict):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # Backpressure: wait for the writer instead of growing the buffer
+            self._count("blocked")
+            self._queue.put(entry)
+        self._count("queued")
+
+    def _drain(self, limit: int) -> list:
+        entries = []
+        while len(entries) < limit:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _insert(self, entries: list):
+        db = self.session_factory()
+        try:
+            db.execute(insert(ActivityLog), entries)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _lost(self, entries: list):
+        # Audit rows must not vanish silently: keep them in the log output
+        logger.exception("Failed to write %d activity log entries, they are lost", len(entries))
+        for entry in entries:
+            logger.error(
+                "Lost activity log entry: %s %s %s %s",
+                entry["created_at"].isoformat(), entry["user_email"], entry["action"], entry["description"]
+            )
+        self._count("failed", len(entries))
+        ACTIVITY_LOG_ENTRIES.inc(len(entries), outcome="failed")
+
+    def _write(self, entries: list):
+        if not entries:
+            return
+
+        with self._write_lock:
+            try:
+                self._insert(entries)
+            except Exception:
+                # Once more on a new session; usually a dropped connection
+                logger.warning("Writing %d activity log entries failed, retrying", len(entries), exc_info=True)
+                self._count("retried")
+                time.sleep(self.retry_seconds)
+                try:
+                    self._insert(entries)
+                except Exception:
+                    self._lost(entries)
+                    return
+
+            self._count("written", len(entries))
+            self._count("batches")
+            ACTIVITY_LOG_ENTRIES.inc(len(entries), outcome="written")
+
+    def write(self, entries: list):
+        """
+        Write entries now, from the calling thread, in one INSERT (for
+        callers that produce many at once, e.g. a batch upload).
+        """
+        self._count("queued", len(entries))
+        self._write(entries)
+
+    def flush(self):
+        """
+        Write everything queued so far, from the calling thread.
+        """
+        while True:
+            entries = self._drain(self.batch_size)
+            if not entries:
+                return
+            self._write(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+
+            # Collect until the batch is full or the oldest entry is due
+            batch = [first]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+
+    def close(self):
+        """
+        Stop the background thread and write whatever is still queued.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_activity_writer() -> ActivityLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ActivityLogWriter()
+            _writer.start()
+        return _writer
+
+
+def activity_writer_stats() -> dict:
+    return get_activity_writer().stats()
+
+
+def start_activity_writer(session_factory=None) -> ActivityLogWriter:
+    """
+    Start the shared writer, optionally against another session factory.
+    """
+    global _writer
+    stop_activity_writer()
+    with _writer_lock:
+        _writer = ActivityLogWriter(session_factory or SessionLocal)
+        _writer.start()
+        return _writer
+
+
+def stop_activity_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def activity_entry(
+    user_email: str,
+    action: str,
+    description: str = None
+) -> dict:
+    return {
+        "user_email": user_email,
+        "action": action,
+        "description": description,
+        "created_at": datetime.utcnow()
+    }
+
+
+def log_activity(
+    user_email: str,
+    action: str,
+    description: str = None
+):
+    """
+    Queue an activity log entry; it is written in the next batch.
+    """
+    get_activity_writer().put(activity_entry(user_email, action, description))
+
+
+async def log_activity_async(
+    user_email: str,
+    action: str,
+    description: str = None
+):
+    """
+    log_activity for async handlers. A full buffer is waited on from a
+    worker thread, so backpressure never stalls the event loop.
+    """
+    entry = activity_entry(user_email, action, description)
+    writer = get_activity_writer()
+    if not writer.try_put(entry):
+        await run_in_threadpool(writer.put, entry)
+
+
+def log_activities(entries: list):
+    """
+    Write many activity_entry() dicts in one bulk INSERT, right away.
+    """
+    get_activity_writer().write(entries)
@@ -0,0 +1,92 @@
+import os
+import lzma
+import zlib
+import gzip
+import tarfile
+import zipfile
+
+# Uncompressed bytes one archive may expand to (zip bomb guard)
+BATCH_MAX_EXPANDED_MB = int(os.getenv("BATCH_MAX_EXPANDED_MB", 10240))
+
+# Raised while reading a corrupt or truncated archive member
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, zlib.error, lzma.LZMAError, EOFError)
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def _is_csv_member(name: str) -> bool:
+    base = os.path.basename(name)
+    # Skip directories, hidden files and macOS resource forks
+    return (
+        base.lower().endswith(".csv")
+        and not base.startswith(".")
+        and not name.startswith("__MACOSX/")
+    )
+
+
+def _check_expanded(total: int):
+    if total > BATCH_MAX_EXPANDED_MB * 1024 * 1024:
+        raise ValueError(f"Archive expands to more than {BATCH_MAX_EXPANDED_MB} MB")
+
+
+def _zip_members(fileobj):
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid zip archive")
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and _is_csv_member(info.filename)
+        ]
+        # The central directory lists every size up front; reads are
+        # capped at the listed size, so this bounds the whole archive
+        _check_expanded(sum(info.file_size for info in members))
+
+        for info in members:
+            with archive.open(info) as member:
+                yield info.filename, member
+
+
+def _tar_members(fileobj):
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        raise ValueError("Not a valid tar archive")
+
+    total = 0
+    with archive:
+        # Iterating reads one header at a time; members are streamed
+        # from the (possibly compressed) archive, never extracted
+        for info in archive:
+            if not info.isfile() or not _is_csv_member(info.name):
+                continue
+            total += info.size
+            _check_expanded(total)
+
+            member = archive.extractfile(info)
+            with member:
+                yield info.name, member
+
+
+def iter_csv_files(filename: str, fileobj):
+    """
+    (name, file object) for every CSV in an upload: the upload itself,
+    or each .csv member of a zip or tar archive, read as a stream. Only
+    one member is open at a time. Raises ValueError for a corrupt archive
+    or one that expands past BATCH_MAX_EXPANDED_MB.
+    """
+    if not is_archive(filename):
+        yield filename, fileobj
+        return
+
+    if filename.lower().endswith(ZIP_SUFFIXES):
+        yield from _zip_members(fileobj)
+    else:
+        yield from _tar_members(fileobj)
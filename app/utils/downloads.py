@@ -0,0 +1,127 @@
+import os
+import zlib
+from urllib.parse import quote
+
+from app.utils.storage import COPY_BUFFER_SIZE
+
+# Bytes read from disk per chunk of a download
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", COPY_BUFFER_SIZE))
+# zlib level for on-the-fly gzip (1 fastest .. 9 smallest)
+DOWNLOAD_GZIP_LEVEL = int(os.getenv("DOWNLOAD_GZIP_LEVEL", 6))
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "csv.zst": "application/zstd",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+
+# Only plain CSV gains from compression; the other formats already are
+COMPRESSIBLE_FORMATS = ("csv",)
+
+
+# -------------------------
+# REQUEST HEADERS
+# -------------------------
+def parse_range(header: str, size: int):
+    """
+    (start, end) inclusive for a single 'bytes=' range, None when the
+    header is absent, malformed or asks for several ranges (the whole
+    file is sent then). Raises ValueError when the range lies outside
+    the file (416).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not first:
+            # bytes=-N: the last N bytes
+            length = int(last)
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+
+    if not first and length <= 0 or start >= size:
+        raise ValueError("range not satisfiable")
+    if start > end:
+        return None
+    return start, end
+
+
+def accepts_gzip(header: str) -> bool:
+    """
+    True when Accept-Encoding allows gzip (q > 0).
+    """
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def etag_matches(header: str, etag: str, strong: bool = False) -> bool:
+    """
+    If-None-Match comparison (weak validators included), or with strong
+    set the If-Range one: a single strong tag, equal byte for byte
+    (RFC 9110 13.1.5).
+    """
+    if not header:
+        return False
+    if strong:
+        return header.strip() == etag
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+# -------------------------
+# BODY ITERATORS
+# -------------------------
+def iter_file(path: str, start: int = 0, end: int = None):
+    """
+    Yield bytes start..end (inclusive) of path in DOWNLOAD_CHUNK_SIZE
+    pieces. Runs in the threadpool under StreamingResponse.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = (os.path.getsize(path) if end is None else end + 1) - start
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_gzip(path: str):
+    """
+    Yield path gzip-compressed chunk by chunk.
+    """
+    compressor = zlib.compressobj(DOWNLOAD_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in iter_file(path):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,292 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.utils.progress import init_worker, report_pass, report_rows, report_stage
+
+# Peak RSS per stage (Linux only). Measuring resets the process
+# high-water mark at every stage, so concurrent runs in one process blur
+# each other: "worker" (default) measures only in job worker processes,
+# which run one job at a time; "true" everywhere, "false" nowhere.
+TRACK_STAGE_MEMORY = os.getenv("TRACK_STAGE_MEMORY", "worker").lower()
+_track_memory = TRACK_STAGE_MEMORY in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MEGABYTE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ROWS_PER_SECOND_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+
+# -------------------------
+# PROMETHEUS REGISTRY
+# -------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    samples.append((f"{self.name}_bucket", key + (("le", f"{bound:g}"),), count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series["count"]))
+                samples.append((f"{self.name}_sum", key, series["sum"]))
+                samples.append((f"{self.name}_count", key, series["count"]))
+        return samples
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+STAGE_SECONDS = _register(Histogram(
+    "pipeline_stage_seconds", "Time spent in each pipeline stage", SECONDS_BUCKETS
+))
+STAGE_PEAK_MEMORY = _register(Histogram(
+    "pipeline_stage_peak_rss_megabytes", "Peak process RSS during each pipeline stage", MEGABYTE_BUCKETS
+))
+RUN_SECONDS = _register(Histogram(
+    "pipeline_run_seconds", "Total time of a pipeline request", SECONDS_BUCKETS
+))
+ROWS_PER_SECOND = _register(Histogram(
+    "pipeline_rows_per_second", "Rows processed per second by a pipeline run", ROWS_PER_SECOND_BUCKETS
+))
+BYTES_PROCESSED = _register(Counter(
+    "pipeline_bytes_processed_total", "Bytes of CSV input processed"
+))
+ROWS_PROCESSED = _register(Counter(
+    "pipeline_rows_processed_total", "CSV rows processed"
+))
+ACTIVITY_LOG_ENTRIES = _register(Counter(
+    "activity_log_entries_total", "Activity log entries by outcome (written, failed)"
+))
+
+
+def render_metrics() -> str:
+    """
+    All metrics of this process in the Prometheus text format.
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# STAGE TIMING
+# -------------------------
+def init_job_worker(queue):
+    """
+    Process pool initializer: progress reporting to queue, and stage
+    memory unless TRACK_STAGE_MEMORY is off.
+    """
+    global _track_memory
+    init_worker(queue)
+    if TRACK_STAGE_MEMORY == "worker":
+        _track_memory = True
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class StageTimer:
+    """
+    Seconds (and peak RSS) per pipeline stage for one run. A stage that
+    runs several times (once per chunk in streaming mode) is summed.
+    """
+
+    def __init__(self, track_memory: bool = None):
+        self.track_memory = _track_memory if track_memory is None else track_memory
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._active = False
+
+    def add(self, name: str, seconds: float, peak_rss_mb: float = None):
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        stage["seconds"] += seconds
+        stage["calls"] += 1
+        if peak_rss_mb is not None:
+            stage["peak_rss_mb"] = max(stage.get("peak_rss_mb", 0.0), peak_rss_mb)
+
+    def merge(self, stages: dict):
+        """
+        Add stages recorded elsewhere (e.g. by a job worker process).
+        """
+        for name, stage in stages.items():
+            mine = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            mine["seconds"] += stage["seconds"]
+            mine["calls"] += stage["calls"]
+            if "peak_rss_mb" in stage:
+                mine["peak_rss_mb"] = max(mine.get("peak_rss_mb", 0.0), stage["peak_rss_mb"])
+
+    def as_dict(self) -> dict:
+        return {
+            name: dict(stage, seconds=round(stage["seconds"], 6))
+            for name, stage in self.stages.items()
+        }
+
+
+_current = ContextVar("pipeline_stage_timer", default=None)
+
+
+@contextmanager
+def collect_stages(timer: StageTimer = None):
+    """
+    Make stage() record into timer (a new one by default) in this context.
+    """
+    timer = timer or StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage; a no-op outside collect_stages(). Nested
+    stages are folded into the outer one. Also reported as job progress.
+    """
+    timer = _current.get()
+    if timer is None or timer._active:
+        yield
+        return
+
+    report_stage(name)
+
+    timer._active = True
+    track_memory = timer.track_memory and _reset_peak_rss()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer._active = False
+        timer.add(name, time.perf_counter() - started, _peak_rss_mb() if track_memory else None)
+
+
+def timed_iter(name: str, iterable):
+    """
+    Yield from iterable, timing each step as stage `name` (e.g. the
+    read_csv work done by a chunk reader). Each pass reports the rows
+    read so far as job progress.
+    """
+    iterator = iter(iterable)
+    report_pass()
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        report_rows(len(item))
+        yield item
+
+
+def call_with_stages(func, *args, **kwargs):
+    """
+    Run func collecting its stages; returns (result, stages). Picklable,
+    so process pools can ship the timings back with the result.
+    """
+    with collect_stages() as timer:
+        result = func(*args, **kwargs)
+    return result, timer.as_dict()
+
+
+def record_run(timer: StageTimer, endpoint: str, size_bytes: int = None, rows: int = None) -> dict:
+    """
+    Export a finished run to the metrics and return its timings block.
+    """
+    total = time.perf_counter() - timer.started
+    stages = timer.as_dict()
+
+    for name, values in stages.items():
+        STAGE_SECONDS.observe(values["seconds"], stage=name, endpoint=endpoint)
+        if "peak_rss_mb" in values:
+            STAGE_PEAK_MEMORY.observe(values["peak_rss_mb"], stage=name, endpoint=endpoint)
+    RUN_SECONDS.observe(total, endpoint=endpoint)
+
+    timings = {"total_seconds": round(total, 6), "stages": stages}
+    if size_bytes is not None:
+        BYTES_PROCESSED.inc(size_bytes, endpoint=endpoint)
+        timings["bytes"] = size_bytes
+    if rows is not None:
+        ROWS_PROCESSED.inc(rows, endpoint=endpoint)
+        timings["rows"] = rows
+        if total > 0:
+            ROWS_PER_SECOND.observe(rows / total, endpoint=endpoint)
+            timings["rows_per_second"] = round(rows / total, 1)
+    return timings
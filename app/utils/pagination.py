@@ -0,0 +1,49 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    (created_at, id) of the last row of the previous page. Raises
+    ValueError for a malformed cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_query(query, model, cursor: str = None, limit: int = 50):
+    """
+    The statement for one page of query, newest first by (created_at, id),
+    after cursor: limit + 1 rows, the extra one telling whether another
+    page follows. The seek is a row-value comparison that the composite
+    (..., created_at, id) indexes serve directly, so a page costs the
+    same however deep into the table it is (unlike OFFSET).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def keyset_page(query, model, cursor: str = None, limit: int = 50):
+    """
+    One page of query after cursor (see keyset_query). Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+    """
+    rows = keyset_query(query, model, cursor, limit).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
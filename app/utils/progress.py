@@ -0,0 +1,222 @@
+import os
+import time
+import threading
+from contextvars import ContextVar
+
+# Bytes read from the start of a file to estimate its row count
+PROGRESS_SAMPLE_BYTES = 1024 * 1024
+
+
+# -------------------------
+# WORKER SIDE (REPORTING)
+# -------------------------
+# Set in job worker processes by init_worker (the executor initializer)
+_queue = None
+
+_current = ContextVar("pipeline_progress", default=None)
+
+
+def init_worker(queue):
+    global _queue
+    _queue = queue
+
+
+def estimate_rows(file_path: str) -> int:
+    """
+    Data rows of a CSV, estimated from the line length of its first
+    PROGRESS_SAMPLE_BYTES (exact for smaller files, barring quoted
+    newlines).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        sample = f.read(PROGRESS_SAMPLE_BYTES)
+
+    lines = sample.count(b"\n")
+    if len(sample) == size:
+        if sample and not sample.endswith(b"\n"):
+            lines += 1
+        return max(lines - 1, 0)
+    if not lines:
+        return 0
+    return max(round(size * lines / len(sample)) - 1, 0)
+
+
+class ProgressReporter:
+    """
+    Sends (job_id, event) tuples for one run to the API process. Stage
+    events are sent when the stage changes (streaming mode re-enters the
+    same stages for every chunk); rows events after every chunk read.
+    """
+
+    def __init__(self, job_id: int, queue):
+        self.job_id = job_id
+        self.queue = queue
+        self._stage = None
+        self._pass = 0
+        self._rows = 0
+
+    def emit(self, event: str, **fields):
+        try:
+            self.queue.put_nowait((self.job_id, dict(fields, event=event, time=time.time())))
+        except Exception:
+            # Progress is best effort; never fail the run over it
+            pass
+
+    def stage(self, name: str):
+        if name != self._stage:
+            self._stage = name
+            self.emit("stage", stage=name)
+
+    def start_pass(self):
+        self._pass += 1
+        self._rows = 0
+        self.emit("rows", rows=0, **{"pass": self._pass})
+
+    def rows(self, count: int):
+        self._rows += count
+        self.emit("rows", rows=self._rows, **{"pass": self._pass})
+
+
+def report_stage(name: str):
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.stage(name)
+
+
+def report_pass():
+    """
+    A new read over the input starts (streaming mode reads it twice).
+    """
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.start_pass()
+
+
+def report_rows(count: int):
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.rows(count)
+
+
+def call_with_progress(job_id: int, func, file_path: str, **kwargs):
+    """
+    call_with_stages(func, file_path, **kwargs), reporting progress as
+    job job_id when this process has a progress queue.
+    """
+    from app.utils.metrics import call_with_stages
+
+    if _queue is None:
+        return call_with_stages(func, file_path, **kwargs)
+
+    reporter = ProgressReporter(job_id, _queue)
+    reporter.emit(
+        "start",
+        total_bytes=os.path.getsize(file_path),
+        estimated_rows=estimate_rows(file_path)
+    )
+
+    token = _current.set(reporter)
+    try:
+        return call_with_stages(func, file_path, **kwargs)
+    finally:
+        _current.reset(token)
+
+
+# -------------------------
+# API SIDE (COLLECTING)
+# -------------------------
+_progress = {}
+_progress_lock = threading.Lock()
+_listener = None
+
+
+def track_job(job_id: int):
+    """
+    Start collecting progress for a job; events of untracked jobs are
+    dropped.
+    """
+    with _progress_lock:
+        _progress[job_id] = {"version": 0, "stage": "queued", "pass": 0, "rows": 0}
+
+
+def forget_job(job_id: int):
+    with _progress_lock:
+        _progress.pop(job_id, None)
+
+
+def _apply(state: dict, event: dict):
+    now = event["time"]
+    if event["event"] == "start":
+        state.update(
+            _started=now,
+            total_bytes=event["total_bytes"],
+            estimated_rows=event["estimated_rows"]
+        )
+    elif event["event"] == "stage":
+        state["stage"] = event["stage"]
+    elif event["event"] == "rows":
+        if event["pass"] != state["pass"]:
+            state["pass"] = event["pass"]
+            state["_pass_started"] = now
+        state["rows"] = event["rows"]
+
+        # Throughput and ETA of the current pass over the input
+        elapsed = now - state["_pass_started"]
+        if state["rows"] and elapsed > 0:
+            rate = state["rows"] / elapsed
+            state["rows_per_second"] = round(rate, 1)
+            estimated = max(state.get("estimated_rows") or 0, state["rows"])
+            state["fraction"] = round(state["rows"] / estimated, 4) if estimated else None
+            state["eta_seconds"] = round((estimated - state["rows"]) / rate, 1)
+
+    if "_started" in state:
+        state["elapsed_seconds"] = round(now - state["_started"], 3)
+    state["version"] += 1
+
+
+def _listen(queue):
+    while True:
+        try:
+            item = queue.get()
+        except (EOFError, OSError):
+            return
+        if item is None:
+            return
+
+        job_id, event = item
+        with _progress_lock:
+            state = _progress.get(job_id)
+            if state is not None:
+                _apply(state, event)
+
+
+def start_listener(queue):
+    """
+    Fold events from the worker processes into per-job progress, on a
+    background thread, until stop_listener().
+    """
+    global _listener
+    if _listener is None:
+        _listener = threading.Thread(target=_listen, args=(queue,), name="progress-listener", daemon=True)
+        _listener.start()
+
+
+def stop_listener(queue):
+    global _listener
+    if _listener is not None:
+        queue.put(None)
+        _listener.join(timeout=5)
+        _listener = None
+
+
+def job_progress(job_id: int):
+    """
+    Copy of a running job's progress, or None if it is not tracked
+    (finished, or running in another API process). version changes with
+    every update.
+    """
+    with _progress_lock:
+        state = _progress.get(job_id)
+        if state is None:
+            return None
+        return {name: value for name, value in state.items() if not name.startswith("_")}
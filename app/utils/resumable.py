@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+
+from app.utils.storage import COPY_BUFFER_SIZE, UPLOAD_DIR, store_file
+
+RESUMABLE_DIR = os.path.join(UPLOAD_DIR, "resumable")
+
+# Chunk size offered to clients, and the range they may pick from
+UPLOAD_CHUNK_MB = int(os.getenv("UPLOAD_CHUNK_MB", 8))
+UPLOAD_MIN_CHUNK_BYTES = 256 * 1024
+UPLOAD_MAX_CHUNK_MB = int(os.getenv("UPLOAD_MAX_CHUNK_MB", 64))
+# Largest file a resumable upload may announce (it is preallocated)
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", 10240))
+# Unfinished uploads untouched this long are deleted
+UPLOAD_EXPIRE_HOURS = int(os.getenv("UPLOAD_EXPIRE_HOURS", 24))
+
+# Running SHA-256 of each upload's received prefix: upload id ->
+# {"hasher", "offset", "lock"}. Per process; another process handling
+# later chunks starts its own from the beginning of the file.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+# -------------------------
+# SESSION FILES
+# -------------------------
+# uploads/resumable/<id>/info.json  owner, name, length, chunk size
+# uploads/resumable/<id>/data.part  the file, preallocated to its length
+# uploads/resumable/<id>/received   one byte per chunk, 1 once written
+def _upload_dir(upload_id: str) -> str:
+    return os.path.join(RESUMABLE_DIR, upload_id)
+
+
+def _data_path(info: dict) -> str:
+    return os.path.join(_upload_dir(info["upload_id"]), "data.part")
+
+
+def _received_path(info: dict) -> str:
+    return os.path.join(_upload_dir(info["upload_id"]), "received")
+
+
+def chunk_count(info: dict) -> int:
+    return -(-info["length"] // info["chunk_size"])
+
+
+def expire_uploads():
+    """
+    Delete uploads nobody has written to for UPLOAD_EXPIRE_HOURS.
+    """
+    if not os.path.isdir(RESUMABLE_DIR):
+        return
+
+    cutoff = time.time() - UPLOAD_EXPIRE_HOURS * 3600
+    for entry in os.scandir(RESUMABLE_DIR):
+        try:
+            touched = os.path.getmtime(os.path.join(entry.path, "info.json"))
+        except OSError:
+            touched = entry.stat().st_mtime
+        if touched < cutoff:
+            with _hashers_lock:
+                _hashers.pop(entry.name, None)
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def create_upload(user_email: str, filename: str, length: int, chunk_size: int = None) -> dict:
+    """
+    Start a resumable upload of length (> 0) bytes, sent in chunks of
+    chunk_size (the last one may be shorter). Raises UploadTooLarge
+    above UPLOAD_MAX_MB, ValueError for a chunk size out of range.
+    """
+    if length > UPLOAD_MAX_MB * 1024 * 1024:
+        raise UploadTooLarge(f"Uploads are limited to {UPLOAD_MAX_MB} MB")
+
+    chunk_size = chunk_size or UPLOAD_CHUNK_MB * 1024 * 1024
+    if not UPLOAD_MIN_CHUNK_BYTES <= chunk_size <= UPLOAD_MAX_CHUNK_MB * 1024 * 1024:
+        raise ValueError(
+            f"chunk_size must be between {UPLOAD_MIN_CHUNK_BYTES} bytes and {UPLOAD_MAX_CHUNK_MB} MB"
+        )
+
+    expire_uploads()
+
+    info = {
+        "upload_id": uuid.uuid4().hex,
+        "user_email": user_email,
+        "filename": filename,
+        "length": length,
+        "chunk_size": chunk_size,
+        "created_at": time.time()
+    }
+    os.makedirs(_upload_dir(info["upload_id"]))
+
+    # Sparse until written; chunks land at their offsets in any order
+    with open(_data_path(info), "wb") as f:
+        f.truncate(length)
+    with open(_received_path(info), "wb") as f:
+        f.write(bytes(chunk_count(info)))
+
+    with open(os.path.join(_upload_dir(info["upload_id"]), "info.json"), "w") as f:
+        json.dump(info, f)
+    return info
+
+
+def load_upload(upload_id: str):
+    """
+    The upload's info, or None if it does not exist (or expired).
+    """
+    if not upload_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(_upload_dir(upload_id), "info.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def delete_upload(info: dict):
+    with _hashers_lock:
+        _hashers.pop(info["upload_id"], None)
+    shutil.rmtree(_upload_dir(info["upload_id"]), ignore_errors=True)
+
+
+# -------------------------
+# CHUNKS
+# -------------------------
+def chunk_span(info: dict, offset: int):
+    """
+    (chunk index, chunk length) of the chunk starting at offset. Raises
+    ValueError when offset is not a chunk boundary of the upload.
+    """
+    if offset < 0 or offset % info["chunk_size"] or offset >= info["length"]:
+        raise ValueError(f"Upload-Offset must be a multiple of {info['chunk_size']} below {info['length']}")
+    return offset // info["chunk_size"], min(info["chunk_size"], info["length"] - offset)
+
+
+def write_at(info: dict, offset: int, data: bytes):
+    fd = os.open(_data_path(info), os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+
+
+def received_chunks(info: dict) -> bytes:
+    with open(_received_path(info), "rb") as f:
+        return f.read()
+
+
+def contiguous_offset(info: dict, received: bytes = None) -> int:
+    """
+    Bytes received without a gap from the start (tus Upload-Offset).
+    """
+    received = received_chunks(info) if received is None else received
+    first_missing = received.find(b"\0")
+    if first_missing < 0:
+        return info["length"]
+    return first_missing * info["chunk_size"]
+
+
+def _advance_hash(info: dict, blocking: bool = False):
+    """
+    Hash the chunks that now continue the hashed prefix, so finishing
+    the upload does not re-read the whole file. Returns the hash state.
+    """
+    with _hashers_lock:
+        state = _hashers.setdefault(
+            info["upload_id"],
+            {"hasher": hashlib.sha256(), "offset": 0, "lock": threading.Lock()}
+        )
+
+    # Requests do not queue up here: the one hashing re-checks for
+    # chunks that arrived meanwhile
+    if not state["lock"].acquire(blocking=blocking):
+        return state
+    try:
+        with open(_data_path(info), "rb") as f:
+            while True:
+                end = contiguous_offset(info)
+                if end <= state["offset"]:
+                    break
+                f.seek(state["offset"])
+                while state["offset"] < end:
+                    block = f.read(min(COPY_BUFFER_SIZE, end - state["offset"]))
+                    state["hasher"].update(block)
+                    state["offset"] += len(block)
+    finally:
+        state["lock"].release()
+    return state
+
+
+def mark_received(info: dict, index: int) -> int:
+    """
+    Record a fully written chunk; returns the new contiguous offset.
+    """
+    fd = os.open(_received_path(info), os.O_WRONLY)
+    try:
+        os.pwrite(fd, b"\1", index)
+    finally:
+        os.close(fd)
+    os.utime(os.path.join(_upload_dir(info["upload_id"]), "info.json"))
+
+    _advance_hash(info)
+    return contiguous_offset(info)
+
+
+def upload_status(info: dict) -> dict:
+    received = received_chunks(info)
+    return {
+        "upload_id": info["upload_id"],
+        "filename": info["filename"],
+        "length": info["length"],
+        "chunk_size": info["chunk_size"],
+        "chunks": len(received),
+        "offset": contiguous_offset(info, received),
+        "missing_chunks": [index for index, done in enumerate(received) if not done]
+    }
+
+
+# -------------------------
+# FINISH
+# -------------------------
+def finish_upload(info: dict, expected_sha256: str = None):
+    """
+    Move a complete upload into content-addressed storage and delete its
+    session. Returns (sha256, stored_path, size_bytes) like store_upload.
+    Raises ValueError while chunks are missing or when the content does
+    not match expected_sha256 (the upload is kept for retries).
+    """
+    received = received_chunks(info)
+    missing = received.count(b"\0")
+    if missing:
+        raise ValueError(f"Upload is incomplete: {missing} of {len(received)} chunks missing")
+
+    # Usually only the last chunks are left to hash; a process that did
+    # not receive the earlier ones hashes the whole file here
+    state = _advance_hash(info, blocking=True)
+    with state["lock"]:
+        digest = state["hasher"].hexdigest()
+
+    if expected_sha256 and expected_sha256.lower() != digest:
+        raise ValueError(f"SHA-256 mismatch: expected {expected_sha256}, received content hashes to {digest}")
+
+    stored_path = store_file(_data_path(info), digest)
+    delete_upload(info)
+    return digest, stored_path, info["length"]
@@ -1,28 +1,139 @@
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
-
-# bcrypt supports max 72 bytes
-MAX_PASSWORD_LENGTH = 72
-
-
-def _normalize_password(password: str) -> str:
-    """
-    Ensures password length is safe for bcrypt.
-    """
-    if password:
-        return password[:MAX_PASSWORD_LENGTH]
-    return password
-
-
-def hash_password(password: str) -> str:
-    safe_password = _normalize_password(password)
-    return pwd_context.hash(safe_password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    safe_password = _normalize_password(plain_password)
-    return pwd_context.verify(safe_password, hashed_password)
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto"
+)
+
+# bcrypt supports max 72 bytes
+MAX_PASSWORD_LENGTH = 72
+
+# Threads for bcrypt (it releases the GIL); 0 uses the shared default thread pool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Hash/verify calls that may be queued or running before callers are turned away
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_LIMIT)
+
+_stats = {"calls": 0, "rejected": 0, "in_flight": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0, "run_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _normalize_password(password: str) -> str:
+    """
+    Ensures password length is safe for bcrypt.
+    """
+    if password:
+        return password[:MAX_PASSWORD_LENGTH]
+    return password
+
+
+def hash_password(password: str) -> str:
+    safe_password = _normalize_password(password)
+    return pwd_context.hash(safe_password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    safe_password = _normalize_password(plain_password)
+    return pwd_context.verify(safe_password, hashed_password)
+
+
+# -------------------------
+# OFFLOADED HASHING
+# -------------------------
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                thread_name_prefix="bcrypt"
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def hasher_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+
+    calls = stats["calls"]
+    stats["avg_queue_seconds"] = round(stats["queue_seconds"] / calls, 6) if calls else 0.0
+    for name in ("queue_seconds", "max_queue_seconds", "run_seconds"):
+        stats[name] = round(stats[name], 6)
+    stats["workers"] = PASSWORD_HASH_WORKERS
+    stats["queue_limit"] = PASSWORD_HASH_QUEUE_LIMIT
+    return stats
+
+
+def _timed(func, submitted: float, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        finished = time.perf_counter()
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["queue_seconds"] += started - submitted
+            _stats["max_queue_seconds"] = max(_stats["max_queue_seconds"], started - submitted)
+            _stats["run_seconds"] += finished - started
+
+
+def _release_slot(future=None):
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+    _slots.release()
+
+
+async def _offload(func, *args):
+    """
+    Run func on the bcrypt pool without blocking the event loop.
+    Raises PasswordHasherBusy when PASSWORD_HASH_QUEUE_LIMIT calls are
+    already queued or running.
+    """
+    if PASSWORD_HASH_WORKERS <= 0:
+        # Unbounded: share the default thread pool with everything else
+        return await asyncio.to_thread(_timed, func, time.perf_counter(), *args)
+
+    if not _slots.acquire(blocking=False):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise PasswordHasherBusy()
+
+    with _stats_lock:
+        _stats["in_flight"] += 1
+    try:
+        future = get_executor().submit(_timed, func, time.perf_counter(), *args)
+    except Exception:
+        _release_slot()
+        raise
+
+    # Free the slot when bcrypt finishes, even if the request was cancelled
+    future.add_done_callback(_release_slot)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _offload(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _offload(verify_password, plain_password, hashed_password)
@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import logging
+import builtins
+import threading
+import importlib
+from collections import defaultdict
+from contextlib import contextmanager
+
+from app import IMPORT_STARTED
+
+logger = logging.getLogger(__name__)
+
+# Modules imported in the background once the app is serving requests
+WARMUP_MODULES = [
+    name for name in os.getenv("WARMUP_MODULES", "app.services.data_cleaning").split(",")
+    if name.strip()
+]
+
+# Modules (app modules, other packages) listed in the import breakdown
+IMPORT_REPORT_TOP = int(os.getenv("IMPORT_REPORT_TOP", 15))
+
+_report = {"import_seconds": None, "imports": [], "phases": {}, "ready_seconds": None, "warmup": {}}
+_report_lock = threading.Lock()
+
+
+# -------------------------
+# IMPORT BREAKDOWN
+# -------------------------
+# Self time of every first import, as python -X importtime reports it,
+# summed per package (app modules individually)
+_import_seconds = defaultdict(float)
+_import_stack = []
+_import_thread = None
+_original_import = builtins.__import__
+
+
+def _module_key(name: str) -> str:
+    return name if name == "app" or name.startswith("app.") else name.split(".")[0]
+
+
+def _timed(module: str, load):
+    started = time.perf_counter()
+    _import_stack.append(0.0)
+    try:
+        load()
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = _import_stack.pop()
+        if _import_stack:
+            _import_stack[-1] += elapsed
+        _import_seconds[_module_key(module)] += elapsed - nested
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or threading.get_ident() != _import_thread:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    if name not in sys.modules:
+        _timed(name, lambda: _original_import(name, globals, locals, (), 0))
+    # Submodules named in a from-import, each under its own name
+    module = sys.modules.get(name)
+    for item in fromlist or ():
+        submodule = f"{name}.{item}"
+        if module is None or item == "*" or hasattr(module, item) or submodule in sys.modules:
+            continue
+        try:
+            _timed(submodule, lambda: _original_import(submodule, globals, locals, (), 0))
+        except ModuleNotFoundError:
+            # Raised again below, if it is an error at all
+            pass
+    return _original_import(name, globals, locals, fromlist, level)
+
+
+def time_imports():
+    """
+    Time the imports of this thread until record_imports(). Called by
+    the app package, before anything else is imported.
+    """
+    global _import_thread
+    if _import_thread is None:
+        _import_thread = threading.get_ident()
+        builtins.__import__ = _timed_import
+
+
+def _stop_timing_imports() -> list:
+    global _import_thread
+    if builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+    # Imports still in progress (app.main's own) are no longer timed
+    _import_thread = False
+    ranked = sorted(_import_seconds.items(), key=lambda item: item[1], reverse=True)[:IMPORT_REPORT_TOP]
+    return [{"module": name, "seconds": round(seconds, 4)} for name, seconds in ranked]
+
+
+def record_imports():
+    """
+    Call once the application modules are imported.
+    """
+    imports = _stop_timing_imports()
+    with _report_lock:
+        _report["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+        _report["imports"] = imports
+
+
+@contextmanager
+def timed_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _report_lock:
+            _report["phases"][name] = round(time.perf_counter() - started, 4)
+
+
+def record_ready():
+    with _report_lock:
+        _report["ready_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    logger.info("Startup: %s", startup_report())
+
+
+def _warm_up(modules: list):
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name.strip())
+        except Exception:
+            logger.exception("Warm-up import of %s failed", name)
+            continue
+        with _report_lock:
+            _report["warmup"][name.strip()] = round(time.perf_counter() - started, 4)
+
+
+def start_warmup(modules: list = None) -> threading.Thread:
+    """
+    Import heavy modules (pandas and the pipeline) in a background
+    thread, so the first cleaning request does not pay for them but
+    the worker can accept requests before they are loaded.
+    """
+    thread = threading.Thread(
+        target=_warm_up,
+        args=(WARMUP_MODULES if modules is None else modules,),
+        name="startup-warmup",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def startup_report() -> dict:
+    """
+    Seconds spent importing the app (and the slowest modules to import,
+    see IMPORT_REPORT_TOP), in each startup phase, from the first import
+    until ready, and per background warm-up import.
+    """
+    with _report_lock:
+        return {
+            "import_seconds": _report["import_seconds"],
+            "imports": list(_report["imports"]),
+            "phases": dict(_report["phases"]),
+            "ready_seconds": _report["ready_seconds"],
+            "warmup": dict(_report["warmup"])
+        }
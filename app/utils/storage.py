@@ -0,0 +1,147 @@
+import io
+import os
+import hashlib
+import tempfile
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def content_path(sha256: str, suffix: str = ".csv") -> str:
+    """
+    Storage path for a blob: uploads/objects/<2 hex chars>/<sha256><suffix>
+    """
+    return os.path.join(UPLOAD_DIR, "objects", sha256[:2], sha256 + suffix)
+
+
+def file_sha256(path: str, length: int = None) -> str:
+    """
+    SHA-256 of a file (or of its first length bytes), read in
+    COPY_BUFFER_SIZE blocks.
+    """
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(COPY_BUFFER_SIZE if remaining is None else min(COPY_BUFFER_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher.hexdigest()
+
+
+class HashingWriter(io.RawIOBase):
+    """
+    Binary file open for writing that hashes (SHA-256) everything written
+    through it, so an output's hash is known once it is written, without
+    reading it back. hasher continues an existing hash, e.g. of the
+    current contents when mode is 'ab' (see copy_hashed).
+    """
+
+    def __init__(self, path: str, mode: str = "wb", hasher=None):
+        super().__init__()
+        self._file = open(path, mode)
+        self.hasher = hasher or hashlib.sha256()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._file.write(data)
+        self.hasher.update(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+def copy_hashed(source: str, destination: str):
+    """
+    Copy a file, hashing it on the way. Returns the hasher, to continue
+    with a HashingWriter appending to destination.
+    """
+    hasher = hashlib.sha256()
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while True:
+            chunk = src.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            dst.write(chunk)
+    return hasher
+
+
+def dataset_dir(user_id: int, dataset: str) -> str:
+    """
+    Directory of one user's logical dataset (incremental cleaning state
+    and cleaned versions): uploads/datasets/<user id>/<hash of the name>
+    """
+    name = hashlib.sha256(dataset.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(UPLOAD_DIR, "datasets", str(user_id), name)
+
+
+def store_upload(fileobj, suffix: str = ".csv"):
+    """
+    Stream a file object to content-addressed storage, hashing while copying.
+    Returns (sha256, stored_path, size_bytes). stored_path is None for an
+    empty upload. Identical content is stored once; concurrent writers never
+    see each other's partial files because the blob is renamed into place.
+    """
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    digest = hasher.hexdigest()
+
+    if size == 0:
+        os.remove(tmp_path)
+        return digest, None, 0
+
+    return digest, store_file(tmp_path, digest, suffix), size
+
+
+def store_file(path: str, sha256: str, suffix: str = ".csv") -> str:
+    """
+    Move a file whose hash is already known into content-addressed
+    storage (same filesystem) and return its stored path.
+    """
+    stored_path = content_path(sha256, suffix)
+
+    if os.path.exists(stored_path):
+        # Same bytes already stored
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        os.replace(path, stored_path)
+
+    return stored_path
@@ -0,0 +1,195 @@
+"""
+Deterministic synthetic CSV generator for benchmarks.
+
+    python benchmarks/datagen.py data.csv --rows 1000000 --columns 20 \
+        --dtypes int=2,float=2,str=4,date=1,bool=1 --missing 0.05 \
+        --duplicates 0.02 --string-width 12 --seed 0
+
+Every value is derived from a hash of (seed, column, source row), so the
+same arguments always produce the same bytes, and a duplicate row (a row
+whose source is an earlier row) is an exact copy even across chunks.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.sketches import mix64  # noqa: E402
+
+DTYPES = ("int", "float", "str", "date", "bool")
+DEFAULT_DTYPES = {"int": 2, "float": 2, "str": 4, "date": 1, "bool": 1}
+
+_ALPHABET = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+_EPOCH = np.datetime64("2015-01-01")
+
+
+def parse_dtypes(spec: str) -> dict:
+    """
+    'int=2,float=1,str=3' -> relative weights per dtype.
+    """
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DTYPES:
+            raise ValueError(f"Unknown dtype '{name}', expected one of {', '.join(DTYPES)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def column_plan(columns: int, dtypes: dict) -> list:
+    """
+    (name, dtype) per column, spreading dtypes by their weights and
+    interleaving them (int_0, float_1, str_2, ...).
+    """
+    total = sum(dtypes.values())
+    counts = {name: int(columns * weight // total) for name, weight in dtypes.items()}
+    # Hand out the rounding remainder by weight
+    for name in sorted(dtypes, key=dtypes.get, reverse=True):
+        if sum(counts.values()) >= columns:
+            break
+        counts[name] += 1
+
+    order = []
+    while len(order) < columns:
+        for name in dtypes:
+            if counts[name]:
+                counts[name] -= 1
+                order.append(name)
+    return [(f"{dtype}_{i}", dtype) for i, dtype in enumerate(order)]
+
+
+def _vocabulary(size: int, width: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    letters = rng.choice(_ALPHABET, size=(size, width))
+    return np.array(["".join(row) for row in letters], dtype=object)
+
+
+def _uniform(hashes: np.ndarray) -> np.ndarray:
+    return (hashes >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _column_values(dtype: str, hashes: np.ndarray, vocabulary: np.ndarray):
+    if dtype == "int":
+        return (hashes % np.uint64(1_000_000)).astype(np.int64)
+    if dtype == "float":
+        return np.round(_uniform(hashes) * 1000, 3)
+    if dtype == "str":
+        return vocabulary[(hashes % np.uint64(len(vocabulary))).astype(np.intp)]
+    if dtype == "date":
+        days = (hashes % np.uint64(3650)).astype(np.int64)
+        return np.datetime_as_string(_EPOCH + days.astype("timedelta64[D]"), unit="D").astype(object)
+    return (hashes & np.uint64(1)).astype(bool)
+
+
+def _duplicate_draws(rows: np.ndarray, duplicate_ratio: float, seed: int):
+    draw = mix64(rows ^ np.uint64(seed * 0x9E3779B97F4A7C15 % 2 ** 64))
+    duplicate = (_uniform(draw) < duplicate_ratio) & (rows > 0)
+    earlier = mix64(draw) % np.maximum(rows, np.uint64(1))
+    return duplicate, earlier
+
+
+def source_rows(start: int, stop: int, duplicate_ratio: float, seed: int) -> np.ndarray:
+    """
+    Row each output row copies its values from: itself, or (with
+    probability duplicate_ratio) the source of an earlier row.
+    """
+    sources = np.arange(start, stop, dtype=np.uint64)
+    pending = np.ones(len(sources), dtype=bool)
+
+    # Follow duplicate chains back to an original row; ids only decrease
+    while pending.any():
+        duplicate, earlier = _duplicate_draws(sources[pending], duplicate_ratio, seed)
+        index = np.flatnonzero(pending)
+        sources[index[duplicate]] = earlier[duplicate]
+        pending[index[~duplicate]] = False
+    return sources
+
+
+def generate_frame(
+    start: int,
+    stop: int,
+    plan: list,
+    missing_ratio: float = 0.05,
+    duplicate_ratio: float = 0.02,
+    vocabulary: np.ndarray = None,
+    seed: int = 0
+) -> pd.DataFrame:
+    sources = source_rows(start, stop, duplicate_ratio, seed)
+    data = {}
+    for position, (name, dtype) in enumerate(plan):
+        salt = np.uint64((seed + 1) * 1_000_003 + position * 7919)
+        hashes = mix64(sources * np.uint64(0x100000001B3) + salt)
+        values = pd.Series(_column_values(dtype, hashes, vocabulary))
+        missing = _uniform(mix64(hashes)) < missing_ratio
+        data[name] = values.mask(missing) if missing.any() else values
+    return pd.DataFrame(data)
+
+
+def generate_csv(
+    path: str,
+    rows: int,
+    columns: int = 10,
+    dtypes: dict = None,
+    missing_ratio: float = 0.05,
+    duplicate_ratio: float = 0.02,
+    string_width: int = 12,
+    string_cardinality: int = 1000,
+    seed: int = 0,
+    chunk_rows: int = 100_000
+) -> dict:
+    """
+    Write the CSV in chunks of chunk_rows (memory does not grow with
+    rows) and return its description, including the size in bytes.
+    """
+    plan = column_plan(columns, dtypes or DEFAULT_DTYPES)
+    vocabulary = _vocabulary(string_cardinality, string_width, seed)
+
+    partial_path = path + ".part"
+    with open(partial_path, "w", newline="") as out:
+        for start in range(0, max(rows, 1), chunk_rows):
+            stop = min(start + chunk_rows, rows)
+            frame = generate_frame(start, stop, plan, missing_ratio, duplicate_ratio, vocabulary, seed)
+            frame.to_csv(out, header=(start == 0), index=False)
+    os.replace(partial_path, path)
+
+    return {
+        "path": path,
+        "rows": rows,
+        "columns": columns,
+        "dtypes": dtypes or DEFAULT_DTYPES,
+        "missing_ratio": missing_ratio,
+        "duplicate_ratio": duplicate_ratio,
+        "string_width": string_width,
+        "string_cardinality": string_cardinality,
+        "seed": seed,
+        "size_bytes": os.path.getsize(path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--dtypes", type=parse_dtypes, default=None, help="e.g. int=2,float=2,str=4,date=1,bool=1")
+    parser.add_argument("--missing", type=float, default=0.05)
+    parser.add_argument("--duplicates", type=float, default=0.02)
+    parser.add_argument("--string-width", type=int, default=12)
+    parser.add_argument("--string-cardinality", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    info = generate_csv(
+        args.path, args.rows, args.columns, args.dtypes, args.missing,
+        args.duplicates, args.string_width, args.string_cardinality, args.seed
+    )
+    print(f"Wrote {info['rows']} rows x {info['columns']} columns, {info['size_bytes'] / 1e6:.1f} MB to {info['path']}")
+
+
+if __name__ == "__main__":
+    main()
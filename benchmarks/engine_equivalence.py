@@ -0,0 +1,193 @@
+"""
+Check that the arrow engine returns what the pandas engine does, on the
+sample datasets and synthetic CSVs from datagen.py.
+
+    python benchmarks/engine_equivalence.py
+    python benchmarks/engine_equivalence.py --rows 500000 --variants default,median-mode
+
+Every (dataset, variant) is run through run_pipeline on both engines.
+The analysis and cleaning summary must match field for field (apart
+from the file path, the engine name and the memory figures), CSV
+output must be the same bytes, and Parquet output the same schema and
+values. Prints the
+time each engine took and exits with status 1 on any difference.
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.datagen import generate_csv  # noqa: E402
+
+SYNTHETIC = [
+    {"name": "mixed", "columns": 12},
+    {"name": "dirty", "columns": 10, "missing_ratio": 0.3, "duplicate_ratio": 0.2},
+    {"name": "text-heavy", "columns": 8, "dtypes": {"str": 6, "int": 1, "bool": 1}, "string_cardinality": 50},
+]
+
+# Not expected to match: where the file went, who wrote it, and how
+# much memory each engine's columns take (the files are compared below;
+# Parquet metadata, hence the hash, differs between writers)
+IGNORED_FIELDS = ("cleaned_file_path", "cleaned_sha256", "engine", "memory")
+
+
+def _numeric(columns: dict) -> list:
+    return [col for col, dtype in columns.items() if dtype.startswith(("int", "float"))]
+
+
+def _text(columns: dict) -> list:
+    return [col for col, dtype in columns.items() if not dtype.startswith(("int", "float", "bool"))]
+
+
+VARIANTS = {
+    "default": lambda columns: {},
+    "no-optimize": lambda columns: {"optimize": False},
+    "dedup-subset": lambda columns: {"dedup_subset": list(columns)[:2]},
+    "median-mode": lambda columns: {
+        "impute_strategies": {
+            **{col: "median" for col in _numeric(columns)},
+            **{col: "mode" for col in _text(columns)},
+        }
+    },
+    "constant": lambda columns: {
+        "impute_strategies": {
+            **{col: {"strategy": "constant", "value": 0} for col in _numeric(columns)},
+            **{col: {"strategy": "constant", "value": "N/A"} for col in _text(columns)},
+        }
+    },
+    "parquet": lambda columns: {"output_format": "parquet"},
+}
+
+
+# -------------------------
+# COMPARISON
+# -------------------------
+def _strip(result: dict) -> dict:
+    return {key: value for key, value in result.items() if key not in IGNORED_FIELDS}
+
+
+def _first_difference(want: bytes, got: bytes) -> str:
+    for number, (left, right) in enumerate(zip(want.splitlines(), got.splitlines()), 1):
+        if left != right:
+            return f"line {number}: pandas={left[:80]!r} arrow={right[:80]!r}"
+    return f"pandas {len(want)} bytes, arrow {len(got)} bytes"
+
+
+def _compare_files(want_path: str, got_path: str, output_format: str) -> list:
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        want, got = pq.read_table(want_path), pq.read_table(got_path)
+        if got.schema.remove_metadata() != want.schema.remove_metadata():
+            return [f"cleaned file schema: pandas={want.schema.types} arrow={got.schema.types}"]
+        return [] if got.equals(want) else ["cleaned file: values differ"]
+
+    with open(want_path, "rb") as f:
+        want = f.read()
+    with open(got_path, "rb") as f:
+        got = f.read()
+    return [] if got == want else [f"cleaned file: {_first_difference(want, got)}"]
+
+
+def compare(expected: tuple, actual: tuple, output_format: str) -> list:
+    """
+    Differences between the pandas run and the arrow run, as messages.
+    """
+    problems = []
+    for name, want, got in zip(("analysis", "cleaning_summary"), expected, actual):
+        want, got = _strip(want), _strip(got)
+        for key in sorted(set(want) | set(got)):
+            if want.get(key) != got.get(key):
+                problems.append(f"{name}.{key}: pandas={want.get(key)!r} arrow={got.get(key)!r}")
+
+    want_path, got_path = expected[1]["cleaned_file_path"], actual[1]["cleaned_file_path"]
+    if want_path and got_path:
+        problems.extend(_compare_files(want_path, got_path, output_format))
+
+    return problems
+
+
+# -------------------------
+# RUN
+# -------------------------
+def _run(engine: str, source: str, workdir: str, options: dict):
+    """
+    One run_pipeline call on a private copy of source (both engines
+    write '<name>_cleaned<suffix>' next to the input).
+    """
+    from app.services.data_cleaning import run_pipeline
+
+    engine_dir = os.path.join(workdir, engine)
+    os.makedirs(engine_dir, exist_ok=True)
+    path = os.path.join(engine_dir, os.path.basename(source))
+    shutil.copyfile(source, path)
+
+    start = time.perf_counter()
+    result = run_pipeline(path, engine=engine, **options)
+    return result, time.perf_counter() - start
+
+
+def datasets(workdir: str, rows: int) -> list:
+    paths = sorted(glob.glob(os.path.join(ROOT, "sample_datasets", "*.csv")))
+    for spec in SYNTHETIC:
+        spec = dict(spec)
+        path = os.path.join(workdir, f"{spec.pop('name')}-{rows}.csv")
+        generate_csv(path, rows, **spec)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per synthetic dataset")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma-separated option variants")
+    args = parser.parse_args()
+
+    variants = [name.strip() for name in args.variants.split(",") if name.strip()]
+    unknown = [name for name in variants if name not in VARIANTS]
+    if unknown:
+        parser.error(f"Unknown variants: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="engine-equivalence-")
+    failures = 0
+    try:
+        for source in datasets(workdir, args.rows):
+            columns = pd.read_csv(source, nrows=1000).dtypes.astype(str).to_dict()
+            for variant in variants:
+                options = VARIANTS[variant](columns)
+                rundir = os.path.join(workdir, "runs", f"{os.path.splitext(os.path.basename(source))[0]}-{variant}")
+                expected, pandas_seconds = _run("pandas", source, rundir, options)
+                actual, arrow_seconds = _run("arrow", source, rundir, options)
+
+                if actual[1]["engine"] != "arrow":
+                    problems = [f"ran on {actual[1]['engine']}, not arrow"]
+                else:
+                    problems = compare(expected, actual, options.get("output_format", "csv"))
+
+                status = "ok" if not problems else "DIFF"
+                print(
+                    f"{status:<5}{os.path.basename(source):<28}{variant:<14}"
+                    f"pandas {pandas_seconds:7.3f}s  arrow {arrow_seconds:7.3f}s  "
+                    f"x{pandas_seconds / max(arrow_seconds, 1e-9):.2f}"
+                )
+                for problem in problems:
+                    print(f"       {problem}")
+                failures += bool(problems)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print(f"{failures} run(s) differ")
+        sys.exit(1)
+    print("engines agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Page latency of the history and activity APIs on a large SQLite stand-in
+for the production tables: keyset (cursor) pages against OFFSET pages, at
+increasing depth, with and without the composite indexes.
+
+    python benchmarks/history_benchmark.py --activity-rows 2000000 --history-rows 500000
+
+One user owns --hot-share of the rows so deep pages exist; the rest are
+spread over --users users. The query plans are printed as well.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HOT_USER = "hot@example.com"
+ACTIONS = ("LOGIN", "UPLOAD", "ANALYZE", "CLEAN", "BATCH")
+STATUSES = ("COMPLETED", "COMPLETED", "COMPLETED", "FAILED")
+BATCH_ROWS = 50_000
+SQLITE_TIME = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _owners(rows: int, users: int, hot_share: float, rng: random.Random):
+    for _ in range(rows):
+        yield HOT_USER if rng.random() < hot_share else f"user{rng.randrange(users)}@example.com"
+
+
+def seed(engine, activity_rows: int, history_rows: int, users: int, hot_share: float):
+    """
+    Bulk-load both tables through the raw DB-API connection (ORM inserts
+    would dominate the run), with timestamps one second apart.
+    """
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+
+        batch = []
+        for i, owner in enumerate(_owners(activity_rows, users, hot_share, rng)):
+            action = rng.choice(ACTIONS)
+            created = (start + timedelta(seconds=i)).strftime(SQLITE_TIME)
+            batch.append((owner, action, f"{action} #{i}", created))
+            if len(batch) == BATCH_ROWS:
+                cursor.executemany(
+                    "INSERT INTO activity_logs (user_email, action, description, created_at) VALUES (?, ?, ?, ?)",
+                    batch
+                )
+                batch = []
+        if batch:
+            cursor.executemany(
+                "INSERT INTO activity_logs (user_email, action, description, created_at) VALUES (?, ?, ?, ?)",
+                batch
+            )
+
+        batch = []
+        for i, owner in enumerate(_owners(history_rows, users, hot_share, rng)):
+            created = (start + timedelta(seconds=3 * i)).strftime(SQLITE_TIME)
+            batch.append((owner, rng.choice(STATUSES), 1000, 990, 10, 5, 90, created, created))
+            if len(batch) == BATCH_ROWS or i == history_rows - 1:
+                cursor.executemany(
+                    "INSERT INTO cleaning_history (user_email, status, rows_before, rows_after, "
+                    "duplicates_removed, missing_values_fixed, data_quality_score, created_at, cleaned_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                batch = []
+
+        connection.commit()
+        cursor.execute("ANALYZE")
+    finally:
+        connection.close()
+
+
+def _median_ms(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def _plan(db, query) -> list:
+    from sqlalchemy import text
+
+    compiled = query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def measure(db, model, base_query, depths: list, limit: int, repeat: int) -> dict:
+    """
+    Milliseconds per page at each depth (in pages) for keyset and OFFSET
+    pagination of base_query.
+    """
+    from app.utils.pagination import encode_cursor, keyset_page, keyset_query
+
+    ordered = base_query.order_by(model.created_at.desc(), model.id.desc())
+    results = {"keyset_ms": {}, "offset_ms": {}, "keyset_plan": []}
+
+    for depth in depths:
+        # Cursor of the row ending page `depth` (found untimed)
+        anchor = ordered.offset(depth * limit - 1).limit(1).first() if depth else None
+        if depth and anchor is None:
+            continue
+        cursor = encode_cursor(anchor.created_at, anchor.id) if anchor else None
+
+        results["keyset_ms"][depth] = _median_ms(lambda: keyset_page(base_query, model, cursor, limit), repeat)
+        results["offset_ms"][depth] = _median_ms(
+            lambda: ordered.offset(depth * limit).limit(limit + 1).all(), repeat
+        )
+        if cursor and not results["keyset_plan"]:
+            results["keyset_plan"] = _plan(db, keyset_query(base_query, model, cursor, limit))
+    return results
+
+
+def run_all(db, depths: list, limit: int, repeat: int) -> dict:
+    from app.models import ActivityLog, CleaningHistory
+
+    activity = db.query(ActivityLog).filter(ActivityLog.user_email == HOT_USER)
+    history = db.query(CleaningHistory).filter(CleaningHistory.user_email == HOT_USER)
+    return {
+        "activity": measure(db, ActivityLog, activity, depths, limit, repeat),
+        "activity_by_action": measure(db, ActivityLog, activity.filter(ActivityLog.action == "CLEAN"), depths, limit, repeat),
+        "history": measure(db, CleaningHistory, history, depths, limit, repeat),
+        "history_failed": measure(
+            db, CleaningHistory, history.filter(CleaningHistory.status == "FAILED"), depths, limit, repeat
+        ),
+    }
+
+
+def api_check(limit: int) -> dict:
+    """
+    First and second page through the HTTP endpoints, end to end.
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.auth import create_access_token
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': HOT_USER})}"}
+    results = {}
+    with TestClient(app) as client:
+        for path in ("/history/activity", "/history/jobs"):
+            started = time.perf_counter()
+            first = client.get(path, params={"limit": limit}, headers=headers).json()
+            second = client.get(path, params={"limit": limit, "cursor": first["next_cursor"]}, headers=headers).json()
+            results[path] = {
+                "two_pages_ms": round((time.perf_counter() - started) * 1000, 3),
+                "items": len(first["items"]) + len(second["items"]),
+                "disjoint": not {i["id"] for i in first["items"]} & {i["id"] for i in second["items"]}
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activity-rows", type=int, default=1_000_000)
+    parser.add_argument("--history-rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--hot-share", type=float, default=0.2, help="Share of rows owned by one user")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--depths", default="0,10,100,1000", help="Page depths to time")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Throwaway SQLite database unless one is configured explicitly
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/history_benchmark.db"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    from sqlalchemy import text
+    from app.database import SessionLocal, create_tables, engine
+    from app.models import ActivityLog, CleaningHistory
+
+    create_tables()
+    started = time.perf_counter()
+    seed(engine, args.activity_rows, args.history_rows, args.users, args.hot_share)
+    seed_seconds = round(time.perf_counter() - started, 2)
+
+    depths = [int(depth) for depth in args.depths.split(",")]
+    db = SessionLocal()
+    try:
+        report = {
+            "activity_rows": args.activity_rows,
+            "history_rows": args.history_rows,
+            "hot_user_share": args.hot_share,
+            "page_size": args.limit,
+            "seed_seconds": seed_seconds,
+            "indexed": run_all(db, depths, args.limit, args.repeat)
+        }
+        report["api"] = api_check(args.limit)
+
+        # Same queries with only the single-column indexes left
+        composite = [
+            index.name for model in (ActivityLog, CleaningHistory)
+            for index in model.__table__.indexes if len(index.columns) > 1
+        ]
+        for name in composite:
+            db.execute(text(f"DROP INDEX {name}"))
+        db.commit()
+        report["without_composite_indexes"] = run_all(db, depths, args.limit, args.repeat)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Login throughput and latency under concurrent load, plus the latency of
+an authenticated request issued while the logins are running.
+
+    python benchmarks/login_benchmark.py --logins 200 --concurrency 32
+    python benchmarks/login_benchmark.py --compare
+
+--compare runs the benchmark twice in fresh processes: once with
+PASSWORD_HASH_WORKERS=0 (bcrypt on the shared thread pool, the old
+behaviour) and once with the dedicated bcrypt pool.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list, elapsed: float = None) -> dict:
+    summary = {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2)
+    }
+    if elapsed:
+        summary["per_second"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+async def run(logins: int, concurrency: int) -> dict:
+    email, password = "bench@example.com", "benchmark-password"
+    # The probe below is admin-only
+    os.environ.setdefault("ADMIN_EMAILS", email)
+
+    import httpx
+    from app.main import app
+    from app.auth import create_access_token
+    from app.database import SessionLocal, create_tables
+    from app.models import User
+    from app.utils import security
+
+    # ASGITransport does not run the app's lifespan
+    create_tables()
+
+    db = SessionLocal()
+    if not db.query(User).filter(User.email == email).first():
+        db.add(User(email=email, hashed_password=security.hash_password(password)))
+        db.commit()
+    db.close()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    transport = httpx.ASGITransport(app=app)
+    login_latencies, probe_latencies, failures = [], [], 0
+    remaining = logins
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login_worker():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.post("/users/login", data={"username": email, "password": password})
+                login_latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        async def probe():
+            # A cheap authenticated call, as an upload would make alongside logins
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/pipeline/cache/stats", headers=headers)
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "password_hash_workers": security.PASSWORD_HASH_WORKERS,
+        "failed_logins": failures,
+        "login": summarize(login_latencies, elapsed),
+        "authenticated_probe": summarize(probe_latencies),
+        "password_hasher": security.hasher_stats()
+    }
+
+
+def compare(args) -> list:
+    results = []
+    for workers in ("0", str(min(4, os.cpu_count() or 1))):
+        env = dict(os.environ, PASSWORD_HASH_WORKERS=workers)
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            "--logins", str(args.logins), "--concurrency", str(args.concurrency)
+        ]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(args), indent=2))
+        return
+
+    # Throwaway SQLite database unless one is configured explicitly
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/login_benchmark.db"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    print(json.dumps(asyncio.run(run(args.logins, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Throughput and peak-memory benchmarks for the cleaning services and the
+/pipeline/clean-csv endpoint, on synthetic CSVs from datagen.py.
+
+    python benchmarks/pipeline_benchmark.py --preset quick --label before
+    python benchmarks/pipeline_benchmark.py --preset quick --label after \
+        --compare benchmarks/results/before.json
+
+Each (scenario, target) runs in a fresh interpreter so peak memory is
+not inflated by earlier runs. Results are written to
+benchmarks/results/<label>.json; --compare prints the change against a
+previous result file and exits with status 1 when a target got slower
+(or used more memory) by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows: fall back to tracemalloc
+    resource = None
+
+PRESETS = {
+    "quick": [
+        {"name": "mixed-100k", "rows": 100_000, "columns": 10},
+    ],
+    "standard": [
+        {"name": "mixed-1m", "rows": 1_000_000, "columns": 10},
+        {"name": "wide-200k", "rows": 200_000, "columns": 60},
+        {"name": "text-heavy-500k", "rows": 500_000, "columns": 10,
+         "dtypes": {"str": 8, "int": 1, "float": 1}, "string_width": 32},
+        {"name": "dirty-500k", "rows": 500_000, "columns": 10,
+         "missing_ratio": 0.3, "duplicate_ratio": 0.2},
+    ],
+    "large": [
+        {"name": "mixed-5m", "rows": 5_000_000, "columns": 10},
+    ],
+}
+
+TARGETS = {
+    "analyze_csv": {},
+    "clean_csv": {},
+    "run_pipeline": {},
+    "run_pipeline_streaming": {"chunk_size": 100_000},
+    "run_pipeline_arrow": {"engine": "arrow"},
+    "sketch_csv": {},
+    "endpoint_clean_csv": {},
+}
+
+
+# -------------------------
+# WORKER (one target, fresh process)
+# -------------------------
+def _peak_rss_mb() -> float:
+    # VmHWM belongs to this process image; ru_maxrss on Linux also
+    # carries the parent's peak across fork + exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _service_call(target: str, options: dict):
+    from app.services import data_cleaning
+
+    if target == "analyze_csv":
+        return lambda path: data_cleaning.analyze_csv(path)
+    if target == "clean_csv":
+        return lambda path: data_cleaning.clean_csv(path)
+    if target in ("run_pipeline", "run_pipeline_streaming", "run_pipeline_arrow"):
+        return lambda path: data_cleaning.run_pipeline(path, **options)
+    if target == "sketch_csv":
+        return lambda path: data_cleaning.sketch_csv(path)
+    raise ValueError(f"Unknown target '{target}'")
+
+
+def _endpoint_call(workdir: str):
+    # SQLite stand-in for Postgres; uploads and cache in the work dir
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.auth import create_access_token
+    from app.services import result_cache
+    # Load the pipeline now rather than in the startup warm-up thread,
+    # so its import does not count towards peak memory
+    from app.services import data_cleaning  # noqa: F401
+
+    client = TestClient(app)
+    client.__enter__()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+
+    def call(path):
+        # Every repeat must do the work, not hit the result cache
+        shutil.rmtree(result_cache.CACHE_DIR, ignore_errors=True)
+        with open(path, "rb") as f:
+            response = client.post(
+                "/pipeline/clean-csv",
+                files={"file": (os.path.basename(path), f, "text/csv")},
+                headers=headers
+            )
+        response.raise_for_status()
+
+    return call
+
+
+def run_worker(target: str, path: str, repeat: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    # Services write '<name>_cleaned.csv' next to the input
+    local_path = os.path.join(workdir, os.path.basename(path))
+    shutil.copyfile(path, local_path)
+
+    try:
+        if target == "endpoint_clean_csv":
+            call = _endpoint_call(workdir)
+        else:
+            call = _service_call(target, TARGETS[target])
+
+        tracing = resource is None
+        if tracing:
+            import tracemalloc
+            tracemalloc.start()
+        else:
+            baseline = _peak_rss_mb()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call(local_path)
+            timings.append(time.perf_counter() - started)
+
+        if tracing:
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        else:
+            peak_mb = _peak_rss_mb() - baseline
+
+        return {"seconds": min(timings), "all_seconds": timings, "peak_memory_mb": peak_mb,
+                "memory_source": "tracemalloc" if tracing else "rss"}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# -------------------------
+# DRIVER
+# -------------------------
+def dataset(scenario: dict, seed: int) -> dict:
+    """
+    Generate (or reuse) the scenario's CSV under benchmarks/data.
+    """
+    from datagen import generate_csv
+
+    params = {key: value for key, value in scenario.items() if key != "name"}
+    path = os.path.join(DATA_DIR, f"{scenario['name']}-seed{seed}.csv")
+    meta_path = path + ".json"
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            info = json.load(f)
+        if info.get("params") == params:
+            return info
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    info = generate_csv(path, seed=seed, **params)
+    info["params"] = params
+    with open(meta_path, "w") as f:
+        json.dump(info, f)
+    return info
+
+
+def run_target(target: str, info: dict, repeat: int) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--worker", target, info["path"], "--repeat", str(repeat)]
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    result.update({
+        "rows_per_second": round(info["rows"] / result["seconds"], 1),
+        "mb_per_second": round(info["size_bytes"] / 1e6 / result["seconds"], 2),
+        "seconds": round(result["seconds"], 4),
+        "all_seconds": [round(s, 4) for s in result["all_seconds"]],
+        "peak_memory_mb": round(result["peak_memory_mb"], 1)
+    })
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    import numpy
+    import pandas
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Rows of (scenario, target, seconds change, memory change, regressed).
+    Changes are relative: +0.25 is 25% slower / larger.
+    """
+    rows = []
+    for name, targets in current["results"].items():
+        for target, result in targets.items():
+            before = baseline["results"].get(name, {}).get(target)
+            if not before:
+                continue
+            time_change = result["seconds"] / before["seconds"] - 1
+            memory_change = (result["peak_memory_mb"] + 1) / (before["peak_memory_mb"] + 1) - 1
+            rows.append((name, target, time_change, memory_change,
+                         time_change > threshold or memory_change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma-separated subset of targets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None, help="result file name (default: commit or timestamp)")
+    parser.add_argument("--compare", default=None, help="previous result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--worker", nargs=2, metavar=("TARGET", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], args.worker[1], args.repeat)))
+        return
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    report = {"environment": environment(), "preset": args.preset, "datasets": {}, "results": {}}
+    for scenario in PRESETS[args.preset]:
+        info = dataset(scenario, args.seed)
+        report["datasets"][scenario["name"]] = {k: v for k, v in info.items() if k != "path"}
+        report["results"][scenario["name"]] = {}
+
+        for target in targets:
+            result = run_target(target, info, args.repeat)
+            report["results"][scenario["name"]][target] = result
+            print(f"{scenario['name']:<18} {target:<24} {result['seconds']:>8.3f}s "
+                  f"{result['rows_per_second']:>12,.0f} rows/s {result['mb_per_second']:>8.1f} MB/s "
+                  f"{result['peak_memory_mb']:>8.1f} MB peak")
+
+    label = args.label or report["environment"]["commit"] or datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(result_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {result_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = False
+        print(f"\nAgainst {args.compare} (commit {baseline['environment'].get('commit')}):")
+        for name, target, time_change, memory_change, worse in compare(report, baseline, args.threshold):
+            regressed |= worse
+            flag = "  REGRESSION" if worse else ""
+            print(f"{name:<18} {target:<24} time {time_change:+7.1%}  memory {memory_change:+7.1%}{flag}")
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
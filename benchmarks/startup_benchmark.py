@@ -0,0 +1,92 @@
+"""
+Cold-start cost of an API worker: import time broken down by package
+(python -X importtime), initialization phases, and time from process
+start to the first answered request.
+
+    python benchmarks/startup_benchmark.py --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: import, start up, answer one request
+FIRST_REQUEST = """
+import json, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.startup import startup_report
+with TestClient(app) as client:
+    client.get("/")
+    first_request = time.perf_counter() - started
+    report = startup_report()
+print(json.dumps({"first_request_seconds": first_request, "report": report}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+    # Throwaway SQLite database unless one is configured explicitly
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/startup_benchmark.db")
+    return env
+
+
+def import_breakdown(env: dict, top: int) -> list:
+    """
+    Self import time of `import app.main` summed per package; app
+    modules are listed individually.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    totals = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = name if name.startswith("app.") or name == "app" else name.split(".")[0]
+        totals[package] += int(self_us)
+
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "seconds": round(us / 1e6, 4)} for name, us in ranked]
+
+
+def first_request(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = _env()
+    runs = [first_request(env) for _ in range(args.runs)]
+    print(json.dumps({
+        "first_request_seconds": {
+            "median": round(statistics.median(run["first_request_seconds"] for run in runs), 4),
+            "min": round(min(run["first_request_seconds"] for run in runs), 4)
+        },
+        "startup_report": runs[-1]["report"],
+        "imports": import_breakdown(env, args.top)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,224 +1,359 @@
-import streamlit as st
-import requests
-import pandas as pd
-import time
-
-API_BASE_URL = "http://127.0.0.1:8000"
-
-# -------------------------------------------------
-# PAGE CONFIG
-# -------------------------------------------------
-st.set_page_config(
-    page_title="AI Data Cleaning Assistant",
-    layout="wide"
-)
-
-# -------------------------------------------------
-# CUSTOM STYLING
-# -------------------------------------------------
-st.markdown(
-    """
-    <style>
-    body {
-        background: linear-gradient(135deg, #f7f9fc, #eef2f7);
-    }
-    .main-title {
-        font-size: 36px;
-        font-weight: 700;
-        margin-bottom: 10px;
-    }
-    .subtitle {
-        color: #555;
-        margin-bottom: 30px;
-    }
-    .section-title {
-        font-size: 22px;
-        font-weight: 600;
-        margin-top: 30px;
-        margin-bottom: 10px;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.markdown('<div class="main-title">AI Data Cleaning Assistant</div>', unsafe_allow_html=True)
-st.markdown('<div class="subtitle">Automated CSV Analysis, Cleaning and Quality Scoring</div>', unsafe_allow_html=True)
-
-# -------------------------------------------------
-# SESSION STATE
-# -------------------------------------------------
-if "token" not in st.session_state:
-    st.session_state.token = None
-
-if "page" not in st.session_state:
-    st.session_state.page = "login"
-
-if "user_email" not in st.session_state:
-    st.session_state.user_email = None
-
-# -------------------------------------------------
-# REGISTER PAGE
-# -------------------------------------------------
-if st.session_state.page == "register":
-    st.markdown('<div class="section-title">User Registration</div>', unsafe_allow_html=True)
-
-    email = st.text_input("Email address")
-    password = st.text_input("Password", type="password")
-
-    if st.button("Create Account"):
-        response = requests.post(
-            f"{API_BASE_URL}/users/register",
-            json={"email": email, "password": password}
-        )
-
-        if response.status_code in (200, 201):
-            st.success("Registration completed. Please login.")
-            st.session_state.page = "login"
-            st.rerun()
-        else:
-            st.error(response.text)
-
-    if st.button("Back to Login"):
-        st.session_state.page = "login"
-        st.rerun()
-
-# -------------------------------------------------
-# LOGIN PAGE
-# -------------------------------------------------
-elif st.session_state.token is None:
-    st.markdown('<div class="section-title">User Login</div>', unsafe_allow_html=True)
-
-    email = st.text_input("Email")
-    password = st.text_input("Password", type="password")
-
-    if st.button("Login"):
-        response = requests.post(
-            f"{API_BASE_URL}/users/login",
-            data={
-                "username": email,
-                "password": password
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-
-        if response.status_code == 200:
-            st.session_state.token = response.json()["access_token"]
-            st.session_state.user_email = email
-            st.success("Authentication successful")
-            st.rerun()
-        else:
-            st.error("Invalid email or password")
-
-    if st.button("New user? Register"):
-        st.session_state.page = "register"
-        st.rerun()
-
-# -------------------------------------------------
-# PIPELINE PAGE
-# -------------------------------------------------
-else:
-    st.caption(f"Authenticated user: {st.session_state.user_email}")
-
-    st.markdown('<div class="section-title">Upload Dataset</div>', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Select a CSV file", type=["csv"])
-
-    if uploaded_file:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-
-        if st.button("Run Data Cleaning Pipeline"):
-            progress = st.progress(0)
-            status = st.empty()
-
-            pipeline_steps = [
-                "Uploading dataset",
-                "Analyzing dataset structure",
-                "Removing duplicate records",
-                "Fixing missing values",
-                "Calculating data quality score"
-            ]
-
-            for i, step in enumerate(pipeline_steps):
-                status.info(step)
-                time.sleep(0.6)
-                progress.progress((i + 1) / len(pipeline_steps))
-
-            with st.spinner("Finalizing output..."):
-                response = requests.post(
-                    f"{API_BASE_URL}/pipeline/clean-csv",
-                    headers=headers,
-                    files={"file": uploaded_file}
-                )
-
-            if response.status_code == 200:
-                data = response.json()
-                status.success("Pipeline execution completed successfully")
-
-                summary = data["cleaning_summary"]
-
-                # -------------------------------------------------
-                # BEFORE vs AFTER METRICS
-                # -------------------------------------------------
-                st.markdown('<div class="section-title">Cleaning Overview</div>', unsafe_allow_html=True)
-
-                c1, c2, c3, c4 = st.columns(4)
-                c1.metric("Rows Before", summary["rows_before"])
-                c2.metric("Rows After", summary["rows_after"])
-                c3.metric("Duplicates Removed", summary["duplicates_removed"])
-                c4.metric("Missing Values Fixed", summary["missing_values_fixed"])
-
-                # -------------------------------------------------
-                # ANIMATED QUALITY SCORE
-                # -------------------------------------------------
-                st.markdown('<div class="section-title">Data Quality Score</div>', unsafe_allow_html=True)
-                score_placeholder = st.empty()
-                score = summary["data_quality_score"]
-
-                for i in range(0, score + 1, 5):
-                    score_placeholder.metric("Quality Score", f"{i} / 100")
-                    time.sleep(0.04)
-
-                if score >= 80:
-                    st.success("Excellent data quality achieved")
-                elif score >= 60:
-                    st.warning("Moderate data quality")
-                else:
-                    st.error("Poor data quality")
-
-                # -------------------------------------------------
-                # DATASET ANALYSIS TABLE
-                # -------------------------------------------------
-                with st.expander("View dataset analysis"):
-                    analysis = data["analysis"]
-                    analysis_df = pd.DataFrame({
-                        "Column Name": analysis["columns"].keys(),
-                        "Data Type": analysis["columns"].values(),
-                        "Missing Values": analysis["missing_values"].values()
-                    })
-                    st.dataframe(analysis_df, use_container_width=True)
-
-                # -------------------------------------------------
-                # CLEANING STEPS
-                # -------------------------------------------------
-                with st.expander("View cleaning actions performed"):
-                    if data["cleaning_steps"]:
-                        for step in data["cleaning_steps"]:
-                            st.write(step)
-                    else:
-                        st.write("No cleaning actions were required.")
-
-                # -------------------------------------------------
-                # OUTPUT FILE
-                # -------------------------------------------------
-                st.markdown('<div class="section-title">Cleaned Output File</div>', unsafe_allow_html=True)
-                st.code(data["cleaned_file_path"])
-
-            else:
-                st.error("Pipeline execution failed")
-
-    st.divider()
-
-    if st.button("Logout"):
-        st.session_state.token = None
-        st.session_state.page = "login"
+import json
+import hashlib
+import streamlit as st
+import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+API_BASE_URL = "http://127.0.0.1:8000"
+
+# Chunks of a resumable upload in flight at once, and send attempts per chunk
+UPLOAD_PARALLEL_CHUNKS = 4
+UPLOAD_CHUNK_ATTEMPTS = 3
+
+
+def send_chunk(upload_id: str, offset: int, chunk: bytes, headers: dict) -> bool:
+    for _ in range(UPLOAD_CHUNK_ATTEMPTS):
+        try:
+            response = requests.patch(
+                f"{API_BASE_URL}/pipeline/uploads/{upload_id}",
+                headers={
+                    **headers,
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream"
+                },
+                data=chunk,
+                timeout=(10, 120)
+            )
+        except requests.RequestException:
+            continue
+        if response.status_code == 204:
+            return True
+    return False
+
+
+def upload_resumable(uploaded_file, headers: dict, params: dict, progress, status):
+    """
+    Send the file as parallel chunks of a resumable upload, re-sending
+    chunks the server reports missing, then complete it. Returns the
+    response of the complete call (a queued job).
+    """
+    content = uploaded_file.getvalue()
+    created = requests.post(
+        f"{API_BASE_URL}/pipeline/uploads",
+        headers=headers,
+        json={"filename": uploaded_file.name, "length": len(content)}
+    )
+    if created.status_code != 201:
+        return created
+
+    upload = created.json()
+    upload_id, chunk_size = upload["upload_id"], upload["chunk_size"]
+    missing = upload["missing_chunks"]
+
+    for _ in range(UPLOAD_CHUNK_ATTEMPTS):
+        if not missing:
+            break
+        done = upload["chunks"] - len(missing)
+        with ThreadPoolExecutor(UPLOAD_PARALLEL_CHUNKS) as pool:
+            futures = [
+                pool.submit(send_chunk, upload_id, index * chunk_size,
+                            content[index * chunk_size:(index + 1) * chunk_size], headers)
+                for index in missing
+            ]
+            for future in as_completed(futures):
+                done += future.result()
+                progress.progress(done / upload["chunks"])
+                status.info(f"Uploading dataset: {done} of {upload['chunks']} chunks")
+
+        # The server knows which chunks really arrived
+        missing = requests.get(
+            f"{API_BASE_URL}/pipeline/uploads/{upload_id}", headers=headers
+        ).json()["missing_chunks"]
+
+    return requests.post(
+        f"{API_BASE_URL}/pipeline/uploads/{upload_id}/complete",
+        headers=headers,
+        params={**params, "sha256": hashlib.sha256(content).hexdigest()}
+    )
+
+
+def job_events(job_id: int, headers: dict):
+    """
+    (event, data) pairs from the job's Server-Sent Events stream, until
+    its `done` event.
+    """
+    with requests.get(
+        f"{API_BASE_URL}/pipeline/jobs/{job_id}/events",
+        headers=headers,
+        stream=True,
+        timeout=(10, 60)
+    ) as response:
+        response.raise_for_status()
+        event, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and data:
+                yield event, json.loads("\n".join(data))
+                event, data = None, []
+
+
+def describe_progress(progress: dict) -> str:
+    if progress["stage"] == "queued":
+        return "Waiting for a worker"
+
+    text = f"Stage: {progress['stage']}"
+    if progress.get("pass"):
+        estimated = progress.get("estimated_rows")
+        text += f" | pass {progress['pass']}: {progress['rows']:,}"
+        text += f" of ~{estimated:,} rows" if estimated else " rows"
+    if progress.get("rows_per_second"):
+        text += f" | {progress['rows_per_second']:,.0f} rows/s"
+    if progress.get("eta_seconds") is not None:
+        text += f" | ETA {progress['eta_seconds']:.0f}s"
+    if progress.get("elapsed_seconds") is not None:
+        text += f" | {progress['elapsed_seconds']:.1f}s elapsed"
+    return text
+
+# -------------------------------------------------
+# PAGE CONFIG
+# -------------------------------------------------
+st.set_page_config(
+    page_title="AI Data Cleaning Assistant",
+    layout="wide"
+)
+
+# -------------------------------------------------
+# CUSTOM STYLING
+# -------------------------------------------------
+st.markdown(
+    """
+    <style>
+    body {
+        background: linear-gradient(135deg, #f7f9fc, #eef2f7);
+    }
+    .main-title {
+        font-size: 36px;
+        font-weight: 700;
+        margin-bottom: 10px;
+    }
+    .subtitle {
+        color: #555;
+        margin-bottom: 30px;
+    }
+    .section-title {
+        font-size: 22px;
+        font-weight: 600;
+        margin-top: 30px;
+        margin-bottom: 10px;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+st.markdown('<div class="main-title">AI Data Cleaning Assistant</div>', unsafe_allow_html=True)
+st.markdown('<div class="subtitle">Automated CSV Analysis, Cleaning and Quality Scoring</div>', unsafe_allow_html=True)
+
+# -------------------------------------------------
+# SESSION STATE
+# -------------------------------------------------
+if "token" not in st.session_state:
+    st.session_state.token = None
+
+if "page" not in st.session_state:
+    st.session_state.page = "login"
+
+if "user_email" not in st.session_state:
+    st.session_state.user_email = None
+
+# -------------------------------------------------
+# REGISTER PAGE
+# -------------------------------------------------
+if st.session_state.page == "register":
+    st.markdown('<div class="section-title">User Registration</div>', unsafe_allow_html=True)
+
+    email = st.text_input("Email address")
+    password = st.text_input("Password", type="password")
+
+    if st.button("Create Account"):
+        response = requests.post(
+            f"{API_BASE_URL}/users/register",
+            json={"email": email, "password": password}
+        )
+
+        if response.status_code in (200, 201):
+            st.success("Registration completed. Please login.")
+            st.session_state.page = "login"
+            st.rerun()
+        else:
+            st.error(response.text)
+
+    if st.button("Back to Login"):
+        st.session_state.page = "login"
+        st.rerun()
+
+# -------------------------------------------------
+# LOGIN PAGE
+# -------------------------------------------------
+elif st.session_state.token is None:
+    st.markdown('<div class="section-title">User Login</div>', unsafe_allow_html=True)
+
+    email = st.text_input("Email")
+    password = st.text_input("Password", type="password")
+
+    if st.button("Login"):
+        response = requests.post(
+            f"{API_BASE_URL}/users/login",
+            data={
+                "username": email,
+                "password": password
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+
+        if response.status_code == 200:
+            st.session_state.token = response.json()["access_token"]
+            st.session_state.user_email = email
+            st.success("Authentication successful")
+            st.rerun()
+        else:
+            st.error("Invalid email or password")
+
+    if st.button("New user? Register"):
+        st.session_state.page = "register"
+        st.rerun()
+
+# -------------------------------------------------
+# PIPELINE PAGE
+# -------------------------------------------------
+else:
+    st.caption(f"Authenticated user: {st.session_state.user_email}")
+
+    st.markdown('<div class="section-title">Upload Dataset</div>', unsafe_allow_html=True)
+    uploaded_file = st.file_uploader("Select a CSV file", type=["csv"])
+
+    if uploaded_file:
+        headers = {"Authorization": f"Bearer {st.session_state.token}"}
+
+        output_format = st.selectbox(
+            "Output format",
+            ["csv", "csv.gz", "csv.zst", "parquet", "feather"],
+            help="Parquet and Feather are smaller and faster to write and re-read"
+        )
+        engine = st.selectbox(
+            "Engine",
+            ["default", "pandas", "arrow"],
+            help="arrow uses pyarrow's multi-threaded reader and kernels; results are the same"
+        )
+        params = {"output_format": output_format}
+        if engine != "default":
+            params["engine"] = engine
+
+        if st.button("Run Data Cleaning Pipeline"):
+            progress = st.progress(0)
+            status = st.empty()
+            status.info("Uploading dataset")
+
+            # Resumable chunked upload, then follow the job's real progress
+            response = upload_resumable(uploaded_file, headers, params, progress, status)
+
+            if response.status_code == 202:
+                job_id = response.json()["job_id"]
+
+                if response.json()["status"] == "PENDING":
+                    progress.progress(0)
+                    for event, payload in job_events(job_id, headers):
+                        if event == "progress":
+                            status.info(describe_progress(payload))
+                            if payload.get("fraction") is not None:
+                                progress.progress(min(payload["fraction"], 1.0))
+                        elif event == "done":
+                            break
+
+                response = requests.get(f"{API_BASE_URL}/pipeline/jobs/{job_id}/result", headers=headers)
+
+            if response.status_code == 200:
+                data = response.json()
+                progress.progress(1.0)
+                status.success("Pipeline execution completed successfully")
+
+                summary = data["cleaning_summary"]
+
+                # -------------------------------------------------
+                # BEFORE vs AFTER METRICS
+                # -------------------------------------------------
+                st.markdown('<div class="section-title">Cleaning Overview</div>', unsafe_allow_html=True)
+
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Rows Before", summary["rows_before"])
+                c2.metric("Rows After", summary["rows_after"])
+                c3.metric("Duplicates Removed", summary["duplicates_removed"])
+                c4.metric("Missing Values Fixed", summary["missing_values_fixed"])
+
+                # -------------------------------------------------
+                # QUALITY SCORE
+                # -------------------------------------------------
+                st.markdown('<div class="section-title">Data Quality Score</div>', unsafe_allow_html=True)
+                score = summary["data_quality_score"]
+                st.metric("Quality Score", f"{score} / 100")
+
+                if score >= 80:
+                    st.success("Excellent data quality achieved")
+                elif score >= 60:
+                    st.warning("Moderate data quality")
+                else:
+                    st.error("Poor data quality")
+
+                # -------------------------------------------------
+                # DATASET ANALYSIS TABLE
+                # -------------------------------------------------
+                with st.expander("View dataset analysis"):
+                    analysis = data["analysis"]
+                    analysis_df = pd.DataFrame({
+                        "Column Name": analysis["columns"].keys(),
+                        "Data Type": analysis["columns"].values(),
+                        "Missing Values": analysis["missing_values"].values()
+                    })
+                    st.dataframe(analysis_df, use_container_width=True)
+
+                # -------------------------------------------------
+                # CLEANING STEPS
+                # -------------------------------------------------
+                with st.expander("View cleaning actions performed"):
+                    if data["cleaning_steps"]:
+                        for step in data["cleaning_steps"]:
+                            st.write(step)
+                    else:
+                        st.write("No cleaning actions were required.")
+
+                # -------------------------------------------------
+                # OUTPUT FILE
+                # -------------------------------------------------
+                st.markdown('<div class="section-title">Cleaned Output File</div>', unsafe_allow_html=True)
+                # A signed link: the browser streams the file from the API,
+                # so it never passes through this process
+                link = requests.post(
+                    f"{API_BASE_URL}/pipeline/jobs/{data['job_id']}/download-link",
+                    headers=headers
+                )
+
+                if link.status_code == 200:
+                    st.link_button("Download cleaned file", f"{API_BASE_URL}{link.json()['url']}")
+                    st.caption(f"The link is valid for {link.json()['expires_in'] // 60} minutes.")
+                else:
+                    st.code(data["cleaned_file_path"])
+
+            else:
+                status.empty()
+                st.error(f"Pipeline execution failed: {response.json().get('detail', response.text)}")
+
+    st.divider()
+
+    if st.button("Logout"):
+        st.session_state.token = None
+        st.session_state.page = "login"
         st.rerun()
\ No newline at end of file
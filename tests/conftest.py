@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Set before app modules read their configuration at import time
+_scratch = tempfile.mkdtemp(prefix="cleaning-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/test.db")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_scratch, "uploads"))
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JOB_WORKERS", "2")
+os.environ.setdefault("ADMIN_EMAILS", "admin@example.com")
+os.environ.setdefault("DB_POOL_TIMEOUT", "1")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    The app with its startup and shutdown run once for the session.
+    Server errors come back as 500 responses instead of being raised.
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers():
+    from app.auth import create_access_token
+
+    def headers(email: str = "tester@example.com") -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+    return headers
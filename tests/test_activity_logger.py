@@ -0,0 +1,117 @@
+import time
+import logging
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import ActivityLog
+from app.utils.activity_logger import ActivityLogWriter, activity_entry
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # SQLite stand-in for the production database
+    engine = create_engine(f"sqlite:///{tmp_path}/activity.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _rows(session_factory) -> list:
+    db = session_factory()
+    try:
+        return [(row.user_email, row.action) for row in db.query(ActivityLog).order_by(ActivityLog.id)]
+    finally:
+        db.close()
+
+
+class FailingSessions:
+    """
+    Session factory whose first `failures` commits raise.
+    """
+
+    def __init__(self, session_factory, failures: int):
+        self.session_factory = session_factory
+        self.failures = failures
+
+    def __call__(self):
+        db = self.session_factory()
+        if self.failures:
+            self.failures -= 1
+
+            def commit():
+                raise RuntimeError("connection lost")
+
+            db.commit = commit
+        return db
+
+
+def test_entries_are_written_in_batches_on_close(session_factory):
+    writer = ActivityLogWriter(session_factory, batch_size=3, flush_seconds=60)
+    for i in range(7):
+        writer.put(activity_entry("a@example.com", f"ACTION{i}"))
+    writer.close()
+
+    assert _rows(session_factory) == [("a@example.com", f"ACTION{i}") for i in range(7)]
+    stats = writer.stats()
+    assert stats["written"] == 7 and stats["batches"] == 3 and stats["pending"] == 0
+
+
+def test_background_thread_flushes_after_interval(session_factory):
+    writer = ActivityLogWriter(session_factory, batch_size=100, flush_seconds=0.05)
+    writer.start()
+    try:
+        writer.put(activity_entry("a@example.com", "LOGIN"))
+        deadline = time.time() + 10
+        while not _rows(session_factory):
+            assert time.time() < deadline
+            time.sleep(0.02)
+    finally:
+        writer.close()
+
+    assert _rows(session_factory) == [("a@example.com", "LOGIN")]
+
+
+def test_failed_insert_is_retried_once(session_factory):
+    writer = ActivityLogWriter(FailingSessions(session_factory, 1), retry_seconds=0)
+    writer.write([activity_entry("a@example.com", "UPLOAD")])
+
+    assert _rows(session_factory) == [("a@example.com", "UPLOAD")]
+    assert writer.stats()["retried"] == 1
+    assert writer.stats()["failed"] == 0
+
+
+def test_lost_entries_are_logged_and_counted(session_factory, caplog):
+    writer = ActivityLogWriter(FailingSessions(session_factory, 2), retry_seconds=0)
+    with caplog.at_level(logging.ERROR, logger="app.utils.activity_logger"):
+        writer.write([activity_entry("a@example.com", "CLEAN", "Rows before: 10")])
+
+    assert _rows(session_factory) == []
+    assert writer.stats()["failed"] == 1
+    assert any("a@example.com CLEAN Rows before: 10" in record.getMessage() for record in caplog.records)
+
+
+def test_async_logging_does_not_block_the_event_loop(session_factory, monkeypatch):
+    import asyncio
+    from app.utils import activity_logger
+
+    # Writer thread not started: the one-entry buffer stays full
+    writer = ActivityLogWriter(session_factory, max_queue=1)
+    writer.put(activity_entry("a@example.com", "FIRST"))
+    monkeypatch.setattr(activity_logger, "_writer", writer)
+
+    async def scenario():
+        logging_task = asyncio.create_task(activity_logger.log_activity_async("a@example.com", "SECOND"))
+        # The loop keeps serving other coroutines while the entry waits
+        await asyncio.sleep(0.05)
+        assert not logging_task.done()
+
+        await asyncio.to_thread(writer.flush)
+        await asyncio.wait_for(logging_task, timeout=10)
+
+    asyncio.run(scenario())
+    writer.flush()
+    assert _rows(session_factory) == [("a@example.com", "FIRST"), ("a@example.com", "SECOND")]
+    assert writer.stats()["blocked"] == 1
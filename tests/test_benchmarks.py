@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from benchmarks.datagen import column_plan, generate_csv, parse_dtypes
+from benchmarks.pipeline_benchmark import compare, run_target
+
+
+def _generate(tmp_path, name: str, **options) -> tuple:
+    path = str(tmp_path / f"{name}.csv")
+    info = generate_csv(path, **{"rows": 5000, "columns": 10, **options})
+    with open(path, "rb") as f:
+        return info, f.read()
+
+
+def test_same_arguments_give_the_same_bytes(tmp_path):
+    _, first = _generate(tmp_path, "first", seed=3)
+    _, again = _generate(tmp_path, "again", seed=3, chunk_rows=777)
+    _, other = _generate(tmp_path, "other", seed=4)
+
+    assert again == first
+    assert other != first
+
+
+def test_generated_data_follows_the_parameters(tmp_path):
+    info, _ = _generate(
+        tmp_path, "shaped", rows=20_000, columns=6, dtypes={"int": 1, "str": 2},
+        missing_ratio=0.2, duplicate_ratio=0.1, string_width=7
+    )
+    df = pd.read_csv(info["path"])
+
+    assert df.shape == (20_000, 6)
+    assert list(df.columns) == ["int_0", "str_1", "int_2", "str_3", "str_4", "str_5"]
+    assert df["str_1"].dropna().str.len().eq(7).all()
+    assert df.isnull().mean().between(0.17, 0.23).all()
+    # Duplicates copy a whole earlier row, missing cells included
+    assert 0.08 <= df.duplicated().mean() <= 0.12
+    assert info["size_bytes"] > 0
+
+
+def test_dtype_mix():
+    plan = column_plan(10, parse_dtypes("int=2,float=2,str=4,date=1,bool=1"))
+    dtypes = [dtype for _, dtype in plan]
+    assert {dtype: dtypes.count(dtype) for dtype in set(dtypes)} == {"int": 2, "float": 2, "str": 4, "date": 1, "bool": 1}
+
+    with pytest.raises(ValueError, match="Unknown dtype"):
+        parse_dtypes("int=1,complex=2")
+
+
+def test_compare_flags_regressions():
+    def results(seconds, memory):
+        return {"results": {"mixed": {"clean_csv": {"seconds": seconds, "peak_memory_mb": memory}}}}
+
+    baseline = results(1.0, 99)
+    assert compare(results(1.05, 99), baseline, 0.1) == [("mixed", "clean_csv", pytest.approx(0.05), 0.0, False)]
+    assert compare(results(1.5, 99), baseline, 0.1)[0][-1]
+    assert compare(results(1.0, 150), baseline, 0.1)[0][-1]
+    # Targets missing from the baseline are not compared
+    assert compare(results(1.0, 99), {"results": {}}, 0.1) == []
+
+
+@pytest.mark.parametrize("target", ["run_pipeline", "endpoint_clean_csv"])
+def test_target_runs_in_a_fresh_process(tmp_path, target):
+    info, _ = _generate(tmp_path, "small", rows=2000)
+    result = run_target(target, info, repeat=2)
+
+    assert len(result["all_seconds"]) == 2
+    assert result["seconds"] == min(result["all_seconds"])
+    assert result["rows_per_second"] > 0 and result["mb_per_second"] > 0
+    assert result["peak_memory_mb"] >= 0
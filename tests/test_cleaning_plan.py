@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.cleaning_plan import execute_plan, optimize_plan, parse_plan
+from app.services.data_cleaning import clean_csv
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(7)
+    rows = 200
+    df = pd.DataFrame({
+        "city": rng.choice([" Paris", "Lyon ", " Nice ", None], rows),
+        "price": rng.choice([1.5, 2.0, -1.0, np.nan, 10.0], rows),
+        "qty": rng.choice(["1", "2", "3", "x", None], rows),
+        "flag": rng.choice([True, False, None], rows),
+    })
+    # Exact duplicates for the dedup steps
+    return pd.concat([df, df.iloc[:40]], ignore_index=True)
+
+
+def _run(df: pd.DataFrame, plan: list, optimize: bool):
+    optimized = optimize_plan(parse_plan(plan), df.dtypes.to_dict(), optimize=optimize)
+    result, _, _ = execute_plan(df, optimized)
+    return result, optimized["rewrites"]
+
+
+PLANS = {
+    "filter_after_rename": [
+        {"op": "rename", "columns": {"price": "cost"}},
+        {"op": "trim", "columns": ["city"]},
+        {"op": "filter", "column": "cost", "operator": ">", "value": 0},
+    ],
+    "filter_after_cast": [
+        {"op": "cast", "columns": {"qty": "int"}},
+        {"op": "filter", "column": "price", "operator": "not_null"},
+    ],
+    "filter_after_dedup": [
+        {"op": "dedup", "columns": ["city", "price"]},
+        {"op": "filter", "column": "price", "operator": ">=", "value": 2},
+    ],
+    "filter_after_constant_fill": [
+        {"op": "impute", "columns": ["qty"], "strategies": {"qty": {"strategy": "constant", "value": "0"}}},
+        {"op": "filter", "column": "city", "operator": "in", "value": ["Lyon ", " Nice "]},
+    ],
+    "filter_stays_after_mean_fill": [
+        {"op": "impute", "columns": ["price"], "strategies": {"price": "mean"}},
+        {"op": "filter", "column": "city", "operator": "is_null"},
+    ],
+    "fused_column_passes": [
+        {"op": "trim"},
+        {"op": "cast", "columns": {"qty": "float", "flag": "bool"}},
+        {"op": "impute", "strategies": {"qty": "median", "city": "mode"}},
+        {"op": "rename", "columns": {"qty": "quantity"}},
+        {"op": "dedup"},
+    ],
+}
+
+
+@pytest.mark.parametrize("name", sorted(PLANS))
+def test_optimized_plan_gives_the_same_frame(frame, name):
+    expected, _ = _run(frame, PLANS[name], optimize=False)
+    actual, rewrites = _run(frame, PLANS[name], optimize=True)
+
+    pd.testing.assert_frame_equal(actual, expected)
+    if name != "filter_stays_after_mean_fill":
+        assert rewrites, "the optimizer should have rewritten this plan"
+
+
+def test_filters_move_ahead_only_where_they_commute(frame):
+    _, pushed = _run(frame, PLANS["filter_after_dedup"], optimize=True)
+    assert any(rewrite.startswith("pushed filter") for rewrite in pushed)
+
+    _, kept = _run(frame, PLANS["filter_stays_after_mean_fill"], optimize=True)
+    assert not any(rewrite.startswith("pushed filter") for rewrite in kept)
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_trim_leaves_non_string_values_alone(tmp_path, optimize):
+    path = tmp_path / "mixed.csv"
+    path.write_text("name,flag\n a ,True\nb,\nc,False\n")
+
+    result = clean_csv(str(path), plan=[{"op": "trim"}], optimize=optimize)
+    cleaned = pd.read_csv(result["cleaned_file_path"], keep_default_na=False)
+
+    assert cleaned["name"].tolist() == ["a", "b", "c"]
+    assert cleaned["flag"].tolist() == ["True", "", "False"]
+    assert result["steps"] == ["Trimmed whitespace in 'name'"]
+
+
+def test_trim_of_categories():
+    df = pd.DataFrame({
+        "flags": pd.Series([True, False, True], dtype="category"),
+        "labels": pd.Series([" a", "a ", "b"], dtype="category"),
+    })
+    result, _ = _run(df, [{"op": "trim"}], optimize=True)
+
+    assert result["flags"].tolist() == [True, False, True]
+    assert result["labels"].tolist() == ["a", "a", "b"]
+    assert isinstance(result["labels"].dtype, pd.CategoricalDtype)
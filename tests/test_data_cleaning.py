@@ -0,0 +1,91 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.services import data_cleaning
+from app.services.data_cleaning import analyze_csv, clean_csv, run_pipeline
+
+from conftest import ROOT
+
+DATASETS = {
+    "small": "a,b,c\n1,x,1.5\n1,x,1.5\n2,,\n,y,2.5\n3,z,\n2,,\n",
+    "laptopData": None,
+}
+
+
+@pytest.fixture(params=sorted(DATASETS))
+def csv_path(request, tmp_path):
+    if DATASETS[request.param] is None:
+        return os.path.join(ROOT, "sample_datasets", f"{request.param}.csv")
+    path = tmp_path / f"{request.param}.csv"
+    path.write_text(DATASETS[request.param])
+    return str(path)
+
+
+def _read(result: dict) -> bytes:
+    with open(result["cleaned_file_path"], "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Counts of the CSV parses and duplicate masks made while a test runs.
+    """
+    counts = {"read_csv": 0, "duplicate_mask": 0}
+
+    def counted(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(pd, "read_csv", counted("read_csv", pd.read_csv))
+    monkeypatch.setattr(data_cleaning, "duplicate_mask", counted("duplicate_mask", data_cleaning.duplicate_mask))
+    return counts
+
+
+@pytest.mark.parametrize("options", [{}, {"dedup_subset": ["a"]}, {"output_format": "parquet"}])
+def test_pipeline_matches_separate_analysis_and_cleaning(tmp_path, options):
+    path = tmp_path / "data.csv"
+    path.write_text(DATASETS["small"])
+
+    analysis, result = run_pipeline(str(path), engine="pandas", run_id="once", **options)
+    cleaned = _read(result)
+
+    assert analysis == analyze_csv(str(path), engine="pandas", dedup_subset=options.get("dedup_subset"))
+    expected = clean_csv(str(path), engine="pandas", run_id="twice", **options)
+    assert {k: v for k, v in result.items() if k != "cleaned_file_path"} == \
+        {k: v for k, v in expected.items() if k != "cleaned_file_path"}
+    assert cleaned == _read(expected)
+
+
+def test_pipeline_parses_the_file_once(csv_path, calls):
+    analysis, result = run_pipeline(csv_path, engine="pandas", run_id="once")
+    os.remove(result["cleaned_file_path"])
+
+    assert calls == {"read_csv": 1, "duplicate_mask": 1}
+    assert result["duplicates_removed"] == analysis["duplicate_rows"]
+    assert result["rows_after"] == analysis["total_rows"] - analysis["duplicate_rows"]
+
+
+def test_separate_calls_parse_twice(csv_path, calls):
+    analyze_csv(csv_path, engine="pandas")
+    os.remove(clean_csv(csv_path, engine="pandas", run_id="twice")["cleaned_file_path"])
+
+    assert calls == {"read_csv": 2, "duplicate_mask": 2}
+
+
+def test_endpoint_parses_the_upload_once(client, auth_headers, calls):
+    response = client.post(
+        "/pipeline/clean-csv",
+        params={"engine": "pandas"},
+        files={"file": ("parse-once.csv", DATASETS["small"].encode())},
+        headers=auth_headers()
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["analysis"]["duplicate_rows"] == body["cleaning_summary"]["duplicates_removed"] == 2
+    assert calls["read_csv"] == 1
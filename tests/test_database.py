@@ -0,0 +1,46 @@
+from contextlib import ExitStack
+
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine, pool_stats
+from app.utils.activity_logger import stop_activity_writer
+
+
+def _changes(before: dict) -> dict:
+    after = pool_stats()
+    return {name: after[name] - before[name] for name in ("checkouts", "checkins", "timeouts")}
+
+
+def test_checkouts_and_checkins_are_counted():
+    before = pool_stats()
+    with SessionLocal() as db:
+        db.execute(text("select 1"))
+        assert pool_stats()["checked_out"] == before["checked_out"] + 1
+        db.commit()
+        db.execute(text("select 1"))
+
+    assert _changes(before) == {"checkouts": 2, "checkins": 2, "timeouts": 0}
+    assert pool_stats()["checked_out"] == before["checked_out"]
+
+
+def test_exhausted_pool_gives_503_and_counts_the_timeout(client, auth_headers):
+    # Write out pending activity logs now: the writer thread would take a
+    # connection of its own mid-test (the next log call starts a new one)
+    stop_activity_writer()
+    before = pool_stats()
+    with ExitStack() as held:
+        for _ in range(before["available"]):
+            held.enter_context(engine.connect())
+        assert pool_stats()["available"] == 0
+
+        response = client.get("/history/jobs", headers=auth_headers())
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    changes = _changes(before)
+    assert changes["timeouts"] == 1
+    # Every connection handed out came back; the failed wait was none
+    assert changes["checkouts"] == changes["checkins"] >= before["available"]
+
+    health = client.get("/health/db").json()
+    assert health["available"] == before["available"]
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_cleaning import clean_csv
+from app.services.dedup import FingerprintIndex, duplicate_mask, near_duplicate_mask, row_fingerprints
+from app.services.dtype_optimizer import optimize_dtypes
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(3)
+    rows = 2000
+    return pd.DataFrame({
+        "city": rng.choice(["Paris", "Lyon", "Nice", None], rows),
+        "price": rng.choice([1.5, 2.0, -0.0, 0.0, np.nan], rows),
+        "qty": rng.integers(0, 4, rows),
+        "flag": rng.choice([True, False], rows),
+    })
+
+
+@pytest.mark.parametrize("subset", [None, ["city"], ["price", "qty"], ["flag", "city"]])
+def test_exact_dedup_matches_pandas(frame, subset):
+    expected = frame.duplicated(subset=subset)
+
+    pd.testing.assert_series_equal(duplicate_mask(frame, subset), expected)
+    # Compacted dtypes (categories, small ints) hash the same values alike
+    pd.testing.assert_series_equal(duplicate_mask(optimize_dtypes(frame), subset), expected)
+
+
+def test_equal_values_of_different_dtypes_share_a_fingerprint():
+    ints = pd.DataFrame({"a": pd.Series([1, 2, None], dtype="Int64")})
+    floats = pd.DataFrame({"a": [1.0, 2.0, np.nan]})
+    assert (row_fingerprints(ints) == row_fingerprints(floats)).all()
+
+
+def test_fingerprint_collision_falls_back_to_pandas():
+    # 1 and '1' hash alike as objects but are different values
+    df = pd.DataFrame({"a": [1, "1", 1, "1", 2]}, dtype=object)
+    pd.testing.assert_series_equal(duplicate_mask(df), df.duplicated())
+
+
+def test_index_spills_to_disk_and_keeps_first_rows(frame, tmp_path):
+    spill_dir = str(tmp_path / "spill")
+    fingerprints = row_fingerprints(frame)
+
+    with FingerprintIndex(max_memory_rows=10, spill_dir=spill_dir) as index:
+        seen = np.concatenate([
+            index.add_new(fingerprints[start:start + 150])
+            for start in range(0, len(frame), 150)
+        ])
+        assert index.memory_rows <= 10
+        assert os.listdir(spill_dir)
+        assert len(index) == (~frame.duplicated()).sum()
+        assert index.contains(fingerprints).all()
+
+    np.testing.assert_array_equal(~seen, frame.duplicated().to_numpy())
+
+
+def test_saved_runs_are_read_back(frame, tmp_path):
+    fingerprints = row_fingerprints(frame)
+    first, second = fingerprints[:1000], fingerprints[1000:]
+
+    with FingerprintIndex() as index:
+        index.add_new(first)
+        path = str(tmp_path / "run.npy")
+        np.save(path, index.added())
+
+    with FingerprintIndex.from_runs([path]) as index:
+        is_new = index.add_new(second)
+        # Only the fingerprints added after loading are reported as added
+        assert len(index.added()) == is_new.sum()
+
+    expected = ~frame.duplicated().to_numpy()[1000:]
+    np.testing.assert_array_equal(is_new, expected)
+
+
+def test_near_duplicates_are_found_in_normalized_text():
+    df = pd.DataFrame({
+        "title": [
+            "The quick brown fox jumps over the lazy dog",
+            "the quick brown fox, jumps over the lazy dog!",
+            "An entirely different sentence about cats",
+            "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG",
+            "The quick brown fox jumps over the lazy cat",
+        ],
+        "n": [1, 2, 3, 4, 5],
+    })
+
+    assert near_duplicate_mask(df).tolist() == [False, True, False, True, False]
+    # A looser threshold also catches the one-word edit
+    assert near_duplicate_mask(df, threshold=0.5).tolist() == [False, True, False, True, True]
+
+
+def test_clean_csv_reports_near_duplicates(tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_text("note,n\nHello World,1\nhello world,1\n\"hello, world!\",2\nsomething else,3\nHello World,1\n")
+
+    result = clean_csv(str(path), near_duplicates=True)
+
+    assert result["duplicates_removed"] == 3
+    assert result["steps"][:2] == ["Removed 1 duplicate rows", "Removed 2 near-duplicate rows"]
+    assert pd.read_csv(result["cleaned_file_path"])["note"].tolist() == ["Hello World", "something else"]
@@ -0,0 +1,97 @@
+import pytest
+
+from app.services.data_cleaning import clean_csv, clean_version
+from app.utils.downloads import etag_matches
+from app.utils.storage import file_sha256
+
+MODES = {
+    "in_memory": {},
+    "streaming": {"chunk_size": 2},
+    "plan": {"plan": [{"op": "dedup"}, {"op": "impute"}]},
+    "arrow": {"engine": "arrow"},
+}
+FORMATS = ("csv", "csv.gz", "csv.zst", "parquet", "feather")
+DATA = b"a,b\n1,x\n1,x\n2,\n,y\n3,z\n"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+@pytest.mark.parametrize("mode", sorted(MODES))
+def test_hash_is_recorded_while_writing(csv_path, mode, output_format):
+    result = clean_csv(csv_path, output_format=output_format, **MODES[mode])
+    assert result["cleaned_sha256"] == file_sha256(result["cleaned_file_path"])
+
+
+@pytest.mark.parametrize("output_format", ("csv", "csv.gz", "csv.zst"))
+def test_hash_covers_appended_versions(tmp_path, output_format):
+    source = tmp_path / "data.csv"
+    source.write_bytes(DATA)
+    state_dir = str(tmp_path / "state")
+
+    _, first, state_path = clean_version(str(source), state_dir, chunk_size=2, output_format=output_format)
+    assert first["cleaned_sha256"] == file_sha256(first["cleaned_file_path"])
+
+    source.write_bytes(DATA + b"4,w\n1,x\n")
+    _, second, _ = clean_version(str(source), state_dir, state_path, chunk_size=2, output_format=output_format)
+    assert second["incremental"]["mode"] == "append"
+    assert second["cleaned_sha256"] == file_sha256(second["cleaned_file_path"])
+
+
+def test_if_range_needs_a_strong_match():
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"abc"', '"abc"', strong=True)
+    assert not etag_matches('W/"abc"', '"abc"', strong=True)
+    assert not etag_matches("*", '"abc"', strong=True)
+
+
+def test_download_serves_the_recorded_hash(client, auth_headers):
+    response = client.post(
+        "/pipeline/clean-csv",
+        files={"file": ("download.csv", DATA)},
+        headers=auth_headers()
+    )
+    assert response.status_code == 200
+    body = response.json()
+    etag = f'"{body["cleaning_summary"]["cleaned_sha256"]}"'
+    url = f"/pipeline/jobs/{body['job_id']}/download"
+
+    full = client.get(url, headers={**auth_headers(), "Accept-Encoding": "identity"})
+    assert full.status_code == 200
+    assert full.headers["etag"] == etag
+
+    ranged = {**auth_headers(), "Accept-Encoding": "identity", "Range": "bytes=0-3"}
+    assert client.get(url, headers={**ranged, "If-Range": etag}).status_code == 206
+    weak = client.get(url, headers={**ranged, "If-Range": f"W/{etag}"})
+    assert weak.status_code == 200
+    assert weak.content == full.content
+
+
+def test_signed_link_opens_only_its_own_download(client, auth_headers):
+    owner = auth_headers("link-owner@example.com")
+    jobs = [
+        client.post("/pipeline/clean-csv", files={"file": (f"link{i}.csv", DATA)}, headers=owner).json()["job_id"]
+        for i in range(2)
+    ]
+    assert client.post(f"/pipeline/jobs/{jobs[0]}/download-link", headers=auth_headers()).status_code == 404
+
+    link = client.post(f"/pipeline/jobs/{jobs[0]}/download-link", headers=owner)
+    assert link.status_code == 200
+    url = link.json()["url"]
+    token = url.split("token=", 1)[1]
+
+    # No Authorization header: the token alone opens this job's file
+    response = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == client.get(url.split("?")[0], headers={**owner, "Accept-Encoding": "identity"}).content
+
+    assert client.get(f"/pipeline/jobs/{jobs[1]}/download", params={"token": token}).status_code == 401
+    assert client.get(url.split("?")[0]).status_code == 401
+    # Session tokens are not download links
+    session = owner["Authorization"].split()[1]
+    assert client.get(url.split("?")[0], params={"token": session}).status_code == 401
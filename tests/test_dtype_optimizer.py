@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from app.services.data_cleaning import analyze_csv, run_pipeline
+from app.services.dtype_optimizer import optimize_dtypes
+
+READ_DTYPES = {"small": "int64", "ratio": "float64", "label": "object", "flag": "bool"}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "compact.csv"
+    rows = [f"{k % 5},{k * 0.5},{'ab'[k % 2]},{k % 3 == 0}" for k in range(200)]
+    path.write_text("small,ratio,label,flag\n" + "\n".join(rows) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_analysis_reports_dtypes_as_read(csv_path, engine):
+    analysis, _ = run_pipeline(csv_path, engine=engine)
+
+    assert analysis["columns"] == READ_DTYPES
+    memory = analysis["memory"]
+    assert memory["dtypes"] == {"small": "int8", "ratio": "float32", "label": "category", "flag": "bool"}
+    assert memory["saved_bytes"] == memory["before_bytes"] - memory["after_bytes"]
+
+
+def test_memory_savings(csv_path):
+    memory = analyze_csv(csv_path)["memory"]
+    assert memory["saved_bytes"] > 0
+
+    unoptimized = analyze_csv(csv_path, optimize=False)
+    assert unoptimized["columns"] == READ_DTYPES
+    assert "memory" not in unoptimized
+
+
+def test_optimized_frame_keeps_its_values(csv_path):
+    df = pd.read_csv(csv_path)
+    compact = optimize_dtypes(df)
+
+    for col in df.columns:
+        assert compact[col].astype(df[col].dtype).equals(df[col]), col
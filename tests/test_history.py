@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import ActivityLog, CleaningHistory
+
+START = datetime(2024, 1, 1)
+
+
+def _seed(rows: list) -> list:
+    db = SessionLocal()
+    try:
+        db.add_all(rows)
+        db.commit()
+        return [(row.created_at, row.id) for row in rows]
+    finally:
+        db.close()
+
+
+def _newest_first(keys: list) -> list:
+    return [row_id for _, row_id in sorted(keys, reverse=True)]
+
+
+def _all_pages(client, headers: dict, path: str, **params) -> list:
+    ids, cursor = [], None
+    while True:
+        page = client.get(path, params=dict(params, cursor=cursor) if cursor else params, headers=headers)
+        assert page.status_code == 200
+        body = page.json()
+        assert len(body["items"]) <= params["limit"]
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture(scope="module")
+def history_rows():
+    email = "pages-jobs@example.com"
+    # Runs of four rows share a timestamp, so pages split ties
+    keys = _seed([
+        CleaningHistory(
+            user_email=email,
+            status="FAILED" if i % 3 == 0 else "COMPLETED",
+            created_at=START + timedelta(seconds=i // 4)
+        )
+        for i in range(23)
+    ])
+    return email, keys
+
+
+def test_history_pages_have_no_gaps_or_repeats(client, auth_headers, history_rows):
+    email, keys = history_rows
+    for limit in (1, 3, 4, 5, 50):
+        ids = _all_pages(client, auth_headers(email), "/history/jobs", limit=limit)
+        assert ids == _newest_first(keys), limit
+
+
+def test_history_filters_apply_to_every_page(client, auth_headers, history_rows):
+    email, keys = history_rows
+    db = SessionLocal()
+    try:
+        failed = {row.id for row in db.query(CleaningHistory).filter(
+            CleaningHistory.user_email == email, CleaningHistory.status == "FAILED"
+        )}
+    finally:
+        db.close()
+
+    ids = _all_pages(client, auth_headers(email), "/history/jobs", limit=2, status="FAILED")
+    assert ids == [row_id for row_id in _newest_first(keys) if row_id in failed]
+
+    since, until = START + timedelta(seconds=1), START + timedelta(seconds=4)
+    ids = _all_pages(
+        client, auth_headers(email), "/history/jobs",
+        limit=3, since=since.isoformat(), until=until.isoformat()
+    )
+    assert ids == _newest_first([key for key in keys if since <= key[0] < until])
+
+
+def test_activity_pages_by_action(client, auth_headers):
+    email = "pages-activity@example.com"
+    keys = _seed([
+        ActivityLog(
+            user_email=email,
+            action="CLEAN" if i % 2 else "LOGIN",
+            description=f"entry {i}",
+            created_at=START + timedelta(seconds=i // 3)
+        )
+        for i in range(17)
+    ])
+    ids = _all_pages(client, auth_headers(email), "/history/activity", limit=4)
+    assert ids == _newest_first(keys)
+
+    cleans = _all_pages(client, auth_headers(email), "/history/activity", limit=2, action="CLEAN")
+    assert cleans == _newest_first(keys[1::2])
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WyJ4Il0", "bnVsbA"])
+def test_bad_cursor_is_rejected(client, auth_headers, cursor):
+    for path in ("/history/jobs", "/history/activity"):
+        response = client.get(path, params={"cursor": cursor}, headers=auth_headers())
+        assert response.status_code == 400
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.imputation import fill_column, impute, resolve_strategies, streaming_fills
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(11)
+    rows = 500
+
+    def holes(values, ratio=0.2):
+        values = pd.Series(values)
+        return values.mask(rng.random(rows) < ratio)
+
+    return pd.DataFrame({
+        "team": holes(rng.choice(["a", "b", "c"], rows), 0.05),
+        "score": holes(rng.normal(50, 10, rows)),
+        "age": holes(rng.integers(18, 60, rows).astype("float64")),
+        "city": holes(rng.choice(["Paris", "Lyon", "Nice"], rows)),
+        "complete": rng.integers(0, 9, rows),
+        "points": holes(rng.normal(5, 2, rows)),
+    })
+
+
+def _reference(df: pd.DataFrame, strategies: dict) -> pd.DataFrame:
+    """
+    The column-by-column loop impute() replaces.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if not df[col].isnull().any():
+            continue
+        spec = strategies.get(col, "mean" if pd.api.types.is_numeric_dtype(df[col]) else "constant")
+        spec = {"strategy": spec} if isinstance(spec, str) else spec
+        strategy = spec["strategy"]
+        if strategy == "constant":
+            df[col] = df[col].fillna(spec.get("value", "Unknown"))
+        elif spec.get("group_by"):
+            stats = df.groupby(spec["group_by"], dropna=False)[col].transform(strategy)
+            df[col] = df[col].fillna(stats.fillna(getattr(df[col], strategy)()))
+        elif strategy == "mode":
+            df[col] = df[col].fillna(df[col].mode().iloc[0])
+        else:
+            df[col] = df[col].fillna(getattr(df[col], strategy)())
+    return df
+
+
+STRATEGIES = {
+    "defaults": {},
+    "median_and_mode": {"score": "median", "age": "mode", "city": "mode"},
+    "constants": {"score": {"strategy": "constant", "value": 0}, "city": {"strategy": "constant", "value": "N/A"}},
+    "grouped": {"score": {"strategy": "mean", "group_by": "team"}, "age": {"strategy": "median", "group_by": "team"}},
+}
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_bulk_fill_matches_column_loop(frame, name):
+    result, steps = impute(frame, STRATEGIES[name])
+    expected = _reference(frame, STRATEGIES[name])
+
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+    assert not result.drop(columns="team").isnull().any().any()
+    assert len(steps) == frame.isnull().any().sum()
+
+
+def test_steps_describe_each_filled_column(frame):
+    strategies = {
+        "score": {"strategy": "mean", "group_by": "team"},
+        "age": "median",
+        "city": {"strategy": "constant", "value": "N/A"},
+    }
+    _, steps = impute(frame, strategies)
+
+    assert steps == [
+        "Filled missing values in 'team' with 'Unknown'",
+        "Filled missing values in 'score' with mean per 'team'",
+        "Filled missing values in 'age' with median",
+        "Filled missing values in 'city' with 'N/A'",
+        "Filled missing values in 'points' with mean",
+    ]
+
+
+def test_frame_without_nulls_is_returned_as_is(frame):
+    complete = frame[["complete"]]
+    result, steps = impute(complete)
+    assert result is complete
+    assert steps == []
+
+
+def test_empty_group_falls_back_to_the_column_statistic():
+    df = pd.DataFrame({"team": ["a", "a", "b", "b"], "score": [1.0, np.nan, np.nan, np.nan]})
+    result, _ = impute(df, {"score": {"strategy": "median", "group_by": "team"}})
+    assert result["score"].tolist() == [1.0, 1.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_fill_column_matches_impute(frame, name):
+    strategies = STRATEGIES[name]
+    result, _ = impute(frame, strategies)
+    text = {col for col in frame.columns if frame[col].dtype == object}
+    plan = resolve_strategies(frame.columns, text, strategies)
+
+    for col in ("score", "age", "city"):
+        keys = frame[plan[col]["group_by"]] if plan[col]["group_by"] else None
+        pd.testing.assert_series_equal(fill_column(frame[col], plan[col], keys), result[col])
+
+
+@pytest.mark.parametrize("strategies, message", [
+    ({"nope": "mean"}, "Unknown imputation columns"),
+    ({"score": "average"}, "Unknown imputation strategy"),
+    ({"city": "median"}, "needs a numeric column"),
+    ({"city": {"strategy": "constant"}}, "needs a 'value'"),
+    ({"city": {"strategy": "mode", "group_by": "team"}}, "Group-wise imputation"),
+    ({"score": {"strategy": "mean", "group_by": "nope"}}, "Unknown group_by column"),
+])
+def test_invalid_strategies_are_rejected(frame, strategies, message):
+    with pytest.raises(ValueError, match=message):
+        impute(frame, strategies)
+
+
+def test_streaming_fills_only_support_one_pass_strategies():
+    columns = ["score", "city"]
+    dtypes = {"score": "float64", "city": "object"}
+    nulls = {"score": 2, "city": 1}
+
+    values, steps = streaming_fills(columns, dtypes, nulls, {"score": 4.5}, {"city": {"strategy": "constant", "value": "-"}})
+    assert values == {"score": 4.5, "city": "-"}
+    assert steps == ["Filled missing values in 'score' with mean", "Filled missing values in 'city' with '-'"]
+
+    with pytest.raises(ValueError, match="not available in streaming mode"):
+        streaming_fills(columns, dtypes, nulls, {"score": 4.5}, {"score": "median"})
@@ -0,0 +1,137 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.database import SessionLocal
+from app.models import User
+from app.services.data_cleaning import clean_csv, clean_version
+
+HEADER = "id,city,price\n"
+FIRST = "1,Paris,10\n2,,20\n3,Lyon,30\n3,Lyon,30\n"
+APPENDED = "4,Nice,40\n1,Paris,10\n5,,50\n"
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text(HEADER + FIRST)
+    return path
+
+
+def _version(path, state_dir, parent=None, **options):
+    return clean_version(str(path), str(state_dir), parent, chunk_size=2, **options)
+
+
+def _text(result: dict) -> str:
+    with open(result["cleaned_file_path"]) as f:
+        return f.read()
+
+
+def test_appended_rows_are_cleaned_alone(tmp_path, source):
+    state_dir = tmp_path / "state"
+    _, first, state = _version(source, state_dir)
+    first_text = _text(first)
+    assert first["incremental"] == {
+        "mode": "full", "reason": "no previous version", "rows_processed": 4, "bytes_processed": len(HEADER + FIRST)
+    }
+
+    with open(source, "a") as f:
+        f.write(APPENDED)
+    analysis, second, _ = _version(source, state_dir, state)
+
+    assert second["incremental"]["mode"] == "append"
+    assert second["incremental"]["rows_processed"] == 3
+    assert second["incremental"]["bytes_processed"] == len(APPENDED)
+    # '1,Paris,10' was seen in the first version
+    assert analysis["duplicate_rows"] == second["duplicates_removed"] == 2
+    assert second["rows_after"] == 5
+    # Same file as cleaning the whole version from scratch
+    full = clean_csv(str(source), chunk_size=2, run_id="full")
+    assert _text(second) == _text(full)
+    assert second["cleaned_sha256"] == full["cleaned_sha256"]
+    # The first version's cleaned file is left as it was
+    assert _text(first) == first_text
+
+
+def test_running_means_fill_appended_rows(tmp_path):
+    path = tmp_path / "numbers.csv"
+    path.write_text("k,x\na,1.0\nb,3.0\n")
+    state_dir = tmp_path / "state"
+    _, _, state = _version(path, state_dir)
+
+    with open(path, "a") as f:
+        f.write("c,8.0\nd,\n")
+    _, result, _ = _version(path, state_dir, state)
+
+    assert result["incremental"]["mode"] == "append"
+    assert pd.read_csv(result["cleaned_file_path"])["x"].tolist() == [1.0, 3.0, 8.0, 4.0]
+
+
+def test_versions_branch_from_an_unchanged_parent(tmp_path, source):
+    state_dir = tmp_path / "state"
+    _, _, state = _version(source, state_dir)
+
+    with open(source, "a") as f:
+        f.write(APPENDED)
+    _, once, _ = _version(source, state_dir, state)
+    _, again, _ = _version(source, state_dir, state)
+
+    assert again["incremental"]["mode"] == "append"
+    assert _text(again) == _text(once)
+
+
+@pytest.mark.parametrize("change, reason", [
+    (lambda path: path.write_text(HEADER + FIRST.replace("Paris", "Rome") + APPENDED),
+     "file does not start with the previous version"),
+    (lambda path: path.write_text(HEADER + FIRST + "6,Nice,60.5\n"),
+     "column types changed: price"),
+])
+def test_rewritten_versions_are_cleaned_in_full(tmp_path, source, change, reason):
+    state_dir = tmp_path / "state"
+    _, _, state = _version(source, state_dir)
+
+    change(source)
+    _, result, _ = _version(source, state_dir, state)
+
+    assert result["incremental"]["mode"] == "full"
+    assert result["incremental"]["reason"] == reason
+    assert _text(result) == _text(clean_csv(str(source), chunk_size=2, run_id="full"))
+
+
+def test_other_options_start_over(tmp_path, source):
+    state_dir = tmp_path / "state"
+    _, _, state = _version(source, state_dir)
+
+    with open(source, "a") as f:
+        f.write(APPENDED)
+    _, result, _ = _version(source, state_dir, state, dedup_subset=["id"])
+
+    assert result["incremental"] == {
+        "mode": "full", "reason": "cleaning options changed", "rows_processed": 7, "bytes_processed": os.path.getsize(source)
+    }
+
+
+def test_dataset_versions_endpoint(client, auth_headers):
+    email = "feeds@example.com"
+    db = SessionLocal()
+    try:
+        db.add(User(email=email, hashed_password="-"))
+        db.commit()
+    finally:
+        db.close()
+    url = "/pipeline/datasets/daily-feed/versions"
+
+    bodies = []
+    for data in (HEADER + FIRST, HEADER + FIRST + APPENDED):
+        response = client.post(url, files={"file": ("feed.csv", data.encode())}, headers=auth_headers(email))
+        assert response.status_code == 200
+        bodies.append(response.json())
+
+    assert bodies[1]["parent_job_id"] == bodies[0]["job_id"]
+    assert bodies[1]["cleaning_summary"]["incremental"]["mode"] == "append"
+
+    versions = client.get(url, headers=auth_headers(email)).json()
+    assert [(v["version"], v["mode"], v["rows_processed"]) for v in versions] == [(1, "full", 4), (2, "append", 3)]
+    # Another user's dataset of the same name is not visible
+    assert client.get(url, headers=auth_headers()).status_code == 404
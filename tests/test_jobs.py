@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import CleaningHistory
+from app.routers import pipeline_routes
+from app.services import jobs
+
+
+def _wait_until(condition, timeout: float = 30):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    executor = jobs.get_executor()
+    assert executor.submit(abs, -1).result(timeout=60) == 1
+
+    # As if the OOM killer took a worker
+    worker = next(iter(executor._processes.values()))
+    worker.kill()
+    _wait_until(lambda: executor._broken)
+
+    assert jobs.submit_to_pool(abs, -2).result(timeout=60) == 2
+    assert jobs.get_executor() is not executor
+
+
+def test_failed_submit_marks_the_job_failed(client, auth_headers, monkeypatch):
+    def broken_submit(*args, **kwargs):
+        raise RuntimeError("pool unavailable")
+
+    monkeypatch.setattr(pipeline_routes, "submit_cleaning_job", broken_submit)
+    email = "queue-failure@example.com"
+
+    response = client.post(
+        "/pipeline/jobs",
+        files={"file": ("data.csv", b"a,b\n1,2\n3,4\n")},
+        headers=auth_headers(email)
+    )
+    assert response.status_code == 500
+
+    db = SessionLocal()
+    try:
+        history = db.query(CleaningHistory).filter(CleaningHistory.user_email == email).one()
+        assert history.status == "FAILED"
+        assert "pool unavailable" in history.error
+    finally:
+        db.close()
+
+
+def test_job_runs_to_completion(client, auth_headers):
+    response = client.post(
+        "/pipeline/jobs",
+        files={"file": ("jobs.csv", b"a,b\n1,2\n1,2\n,4\n")},
+        headers=auth_headers()
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    def finished():
+        status = client.get(f"/pipeline/jobs/{job_id}", headers=auth_headers()).json()["status"]
+        return status != "PENDING"
+
+    _wait_until(finished, timeout=120)
+    assert client.get(f"/pipeline/jobs/{job_id}", headers=auth_headers()).json()["status"] == "COMPLETED"
+
+
+def test_batch_counts_against_the_queue_limit():
+    tasks = [("missing.csv", {})] * 3
+    held = 0
+    while jobs._slots.acquire(blocking=False):
+        held += 1
+    try:
+        with pytest.raises(jobs.JobQueueFull):
+            jobs.run_pipelines(tasks)
+
+        # One free slot: the batch runs on it, then gives it back
+        jobs._slots.release()
+        held -= 1
+        results = jobs.run_pipelines(tasks)
+        assert all(error is not None for _, _, error in results)
+        assert jobs._slots.acquire(blocking=False)
+        held += 1
+    finally:
+        for _ in range(held):
+            jobs._slots.release()
+
+
+def test_full_queue_rejects_a_batch(client, auth_headers, monkeypatch):
+    def full(*args, **kwargs):
+        raise jobs.JobQueueFull()
+
+    monkeypatch.setattr(pipeline_routes, "run_pipelines", full)
+    response = client.post(
+        "/pipeline/batch",
+        files=[("files", ("batch.csv", b"a,b\n1,2\n"))],
+        headers=auth_headers()
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "30"
@@ -0,0 +1,43 @@
+import sys
+
+import pytest
+
+from app.services import jobs
+from app.services.data_cleaning import run_pipeline
+from app.utils import metrics
+from app.utils.metrics import call_with_stages
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,x\n1,x\n,y\n")
+    return str(path)
+
+
+def test_api_process_leaves_the_peak_rss_alone(csv_path, monkeypatch):
+    resets = []
+    monkeypatch.setattr(metrics, "_reset_peak_rss", lambda: resets.append(1) or True)
+
+    _, stages = call_with_stages(run_pipeline, csv_path)
+
+    assert stages and not resets
+    assert not any("peak_rss_mb" in stage for stage in stages.values())
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="peak RSS is read from /proc")
+def test_job_workers_measure_stage_memory(csv_path):
+    [(output, stages, error)] = jobs.run_pipelines([(csv_path, {})])
+
+    assert error is None
+    assert all(stage["peak_rss_mb"] > 0 for stage in stages.values())
+
+
+def test_stage_memory_can_be_forced(csv_path, monkeypatch):
+    resets = []
+    monkeypatch.setattr(metrics, "_reset_peak_rss", lambda: resets.append(1) or False)
+
+    with metrics.collect_stages(metrics.StageTimer(track_memory=True)):
+        run_pipeline(csv_path)
+
+    assert resets
@@ -0,0 +1,94 @@
+import hashlib
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from app.services.data_cleaning import clean_csv
+from app.utils.storage import file_sha256
+
+MODES = {
+    "in_memory": {},
+    "in_memory_unoptimized": {"optimize": False},
+    "streaming": {"chunk_size": 3},
+    "arrow": {"engine": "arrow"},
+}
+READERS = {"parquet": pq.read_table, "feather": feather.read_table}
+
+EXPECTED_SCHEMA = {
+    "small_int": pa.int64(),          # int8 after optimize_dtypes
+    "half": pa.float64(),             # float32 after optimize_dtypes
+    "flag": pa.bool_(),
+    "flag_with_nulls": pa.string(),   # object in pandas
+    "label": pa.string(),             # category after optimize_dtypes
+    "name": pa.string(),              # Arrow strings after optimize_dtypes
+    "int_with_nulls": pa.float64(),
+    "empty": pa.float64(),
+}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rows = ["small_int,half,flag,flag_with_nulls,label,name,int_with_nulls,empty"]
+    for k in range(10):
+        rows.append(",".join([
+            str(k % 3),
+            str(k * 0.5),
+            "True" if k % 2 else "False",
+            "" if k == 1 else ("True" if k % 2 else "False"),
+            f"c{k % 2}",
+            f"name {k}",
+            "" if k == 2 else str(k),
+            "",
+        ]))
+    path = tmp_path / "data.csv"
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("output_format", sorted(READERS))
+def test_schema_is_the_same_in_every_mode(csv_path, output_format):
+    tables = {}
+    for mode, options in MODES.items():
+        result = clean_csv(csv_path, output_format=output_format, **options)
+        tables[mode] = READERS[output_format](result["cleaned_file_path"])
+
+    for mode, table in tables.items():
+        assert {field.name: field.type for field in table.schema} == EXPECTED_SCHEMA, mode
+        assert table.equals(tables["in_memory"]), mode
+
+
+def test_runs_on_one_upload_write_their_own_files(csv_path):
+    first = clean_csv(csv_path, run_id="first")
+    second = clean_csv(csv_path, dedup_subset=["label"], run_id="second")
+
+    assert first["cleaned_file_path"].endswith("_cleaned-first.csv")
+    assert second["cleaned_file_path"] != first["cleaned_file_path"]
+    for result in (first, second):
+        assert result["cleaned_sha256"] == file_sha256(result["cleaned_file_path"])
+
+
+def test_cached_runs_keep_their_own_output(client, auth_headers, csv_path):
+    with open(csv_path, "rb") as f:
+        data = f.read()
+
+    downloads = {}
+    for dedup_columns in ("label", "name"):
+        response = client.post(
+            "/pipeline/clean-csv",
+            params={"dedup_columns": dedup_columns},
+            files={"file": ("shared.csv", data)},
+            headers=auth_headers()
+        )
+        assert response.status_code == 200
+        body = response.json()
+        download = client.get(
+            f"/pipeline/jobs/{body['job_id']}/download",
+            headers={**auth_headers(), "Accept-Encoding": "identity"}
+        )
+        assert download.status_code == 200
+        assert hashlib.sha256(download.content).hexdigest() == body["cleaning_summary"]["cleaned_sha256"]
+        downloads[dedup_columns] = download.content
+
+    assert downloads["label"] != downloads["name"]
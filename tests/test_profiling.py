@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import profiling
+from app.services.data_cleaning import analyze_csv
+from app.services.dtype_optimizer import optimize_dtypes
+from app.services.profiling import QUANTILES, profile_columns, profile_shard, shard_columns
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(5)
+    rows = 1000
+    return pd.DataFrame({
+        "price": pd.Series(rng.normal(100, 15, rows)).mask(rng.random(rows) < 0.1),
+        "qty": rng.integers(0, 20, rows),
+        "city": rng.choice(["Paris", "Lyon", "Saint-Etienne", None], rows, p=[0.5, 0.3, 0.1, 0.1]),
+        "flag": rng.choice([True, False], rows),
+        # No tied counts: categories break ties in their own order
+        "note": [f"note {int(np.sqrt(i))}" for i in range(rows)],
+        "empty": np.full(rows, np.nan),
+    })
+
+
+def test_column_statistics(frame):
+    stats = profile_shard(frame, top_k=2)
+
+    prices = frame["price"].dropna().to_numpy()
+    assert stats["price"]["count"] == len(prices)
+    assert stats["price"]["min"] == prices.min()
+    assert stats["price"]["max"] == prices.max()
+    assert stats["price"]["quantiles"] == {str(q): v for q, v in zip(QUANTILES, np.quantile(prices, QUANTILES))}
+
+    counts = frame["city"].value_counts()
+    assert stats["city"]["distinct"] == 3
+    assert stats["city"]["top_values"] == [{"value": value, "count": int(counts[value])} for value in counts.index[:2]]
+    assert (stats["city"]["min_length"], stats["city"]["max_length"]) == (4, 13)
+
+    assert "quantiles" not in stats["flag"]
+    assert stats["empty"] == {
+        "count": 0, "distinct": 0, "top_values": [],
+        "min": None, "max": None, "mean": None, "std": None, "quantiles": {}
+    }
+
+
+def test_compacted_dtypes_give_the_same_statistics(frame):
+    compacted = optimize_dtypes(frame)
+    assert isinstance(compacted["city"].dtype, pd.CategoricalDtype)
+    assert profile_shard(compacted) == profile_shard(frame)
+
+
+def test_shards_cover_every_column_once(frame):
+    wide = pd.concat([frame.add_suffix(f"_{i}") for i in range(5)], axis=1)
+    shards = shard_columns(wide, 4)
+
+    assert len(shards) == 4
+    assert sorted(p for shard in shards for p in shard) == list(range(wide.shape[1]))
+    # Text columns weigh more; the greedy split keeps the loads close
+    loads = [sum(profiling._column_cost(wide.dtypes.iloc[p]) for p in shard) for shard in shards]
+    assert max(loads) - min(loads) <= profiling._TEXT_COST
+
+
+def test_parallel_profile_matches_in_process(frame, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_WORKERS", 2)
+    monkeypatch.setattr(profiling, "PROFILE_PARALLEL_MIN_CELLS", 0)
+    try:
+        stats = profile_columns(frame)
+        assert profiling._executor is not None
+    finally:
+        profiling.shutdown_executor()
+
+    assert list(stats) == list(frame.columns)
+    assert stats == profile_shard(frame)
+
+
+def test_analysis_adds_column_stats_on_request(tmp_path, frame):
+    path = tmp_path / "data.csv"
+    frame.to_csv(path, index=False)
+
+    plain = analyze_csv(str(path))
+    extended = analyze_csv(str(path), column_stats=True)
+
+    assert "column_stats" not in plain
+    assert {k: v for k, v in extended.items() if k != "column_stats"} == plain
+    assert list(extended["column_stats"]) == list(frame.columns)
+    assert extended["column_stats"]["qty"]["max"] == frame["qty"].max()
+
+    with pytest.raises(ValueError, match="streaming mode"):
+        analyze_csv(str(path), chunk_size=100, column_stats=True)
@@ -0,0 +1,107 @@
+import os
+import time
+
+import pytest
+
+from app.services import result_cache
+from app.services.result_cache import cache_stats, get_cached_result, store_result
+from app.utils.storage import file_sha256
+
+ANALYSIS = {"total_rows": 2}
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache")
+    monkeypatch.setattr(result_cache, "CACHE_DIR", path)
+    return path
+
+
+def _result(tmp_path, name: str, size: int = 1000) -> dict:
+    path = tmp_path / f"{name}_cleaned-run.csv"
+    path.write_bytes(name.encode()[:1] * size)
+    return {"cleaned_file_path": str(path), "cleaned_sha256": file_sha256(str(path)), "steps": []}
+
+
+def _counts() -> dict:
+    stats = cache_stats()
+    return {name: stats[name] for name in ("hits", "misses", "stores", "evictions")}
+
+
+def _changes(before: dict) -> dict:
+    return {name: count - before[name] for name, count in _counts().items() if count != before[name]}
+
+
+def test_miss_then_hit(tmp_path, cache_dir):
+    before = _counts()
+    assert get_cached_result("a") is None
+
+    source = _result(tmp_path, "a")
+    _, stored = store_result("a", ANALYSIS, source)
+    # The run's own file moved into the cache
+    assert os.path.dirname(stored["cleaned_file_path"]) == cache_dir
+    assert not os.path.exists(source["cleaned_file_path"])
+
+    analysis, summary = get_cached_result("a")
+    assert analysis == ANALYSIS
+    assert summary == stored
+    assert file_sha256(summary["cleaned_file_path"]) == summary["cleaned_sha256"]
+    assert _changes(before) == {"misses": 1, "stores": 1, "hits": 1}
+
+
+def test_entry_without_its_file_is_a_miss(tmp_path, cache_dir):
+    _, stored = store_result("a", ANALYSIS, _result(tmp_path, "a"))
+    os.remove(stored["cleaned_file_path"])
+
+    before = _counts()
+    assert get_cached_result("a") is None
+    assert _changes(before) == {"misses": 1}
+    assert not os.listdir(cache_dir)
+
+
+def test_expired_entry_is_a_miss(tmp_path, cache_dir, monkeypatch):
+    store_result("a", ANALYSIS, _result(tmp_path, "a"))
+    monkeypatch.setattr(result_cache, "CACHE_MAX_AGE_SECONDS", -1)
+
+    assert get_cached_result("a") is None
+    assert not os.listdir(cache_dir)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, cache_dir, monkeypatch):
+    # Room for two 1000-byte entries (plus their metadata), not three
+    monkeypatch.setattr(result_cache, "CACHE_MAX_BYTES", 2800)
+    store_result("a", ANALYSIS, _result(tmp_path, "a"))
+    store_result("b", ANALYSIS, _result(tmp_path, "b"))
+    long_ago = time.time() - 3600
+    for key in ("a", "b"):
+        meta_path = os.path.join(cache_dir, f"{key}.json")
+        os.utime(meta_path, (long_ago, os.stat(meta_path).st_mtime))
+    assert get_cached_result("a") is not None
+
+    before = _counts()
+    store_result("c", ANALYSIS, _result(tmp_path, "c"))
+
+    assert _changes(before) == {"stores": 1, "evictions": 1}
+    assert sorted(os.listdir(cache_dir)) == ["a.csv", "a.json", "c.csv", "c.json"]
+    assert cache_stats()["size_bytes"] <= 2800
+
+
+def test_repeated_upload_is_served_from_the_cache(client, auth_headers):
+    data = b"a,b\n1,x\n1,x\n2,\n"
+    responses = [
+        client.post("/pipeline/clean-csv", files={"file": ("again.csv", data)}, headers=auth_headers())
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    first, second = (response.json() for response in responses)
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["cleaning_summary"] == first["cleaning_summary"]
+
+
+def test_cache_stats_are_for_admins_only(client, auth_headers):
+    assert client.get("/pipeline/cache/stats", headers=auth_headers()).status_code == 403
+
+    response = client.get("/pipeline/cache/stats", headers=auth_headers("admin@example.com"))
+    assert response.status_code == 200
+    assert {"hits", "misses", "evictions", "entries"} <= set(response.json())
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_cleaning import analyze_csv, sketch_csv
+from app.services.dedup import column_hashes
+from app.services.sketches import CountMinSketch, HyperLogLog, Reservoir, TDigest
+
+
+def _hashes(values) -> np.ndarray:
+    return column_hashes(pd.Series(values))
+
+
+@pytest.mark.parametrize("distinct", [10, 1000, 200_000])
+def test_hyperloglog_estimate_is_within_its_error(distinct):
+    sketch = HyperLogLog()
+    values = np.arange(distinct)
+    # Every value several times, in chunks: repeats do not count
+    for chunk in np.array_split(np.tile(values, 3), 7):
+        sketch.update(_hashes(chunk))
+
+    assert abs(sketch.estimate() - distinct) <= 4 * sketch.relative_error * distinct + 1
+
+
+def test_tdigest_quantiles_are_within_their_rank_error():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(0, 1, 150_000), rng.exponential(5, 50_000)])
+    digest = TDigest()
+    for chunk in np.array_split(values, 20):
+        digest.update(chunk)
+
+    ordered = np.sort(values)
+    assert digest.count == len(values)
+    assert (digest.min, digest.max) == (ordered[0], ordered[-1])
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        rank = np.searchsorted(ordered, digest.quantile(q)) / len(values)
+        assert abs(rank - q) <= 2 * digest.rank_error(q) + 1e-3, q
+
+
+def test_count_min_finds_heavy_hitters_and_never_undercounts():
+    rng = np.random.default_rng(4)
+    values = pd.Series(rng.zipf(1.5, 100_000) % 5000)
+    sketch = CountMinSketch()
+    for start in range(0, len(values), 10_000):
+        chunk = values.iloc[start:start + 10_000]
+        sketch.update(chunk, _hashes(chunk))
+
+    exact = values.value_counts()
+    top = sketch.top(5)
+    assert [value for value, _ in top] == exact.index[:5].tolist()
+    for value, estimate in top:
+        assert exact[value] <= estimate <= exact[value] + sketch.max_overcount
+
+    estimates = sketch.estimate(_hashes(exact.index))
+    assert (estimates >= exact.to_numpy()).all()
+
+
+def test_reservoir_is_bounded_and_uniform():
+    positions = []
+    for seed in range(200):
+        sample = Reservoir(size=10, seed=seed)
+        for start in range(0, 1000, 64):
+            sample.update(pd.DataFrame({"row": np.arange(start, min(start + 64, 1000))}))
+        assert sample.seen == 1000
+        assert len(sample.rows) == 10
+        rows = [record["row"] for record in sample.rows]
+        assert len(set(rows)) == 10
+        positions.extend(rows)
+
+    # Every tenth of the file gets its share of the picks
+    shares = np.bincount(np.array(positions) // 100, minlength=10) / len(positions)
+    assert np.all(np.abs(shares - 0.1) < 0.03)
+
+
+def test_sketch_analysis_matches_the_exact_one(tmp_path):
+    rng = np.random.default_rng(9)
+    rows = 20_000
+    df = pd.DataFrame({
+        "id": rng.integers(0, 5000, rows),
+        "value": pd.Series(rng.normal(10, 2, rows)).round(1).mask(rng.random(rows) < 0.1),
+        "city": rng.choice(["Paris", "Lyon", "Nice", None], rows, p=[0.6, 0.3, 0.05, 0.05]),
+    })
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+
+    exact = analyze_csv(str(path), optimize=False)
+    sketch = sketch_csv(str(path), chunk_size=3000)
+
+    # Counts are exact, the rest within the stated bounds
+    for key in ("total_rows", "total_columns", "missing_values", "columns"):
+        assert sketch[key] == exact[key], key
+    bound = sketch["error_bounds"]["duplicate_rows"]["absolute_std_error"]
+    assert abs(sketch["duplicate_rows"] - exact["duplicate_rows"]) <= 4 * bound
+
+    stats = sketch["column_stats"]
+    assert abs(stats["id"]["distinct"] - df["id"].nunique()) <= 0.05 * df["id"].nunique()
+    assert [top["value"] for top in stats["city"]["top_values"]] == ["Paris", "Lyon", "Nice"]
+    assert abs(stats["value"]["quantiles"]["0.5"] - df["value"].median()) < 0.1
+    assert len(sketch["sample_rows"]) == 20
+
+
+def test_profile_endpoint_selects_the_mode(client, auth_headers):
+    data = b"a,b\n1,x\n1,x\n2,\n3,y\n"
+    for mode in ("exact", "sketch"):
+        response = client.post(
+            "/pipeline/profile", params={"mode": mode}, files={"file": ("profile.csv", data)}, headers=auth_headers()
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["mode"] == mode
+        assert body["analysis"]["total_rows"] == 4
+        assert body["analysis"]["duplicate_rows"] == 1
+        assert ("error_bounds" in body["analysis"]) == (mode == "sketch")
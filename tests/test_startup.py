@@ -0,0 +1,43 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from app.utils import startup
+from conftest import ROOT
+
+REPORT = """
+import builtins, json
+import app.main
+from app.utils.startup import startup_report
+print(json.dumps({"report": startup_report(), "hook_removed": builtins.__import__.__module__ == "builtins"}))
+"""
+
+
+def test_import_breakdown_is_reported():
+    # A fresh interpreter: here the app modules are already imported
+    result = subprocess.run(
+        [sys.executable, "-c", REPORT],
+        env=dict(os.environ, PYTHONPATH=ROOT), cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    report = output["report"]
+
+    assert output["hook_removed"]
+    modules = [entry["module"] for entry in report["imports"]]
+    assert {"fastapi", "sqlalchemy"} <= set(modules)
+    assert any(module.startswith("app.") for module in modules)
+    assert len(modules) == len(set(modules)) <= startup.IMPORT_REPORT_TOP
+
+    seconds = [entry["seconds"] for entry in report["imports"]]
+    assert seconds == sorted(seconds, reverse=True)
+    assert sum(seconds) <= report["import_seconds"]
+
+
+def test_ready_logs_the_report(caplog):
+    with caplog.at_level(logging.INFO, logger=startup.__name__):
+        startup.record_ready()
+
+    assert "'imports'" in caplog.text
+    assert startup.startup_report()["ready_seconds"] is not None
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_cleaning import clean_csv, clean_version, run_pipeline
+
+MIXED_CSVS = {
+    # int chunk, then a text chunk repeating one of its values
+    "int_then_text": "a,b\n1,k\n2,k\nx,k\n1,k\n",
+    "text_then_int": "a,b\nx,k\n1,k\n1,k\n2,k\n",
+    # numbers written differently are distinct text
+    "leading_zero": "a,b\n1,k\n2,k\n01,k\nx,k\n1,k\n",
+    "bool_then_text": "a,b\nTrue,k\nFalse,k\nmaybe,k\nTrue,k\n",
+    "float_then_text": "a,b\n1.5,k\n,k\nn/a?,k\n1.5,k\n,k\n",
+    "nulls_then_int": "a,b\n,k\n,k\n3,k\n3,k\n",
+}
+
+
+def _clean(tmp_path, text: str, chunk_size: int = None, **options):
+    path = tmp_path / f"data-{chunk_size}.csv"
+    path.write_text(text)
+    analysis, result = run_pipeline(str(path), chunk_size=chunk_size, **options)
+    with open(result["cleaned_file_path"]) as f:
+        return analysis, result, f.read()
+
+
+@pytest.mark.parametrize("name", sorted(MIXED_CSVS))
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_streaming_matches_in_memory_on_mixed_chunks(tmp_path, name, chunk_size):
+    text = MIXED_CSVS[name]
+    analysis, result, cleaned = _clean(tmp_path, text)
+    s_analysis, s_result, s_cleaned = _clean(tmp_path, text, chunk_size)
+
+    assert s_analysis["duplicate_rows"] == analysis["duplicate_rows"]
+    assert s_result["duplicates_removed"] == result["duplicates_removed"]
+    assert s_result["rows_after"] == result["rows_after"]
+    assert s_cleaned == cleaned
+
+
+def test_streaming_subset_matches_in_memory(tmp_path):
+    text = "a,b\n1,k\n2,j\nx,k\n1,m\n"
+    _, result, cleaned = _clean(tmp_path, text, dedup_subset=["a"])
+    _, s_result, s_cleaned = _clean(tmp_path, text, 2, dedup_subset=["a"])
+
+    assert s_result["duplicates_removed"] == result["duplicates_removed"] == 1
+    assert s_cleaned == cleaned
+
+
+def test_incremental_append_hashes_text_columns_as_text(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\nx,k\n1,k\n")
+    state_dir = str(tmp_path / "state")
+    _, first, state = clean_version(str(path), state_dir, chunk_size=2)
+
+    # Appended rows alone would parse as ints
+    with open(path, "a") as f:
+        f.write("1,k\n2,k\n")
+    _, second, _ = clean_version(str(path), state_dir, parent_state=state, chunk_size=2)
+
+    assert second["incremental"]["mode"] == "append"
+    assert second["duplicates_removed"] == 1
+    assert pd.read_csv(second["cleaned_file_path"], dtype=str)["a"].tolist() == ["x", "1", "2"]
+
+
+@pytest.fixture(scope="module")
+def large_mixed_csv(tmp_path_factory):
+    # More rows than one parser block (262144): ints, then text, then
+    # ints again, so the parser types the blocks differently
+    path = tmp_path_factory.mktemp("large") / "mixed.csv"
+    with open(path, "w") as f:
+        f.write("k,v\n")
+        f.writelines(f"{i % 7000},a\n" for i in range(300_000))
+        f.write("x,a\n")
+        f.writelines(f"{i},a\n" for i in range(50))
+    return str(path)
+
+
+@pytest.mark.parametrize("options", [
+    {}, {"chunk_size": 100_000}, {"chunk_size": 30_000}, {"engine": "arrow"}
+], ids=["in_memory", "chunks_100k", "chunks_30k", "arrow"])
+def test_large_mixed_column_is_text_in_every_path(large_mixed_csv, options):
+    result = clean_csv(large_mixed_csv, **options)
+
+    # 7000 distinct keys plus 'x'; '1' and 1 are one value
+    assert result["rows_after"] == 7001
+    assert result["duplicates_removed"] == 300_051 - 7001
+
+
+def test_streamed_means_are_exact(tmp_path):
+    rng = np.random.default_rng(3)
+    values = rng.normal(scale=1e6, size=150_000)
+    values[rng.random(len(values)) < 0.2] = np.nan
+    text = pd.DataFrame({"x": values, "n": np.arange(len(values))}).to_csv(index=False)
+
+    _, result, cleaned = _clean(tmp_path, text)
+    for chunk_size in (100_000, 7_000):
+        _, s_result, s_cleaned = _clean(tmp_path, text, chunk_size)
+        assert s_result["steps"] == result["steps"]
+        assert s_cleaned == cleaned, chunk_size
@@ -0,0 +1,64 @@
+from app.routers import pipeline_routes
+from app.utils import resumable
+
+
+def test_oversized_upload_is_refused(client, auth_headers):
+    response = client.post(
+        "/pipeline/uploads",
+        json={"filename": "huge.csv", "length": resumable.UPLOAD_MAX_MB * 1024 * 1024 + 1},
+        headers=auth_headers()
+    )
+    assert response.status_code == 413
+    assert f"{resumable.UPLOAD_MAX_MB} MB" in response.json()["detail"]
+
+
+def test_upload_at_the_limit_is_accepted(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(resumable, "UPLOAD_MAX_MB", 1)
+    response = client.post(
+        "/pipeline/uploads",
+        json={"filename": "small.csv", "length": 1024 * 1024},
+        headers=auth_headers()
+    )
+    assert response.status_code == 201
+    assert client.delete(f"/pipeline/uploads/{response.json()['upload_id']}", headers=auth_headers()).status_code == 204
+
+    response = client.post(
+        "/pipeline/uploads",
+        json={"filename": "small.csv", "length": 1024 * 1024 + 1},
+        headers=auth_headers()
+    )
+    assert response.status_code == 413
+
+
+def _start_upload(client, headers: dict, length: int = 4) -> str:
+    response = client.post("/pipeline/uploads", json={"filename": "chunks.csv", "length": length}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["upload_id"]
+
+
+def test_malformed_content_length_is_a_bad_request(client, auth_headers):
+    upload_id = _start_upload(client, auth_headers())
+    response = client.patch(
+        f"/pipeline/uploads/{upload_id}",
+        content=b"a,b\n",
+        headers={**auth_headers(), "Upload-Offset": "0", "Content-Length": "four"}
+    )
+    assert response.status_code == 400
+
+
+def test_upload_cancelled_during_a_chunk(client, auth_headers, monkeypatch):
+    upload_id = _start_upload(client, auth_headers())
+
+    def cancelled_meanwhile(info, offset, data):
+        # A DELETE request lands while this chunk is streamed in
+        resumable.delete_upload(info)
+        resumable.write_at(info, offset, data)
+
+    monkeypatch.setattr(pipeline_routes, "write_at", cancelled_meanwhile)
+    response = client.patch(
+        f"/pipeline/uploads/{upload_id}",
+        content=b"a,b\n",
+        headers={**auth_headers(), "Upload-Offset": "0"}
+    )
+    assert response.status_code == 404
+    assert client.head(f"/pipeline/uploads/{upload_id}", headers=auth_headers()).status_code == 404